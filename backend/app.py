@@ -1,21 +1,47 @@
-from flask import Flask, request, jsonify, session
-import requests
+from flask import Blueprint, Flask, Response, request, jsonify
+from contextlib import contextmanager
 from flask_cors import CORS
 import psycopg2
 from psycopg2 import sql
-from pathlib import Path
 from dotenv import load_dotenv
 import openai
 import os
 import hashlib
-from google.oauth2 import id_token
+import hmac
+import threading
+import time
+import base64
+import json
 from google.auth.transport.requests import Request as GoogleAuthRequest
-from datetime import datetime
-from collections import defaultdict
-
-
-app = Flask(__name__)
-CORS(app, origins=["https://project-3-team-0g-frontend.onrender.com", "http://localhost:3000"])
+from collections import Counter
+from datetime import date, datetime, timedelta
+from db import ConnectionPool, DatabaseUnavailable
+from employees import load_employees
+from encoding import compress_responses, json_provider_class
+from exports import EXPORT_FORMATS, export_orders
+from google_tokens import CertificateError, FileCerts, GoogleCerts, TokenVerifier
+from metrics import Gauges, InstrumentedCursor, TimedSession, instrument, registry
+from ledger import MANUAL_REASONS, lock_quantities, product_usage, record_manual_changes
+from bulk import apply_updates, update_results, validate_updates
+from caches import VersionedCache, bump_version
+from chat import (
+    SESSION_DELETE_QUERY, SESSION_EXPIRE_QUERY, SESSION_LOAD_QUERY, SESSION_SAVE_QUERY, SSE_HEADERS, AnswerCache,
+    ContextWindow, add_messages, build_conversation, cache_key, completion_deltas, new_session, new_session_id, sse,
+)
+from order_queue import QueueFull, open_order_queue
+from orders import (
+    InsufficientStockError, MissingIngredientError, load_recipes, validate_keyed_order, validate_order, write_order,
+    write_order_batch,
+)
+from prices import load_prices
+from rollups import TREND_BUCKETS, hourly_sales, item_sales_trends, summarize, z_report_snapshot
+from slowlog import SlowQueryLog, slow_query_cursor
+from translations import GOOGLE_TRANSLATE_URL, TranslationError, Translator
+
+
+CORS_ORIGINS = ["https://project-3-team-0g-frontend.onrender.com", "http://localhost:3000"]
+
+api = Blueprint("api", __name__)
 
 load_dotenv()
 
@@ -38,310 +64,605 @@ openai_key = os.getenv("OPENAI_API_KEY")
 CLIENT_ID = os.getenv("GOOGLE_AUTH_CLIENT_ID")
 
 google_translate_api_key = os.getenv("GOOGLE_TRANSLATE_API_KEY")
+google_translate_api_url = os.getenv("GOOGLE_TRANSLATE_API_URL", GOOGLE_TRANSLATE_URL)
 
 openai.api_key = openai_key
+openai.api_base = os.getenv("OPENAI_API_BASE", openai.api_base)
+openai.requestssession = TimedSession("openai")
+chat_model = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+chat_timeout = float(os.getenv("CHAT_TIMEOUT", 60))
+# first questions (e.g. recurring menu and allergen questions) are answered from here without the model
+chat_cache = AnswerCache(size=int(os.getenv("CHAT_CACHE_SIZE", 1000)), ttl=float(os.getenv("CHAT_CACHE_TTL", 3600)))
+# what is sent to the model per turn, however long the conversation
+chat_window = ContextWindow(
+    max_tokens=int(os.getenv("CHAT_CONTEXT_TOKENS", 3000)),
+    summary_tokens=int(os.getenv("CHAT_SUMMARY_TOKENS", 300))
+)
+chat_session_ttl = int(os.getenv("CHAT_SESSION_TTL", 1800))
+chat_sessions_max = int(os.getenv("CHAT_SESSIONS_MAX", 10000))
+chat_sessions_expired_at = 0.0
+google_auth_request = GoogleAuthRequest(session=TimedSession("google_auth"))
+# GOOGLE_CERTS_FILE verifies logins against local test keys instead (scripts/make_test_google_token.py)
+google_certs = (FileCerts(os.environ["GOOGLE_CERTS_FILE"]) if os.getenv("GOOGLE_CERTS_FILE")
+                else GoogleCerts(google_auth_request))
+google_tokens = TokenVerifier(google_certs, CLIENT_ID, ttl=float(os.getenv("GOOGLE_TOKEN_CACHE_TTL", 300)))
+
+admin_token = os.getenv("ADMIN_TOKEN")
+
+# responses of at least this many bytes are sent gzip/brotli compressed; -1 turns it off
+compress_min_size = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+
+# SLOW_QUERY_MS turns on the slow query log: statements slower than this are
+# logged with their plan. Off by default.
+slow_query_ms = os.getenv("SLOW_QUERY_MS")
+slow_query_log = None
+if slow_query_ms:
+    slow_query_log = SlowQueryLog(
+        float(slow_query_ms) / 1000,
+        lambda: db_pool.connection(),
+        path=os.getenv("SLOW_QUERY_LOG", "slow_queries.log"),
+        max_bytes=int(os.getenv("SLOW_QUERY_LOG_BYTES", 10 * 2**20)),
+        backups=int(os.getenv("SLOW_QUERY_LOG_BACKUPS", 5)),
+        explain=os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1",
+        explain_interval=float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", 300))
+    )
+
+db_pool = ConnectionPool(
+    minconn=int(os.getenv("DB_POOL_MIN", 1)),
+    maxconn=int(os.getenv("DB_POOL_MAX", 10)),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+    max_uses=int(os.getenv("DB_POOL_MAX_USES", 1000)),
+    check_after=float(os.getenv("DB_POOL_CHECK_AFTER", 30)),
+    user=db_user,
+    password=db_password,
+    host=db_host,
+    port=db_port,
+    database=db_name,
+    cursor_factory=slow_query_cursor(slow_query_log) if slow_query_log else InstrumentedCursor
+)
 
 def get_db_connection():
+    """
+    Borrow a pooled connection. Use as a context manager:
+
+        with get_db_connection() as conn:
+            ...
+
+    The connection goes back to the pool (rolled back if a transaction is
+    still open) when the block exits.
+    """
+    return db_pool.connection()
+
+@contextmanager
+def get_db_cursor():
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        yield cursor
+
+recipe_cache = VersionedCache("recipes", load_recipes, get_db_cursor)
+price_cache = VersionedCache("prices", load_prices, get_db_cursor)
+employee_cache = VersionedCache("employees", load_employees, get_db_cursor)
+
+translator = Translator(
+    get_db_connection,
+    google_translate_api_key,
+    api_url=google_translate_api_url,
+    cache_size=int(os.getenv("TRANSLATION_CACHE_SIZE", 5000)),
+    session=TimedSession("google_translate")
+)
+
+# ORDER_INGESTION=queue makes /submit-order append to a local durable queue
+# and return at once; a background writer group-commits the orders.
+order_ingestion = os.getenv("ORDER_INGESTION", "sync")
+order_queue = None
+order_queue_lock = threading.Lock()
+order_batch_max = int(os.getenv("ORDER_BATCH_MAX", 500))
+# ENFORCE_STOCK=1 rejects orders needing more of an ingredient than is on hand
+enforce_stock = os.getenv("ENFORCE_STOCK", "0") == "1"
+
+def get_order_queue():
+    """Open the order queue and start its writer on first use in this process."""
+    global order_queue
+    with order_queue_lock:
+        if order_queue is None:
+            order_queue = open_order_queue(get_db_connection, recipe_cache, enforce_stock)
+            order_queue.start()
+        return order_queue
+
+def warm_caches():
+    with get_db_cursor() as cursor:
+        recipe_cache.load(cursor)
+        price_cache.load(cursor)
+        employee_cache.load(cursor)
+
+def create_app(config=None):
+    """
+    Build the Flask app: CORS, request metrics and every route. The database
+    pool, caches and order queue are module-level, so each process (each
+    gunicorn worker) has its own and all apps built in a process share them.
+    """
+    app = Flask(__name__)
+    app.config.update(config or {})
+    app.json = json_provider_class()(app)
+    CORS(app, origins=CORS_ORIGINS)
+    instrument(app)
+    if compress_min_size >= 0:
+        compress_responses(app, compress_min_size)
+    app.register_blueprint(api)
+    return app
+
+def warm_worker():
+    """
+    Open this process's pooled connections and load the menu recipes and
+    prices before it takes traffic; start the order queue writer when
+    queued ingestion is on. Failures are logged and the data loads on
+    first use instead.
+    """
     try:
-        conn = psycopg2.connect(
-            user=db_user,
-            password=db_password,
-            host=db_host,
-            port=db_port,
-            database=db_name
-        )
-        return conn
+        db_pool.prefill()
+        warm_caches()
+        if order_ingestion == "queue":
+            get_order_queue()
     except Exception as e:
-        print("Error connecting to the database:", e)
-        return None
-
-@app.route('/', methods=['GET'])
+        print("Could not warm caches, they will load on first use:", e)
+
+def shutdown(timeout=20.0):
+    """Drain queued orders (up to ``timeout`` seconds) and close this process's connections."""
+    if order_queue is not None:
+        order_queue.stop(timeout)
+    db_pool.closeall()
+
+def cached_json(payload, etag):
+    """jsonify() with an ETag, answering 304 when the client's If-None-Match matches."""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+@api.app_errorhandler(DatabaseUnavailable)
+def handle_database_unavailable(e):
+    print("Database unavailable:", e)
+    return jsonify({"message": "Database connection error"}), 500
+
+@api.route('/', methods=['GET'])
 def hello():
     return jsonify({"message":"Welcome to Panda Express"})
 
-@app.route("/db-connect", methods=['GET'])
+@api.route("/ready", methods=['GET'])
+@api.route("/db-connect", methods=['GET'])
 def get_connection():
-    cn = get_db_connection()
-    if cn:
-        return jsonify({"message": "Database connection successful"}), 200
+    if db_pool.check():
+        return jsonify({"message": "Database connection successful", "pool": db_pool.stats()}), 200
     else:
-        return jsonify({"message": "Database connection failed"}), 500
+        return jsonify({"message": "Database connection failed", "pool": db_pool.stats()}), 503
+
+@api.route("/db-pool-stats", methods=['GET'])
+def get_db_pool_stats():
+    return jsonify(db_pool.stats()), 200
+
+@api.route("/cache-stats", methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        "order_queue": order_queue.stats() if order_queue else None,
+        "recipes": recipe_cache.stats(),
+        "prices": price_cache.stats(),
+        "employees": employee_cache.stats(),
+        "google_certs": google_certs.stats(),
+        "google_tokens": google_tokens.stats(),
+        "translations": translator.stats(),
+        "chat_answers": chat_cache.stats()
+    }), 200
+
+def pool_gauges():
+    stats = db_pool.stats()
+    return {(state,): stats[state] for state in ("idle", "in_use", "waiting")}
+
+def cache_gauges():
+    return {(name, kind): value
+            for name, cache in (("recipes", recipe_cache), ("prices", price_cache), ("translations", translator))
+            for kind, value in cache.stats().items()
+            if kind in ("hits", "misses", "reloads", "cache_hits", "db_hits", "provider_calls", "coalesced")}
+
+def queue_gauges():
+    if order_queue is None:
+        return {}
+    stats = order_queue.stats()
+    return {(kind,): stats[kind] for kind in ("depth", "failed_pending_review", "written", "batches")}
+
+registry.register(Gauges("db_pool_connections", "Pooled connections by state.", pool_gauges, ("state",)))
+registry.register(Gauges("cache_events", "In-process cache counters.", cache_gauges, ("cache", "event")))
+registry.register(Gauges("order_queue", "Order ingestion queue state.", queue_gauges, ("stat",)))
+
+@api.route("/metrics", methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of this worker process's metrics."""
+    return Response(registry.expose(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@api.route("/admin/slow-queries", methods=['GET'])
+def get_slow_queries():
+    """Statements over SLOW_QUERY_MS in this worker process, worst total time first."""
+    if not admin_token:
+        return jsonify({"message": "Admin endpoints are disabled; set ADMIN_TOKEN"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode("utf-8"), admin_token.encode("utf-8")):
+        return jsonify({"message": "Forbidden"}), 403
+    if slow_query_log is None:
+        return jsonify({"message": "Slow query log is disabled; set SLOW_QUERY_MS"}), 404
+    limit = request.args.get("limit", default=20, type=int)
+    if limit is None or limit < 1:
+        return jsonify({"message": "limit must be a positive integer"}), 400
+    return jsonify({**slow_query_log.stats(), "queries": slow_query_log.worst(limit)}), 200
+
+def chat_request():
+    """
+    The model input for a posted /chat body: ``(session_id, state,
+    messages)``. With a ``session_id`` the posted messages are the new ones,
+    added to that stored session (state); without one they are the whole
+    conversation and state is None. Either way ``messages`` is cut to the
+    context window. Raises ValueError when the body is malformed and
+    LookupError for an unknown or expired session.
+
+    The posted messages are stored in the session before the model is
+    called, so they are kept even if the call fails; clients must not post
+    them again.
+    """
+    data = request.get_json(silent=True)
+    conversation = build_conversation(data)
+    session_id = data.get("session_id")
+    if session_id is None:
+        return None, None, chat_window.conversation(conversation)
 
-@app.route('/chat', methods=['POST'])
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SESSION_LOAD_QUERY, (str(session_id), chat_session_ttl))
+            row = cursor.fetchone()
+            if row is None:
+                raise LookupError("Chat session not found or expired")
+            state = chat_window.trim(add_messages(row[0], conversation))
+            cursor.execute(SESSION_SAVE_QUERY, (str(session_id), json.dumps(state)))
+        conn.commit()
+    return session_id, state, chat_window.messages(state)
+
+def save_chat_reply(session_id, state, reply):
+    """Store the session with the model's reply; a no-op for session-less requests."""
+    if session_id is None:
+        return
+    chat_window.trim(add_messages(state, [{"role": "assistant", "content": reply}]))
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SESSION_SAVE_QUERY, (str(session_id), json.dumps(state)))
+        conn.commit()
+
+@api.route('/chat/sessions', methods=['POST'])
+def create_chat_session():
+    """
+    Start a server-held conversation. Post its id with each /chat or
+    /chat/stream call as ``session_id`` and send only the new messages.
+    """
+    global chat_sessions_expired_at
+    session_id = new_session_id()
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                if time.monotonic() - chat_sessions_expired_at >= 60:
+                    chat_sessions_expired_at = time.monotonic()
+                    cursor.execute(SESSION_EXPIRE_QUERY, (chat_session_ttl, chat_sessions_max))
+                cursor.execute(SESSION_SAVE_QUERY, (session_id, json.dumps(new_session())))
+            conn.commit()
+        except Exception as e:
+            print("Error creating chat session:", e)
+            return jsonify({"message": "An error occurred while creating the chat session"}), 500
+    return jsonify({"session_id": session_id, "expires_in": chat_session_ttl}), 201
+
+@api.route('/chat/sessions/<string:session_id>', methods=['DELETE'])
+def delete_chat_session(session_id):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SESSION_DELETE_QUERY, (session_id,))
+        conn.commit()
+    return jsonify({"message": "Deleted"}), 200
+
+@api.route('/chat', methods=['POST'])
 def chat():
-    data = request.json
-    messages = data.get("messages", [])
+    try:
+        session_id, state, conversation = chat_request()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"message": str(e)}), 404
 
-    conversation = []
-    for message in messages:
-        role = "user" if message["sender"] == "user" else "assistant"
-        conversation.append({"role": role, "content": message["text"]})
+    key = cache_key(chat_model, conversation)
+    cached = chat_cache.get(key)
+    if cached is not None:
+        save_chat_reply(session_id, state, cached)
+        return jsonify({"response": cached, "cached": True})
 
     try:
         response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=conversation
+            model=chat_model,
+            messages=conversation,
+            request_timeout=chat_timeout
         )
         reply = response['choices'][0]['message']['content']
-        return jsonify({"response": reply})
     except Exception as e:
         return jsonify({"error with open ai": str(e)}), 500
+    chat_cache.put(key, reply)
+    save_chat_reply(session_id, state, reply)
+    return jsonify({"response": reply})
 
-@app.route('/inventory-restock-info', methods=['GET'])
-def get_restock_info():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-
+@api.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    /chat as server-sent events: a "delta" event ({"delta": text}) per piece
+    of the reply as the model produces it, then "done" ({"response": full
+    reply, "cached": bool}), or "error" ({"error": ...}) if the model fails
+    part way. Errors before the first piece are plain JSON responses.
+    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT 
-                    i.name AS ingredient_name,
-                    i.quantity AS current_quantity,
-                    COALESCE(SUM(ii.quantity_needed), 0) AS total_quantity_needed,
-                    CASE
-                        WHEN i.quantity <= COALESCE(SUM(ii.quantity_needed), 0)
-                        THEN 1 - (i.quantity / NULLIF(COALESCE(SUM(ii.quantity_needed), 1), 0))
-                        ELSE COALESCE(SUM(ii.quantity_needed), 0) / NULLIF(i.quantity, 0)
-                    END AS priority_score
-                FROM 
-                    inventory i
-                LEFT JOIN 
-                    item_ingredients ii ON i.name = ii.ingredient_name
-                GROUP BY 
-                    i.name, i.quantity
-                ORDER BY 
-                    priority_score DESC;
-            """)
-
-            result = cursor.fetchall()
-
-            restock_info = []
-            for row in result:
-                restock_info.append({
-                    "ingredient_name": row[0],
-                    "current_quantity": float(row[1]), 
-                    "total_quantity_needed": float(row[2]),
-                    "priority_score": float(row[3]) 
-                })
-
-            return jsonify(restock_info), 200
-    except Exception as e:
-        print("Error fetching restock information:", e)
-        return jsonify({"message": "An error occurred while fetching restock information"}), 500
-    finally:
-        conn.close()
+        session_id, state, conversation = chat_request()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"message": str(e)}), 404
 
-@app.route('/mass-inventory-update', methods=['POST'])
-def update_inventory():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
+    key = cache_key(chat_model, conversation)
+    cached = chat_cache.get(key)
+    if cached is not None:
+        save_chat_reply(session_id, state, cached)
+        events = [sse({"delta": cached}), sse({"response": cached, "cached": True}, "done")]
+        return Response(events, mimetype="text/event-stream", headers=SSE_HEADERS)
 
     try:
-        data = request.json
-        updates = data.get("updates", [])
+        chunks = openai.ChatCompletion.create(
+            model=chat_model,
+            messages=conversation,
+            stream=True,
+            request_timeout=chat_timeout
+        )
+    except Exception as e:
+        return jsonify({"error with open ai": str(e)}), 500
 
-        if not updates or not isinstance(updates, list):
-            return jsonify({"message": "Invalid input format. 'updates' should be a list."}), 400
+    def relay():
+        parts = []
+        try:
+            for delta in completion_deltas(chunks):
+                parts.append(delta)
+                yield sse({"delta": delta})
+        except Exception as e:
+            print("Error streaming chat reply:", e)
+            yield sse({"error": str(e)}, "error")
+            return
+        reply = "".join(parts)
+        chat_cache.put(key, reply)
+        try:
+            save_chat_reply(session_id, state, reply)
+        except Exception as e:
+            print("Error saving chat session:", e)
+        yield sse({"response": reply, "cached": False}, "done")
+
+    return Response(relay(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+def restock_query(limit=None, min_priority=None):
+    where = "WHERE priority_score >= %s" if min_priority is not None else ""
+    params = [min_priority] if min_priority is not None else []
+    return f"""
+        SELECT name, quantity, recipe_demand, priority_score
+        FROM inventory
+        {where}
+        ORDER BY priority_score DESC
+        LIMIT %s
+    """, params + [limit]
+
+def restock_rows(rows):
+    return [
+        {
+            "ingredient_name": row[0],
+            "current_quantity": float(row[1]),
+            "total_quantity_needed": float(row[2]),
+            "priority_score": float(row[3]) if row[3] is not None else None
+        }
+        for row in rows
+    ]
 
-        with conn.cursor() as cursor:
-            for update in updates:
-                name = update.get("name")
-                quantity = update.get("quantity")
+@api.route('/inventory-restock-info', methods=['GET'])
+def get_restock_info():
+    """
+    Ingredients by restock priority, most urgent first.
 
-                if not name or quantity is None: 
-                    return jsonify({"message": "Each update must include 'name' and 'quantity'."}), 400
+    Optional query parameters:
+    limit: only the top N ingredients
+    min_priority: only ingredients scoring at least this much
 
-                cursor.execute("""
-                    UPDATE inventory
-                    SET quantity = %s
-                    WHERE name = %s
-                """, (quantity, name))
+    Scores are maintained on the inventory rows (see
+    scripts/migrations/004_restock_priority.sql), so this reads the
+    priority_score index instead of aggregating recipes per request.
+    """
+    limit = request.args.get('limit', type=int)
+    min_priority = request.args.get('min_priority', type=float)
+    if limit is not None and limit < 0:
+        return jsonify({"message": "Invalid query parameter: limit must not be negative"}), 400
+
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(*restock_query(limit, min_priority))
+                return jsonify(restock_rows(cursor.fetchall())), 200
+        except Exception as e:
+            print("Error fetching restock information:", e)
+            return jsonify({"message": "An error occurred while fetching restock information"}), 500
+
+@api.route('/mass-inventory-update', methods=['POST'])
+def update_inventory():
+    """
+    Expected JSON body:
+    {
+        "updates": [
+            {"name": "Rice", "quantity": 120},
+            {"name": "Chicken", "quantity": 80}
+        ]
+    }
 
+    The whole batch is validated first and applied in one statement. The
+    response lists each name with "updated" or "not_found". An optional
+    top-level "reason" (restock, adjustment or waste; default adjustment)
+    labels the changes in the inventory ledger.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"message": "Request body must be a JSON object with an 'updates' list."}), 400
+    updates = data.get("updates", [])
+    reason = data.get("reason", "adjustment")
+
+    if not updates or not isinstance(updates, list):
+        return jsonify({"message": "Invalid input format. 'updates' should be a list."}), 400
+    if reason not in MANUAL_REASONS:
+        return jsonify({"message": f"'reason' must be one of: {', '.join(MANUAL_REASONS)}"}), 400
+
+    quantities, errors = validate_updates(updates, "quantity")
+    if errors:
+        return jsonify({"message": "Each update must include 'name' and 'quantity'.", "errors": errors}), 400
+
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                before = lock_quantities(cursor, quantities)
+                matched = apply_updates(cursor, "inventory", "name", "quantity", quantities)
+                record_manual_changes(cursor, before, {name: quantities[name] for name in matched}, reason)
             conn.commit()
 
-        return jsonify({"message": "Inventory updated successfully."}), 200
+            return jsonify({
+                "message": "Inventory updated successfully.",
+                "updated": len(matched),
+                "not_found": [name for name in quantities if name not in matched],
+                "results": update_results(quantities, matched)
+            }), 200
 
-    except Exception as e:
-        print("Error updating inventory:", e)
-        return jsonify({"message": "An error occurred while updating inventory"}), 500
-    finally:
-        conn.close()
+        except Exception as e:
+            print("Error updating inventory:", e)
+            conn.rollback()
+            return jsonify({"message": "An error occurred while updating inventory"}), 500
 
-@app.route('/get-translation', methods=['POST'])
+@api.route('/get-translation', methods=['POST'])
 def get_translated_word():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-
     try:
-        data = request.json
-        english_word = data.get("en")
+        data = request.get_json(silent=True)
+        english_word = data.get("en") if isinstance(data, dict) else None
 
-        if not english_word:
+        if not english_word or not isinstance(english_word, str):
             return jsonify({"message": "Invalid English word"}), 400
 
-        with conn.cursor() as cursor:
-            cursor.execute(
-                sql.SQL("SELECT es FROM translations WHERE en = %s"),
-                (english_word,)
-            )
-            spanish_word_record = cursor.fetchone()
+        translations, failed = translator.translate([english_word])
+        if english_word in translations:
+            return jsonify({"es": translations[english_word]}), 200
 
-            if spanish_word_record:
-                spanish_word = spanish_word_record[0]
-                return jsonify({"es": spanish_word}), 200
-            else:
-                url = f"https://translation.googleapis.com/language/translate/v2?key={google_translate_api_key}"
-                payload = {
-                    "q": english_word,
-                    "target": "es",
-                    "format": "text"
-                }
-                print("Google translate api called")
-                response = requests.post(url, json=payload)
-
-                if response.status_code == 200:
-                    translated_text = response.json()["data"]["translations"][0]["translatedText"]
-
-                    cursor.execute(
-                        sql.SQL("INSERT INTO translations (en, es) VALUES (%s, %s)"),
-                        (english_word, translated_text)
-                    )
-                    conn.commit()
-
-                    return jsonify({"es": translated_text}), 200
-                else:
-                    return jsonify({
-                        "error": "Translation failed",
-                        "details": response.json()
-                    }), response.status_code
+        error = failed[english_word]
+        if isinstance(error, TranslationError):
+            return jsonify({
+                "error": "Translation failed",
+                "details": error.details
+            }), error.status_code
+        raise error
 
     except Exception as e:
         print("Error getting or adding translation:", e)
         return jsonify({"message": "An error occurred while processing translation"}), 500
-    finally:
-        conn.close()
 
+@api.route('/get-translations', methods=['POST'])
+def get_translated_words():
+    """
+    Expected JSON body:
+    {
+        "en": ["Orange Chicken", "Add to cart", ...]
+    }
+
+    Returns {"translations": {"Orange Chicken": "Pollo a la naranja", ...},
+    "failed": [...]} where "failed" lists strings that could not be translated.
+    """
+    data = request.get_json(silent=True)
+    words = data.get("en") if isinstance(data, dict) else None
 
-@app.route('/verify-login', methods=['POST'])
+    if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+        return jsonify({"message": "'en' must be a list of strings"}), 400
+
+    try:
+        translations, failed = translator.translate(words)
+    except Exception as e:
+        print("Error getting or adding translations:", e)
+        return jsonify({"message": "An error occurred while processing translation"}), 500
+
+    if failed:
+        print("Translations failed for", len(failed), "strings:", next(iter(failed.values())))
+    status = 502 if failed and not translations else 200
+    return jsonify({"translations": translations, "failed": list(failed)}), status
+
+
+@api.route('/verify-login', methods=['POST'])
 def verify_login():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
     hashed_password = hash_password(password)
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-    
     try:
-        with conn.cursor() as cursor:
-            
-            cursor.execute(
-                sql.SQL("SELECT * FROM employees WHERE email = %s AND pass_hash = %s"),
-                (email, hashed_password)
-            )
-            user = cursor.fetchone()
-
-            if user:
-                user_data = {
-                    "id": user[0],
-                    "first_name": user[1],
-                    "last_name": user[2],
-                    "email": user[3],
-                    "phone_number": user[4],
-                    "is_manager": user[5],
-                }
-                return jsonify(user_data), 200
-            else:
-                return jsonify(None), 401
-    except Exception as e:
+        user = employee_cache.get().password_user(email, hashed_password)
+    except psycopg2.Error as e:
         print("Error during login query:", e)
         return jsonify({"message": "An error occurred"}), 500
-    finally:
-        conn.close()
 
-@app.route("/google-login", methods=["POST"])
-def google_login():
-    connection = None
+    if user:
+        return jsonify(user), 200
+    return jsonify(None), 401
 
+@api.route("/google-login", methods=["POST"])
+def google_login():
     try:
-        connection = get_db_connection()
-
         data = request.get_json()
         token = data.get("token")
         if not token:
             return jsonify({"error": "Missing token"}), 400
 
-        idinfo = id_token.verify_oauth2_token(token, GoogleAuthRequest(), CLIENT_ID)
-        google_user_id = idinfo["sub"]
-
-        with connection.cursor() as cursor:
-            cursor.execute(
-                "SELECT id, first_name, last_name, email, phone_number, is_manager "
-                "FROM employees WHERE google_id = %s",
-                (google_user_id,),
-            )
-            user = cursor.fetchone()
-
-            if user:
-                user_data = {
-                    "id": user[0],
-                    "first_name": user[1],
-                    "last_name": user[2],
-                    "email": user[3],
-                    "phone_number": user[4],
-                    "is_manager": user[5],
-                }
-                return jsonify(user_data), 200
-            else:
-                return jsonify({"error": "Google user not registered"}), 404
+        idinfo = google_tokens.verify(token)
+        user = employee_cache.get().google_user(idinfo["sub"])
+        if user:
+            return jsonify(user), 200
+        else:
+            return jsonify({"error": "Google user not registered"}), 404
 
     except ValueError as e:
         print("Invalid token:", str(e))
         return jsonify({"error": "Invalid token"}), 401
 
+    except CertificateError as e:
+        print("Could not verify token:", str(e))
+        return jsonify({"error": "Could not verify token"}), 503
+
     except psycopg2.Error as db_error:
         print("Database error:", str(db_error))
         return jsonify({"error": "Database error"}), 500
 
-    finally:
-        if connection:
-            connection.close()
-
-@app.route('/employees', methods=['GET'])
+@api.route('/employees', methods=['GET'])
 def get_employees():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id, first_name, last_name, email, phone_number, is_manager FROM employees")
-            employees = cursor.fetchall()
-
-            employee_list = []
-            for employee in employees:
-                employee_list.append({
-                    "id": employee[0],
-                    "first_name": employee[1],
-                    "last_name": employee[2],
-                    "email": employee[3],
-                    "phone_number": employee[4],
-                    "is_manager": employee[5]
-                })
-
-            return jsonify(employee_list), 200
-    except Exception as e:
-        print("Error fetching employees:", e)
-        return jsonify({"message": "An error occurred while fetching employees"}), 500
-    finally:
-        conn.close()
-
-@app.route('/employees', methods=['POST'])
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id, first_name, last_name, email, phone_number, is_manager FROM employees")
+                employees = cursor.fetchall()
+
+                employee_list = []
+                for employee in employees:
+                    employee_list.append({
+                        "id": employee[0],
+                        "first_name": employee[1],
+                        "last_name": employee[2],
+                        "email": employee[3],
+                        "phone_number": employee[4],
+                        "is_manager": employee[5]
+                    })
+
+                return jsonify(employee_list), 200
+        except Exception as e:
+            print("Error fetching employees:", e)
+            return jsonify({"message": "An error occurred while fetching employees"}), 500
+
+@api.route('/employees', methods=['POST'])
 def add_employee():
     data = request.get_json()
 
@@ -360,28 +681,25 @@ def add_employee():
 
     hashed_password = hash_password(password)
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                sql.SQL("""
-                    INSERT INTO employees (first_name, last_name, email, phone_number, is_manager, pass_hash, google_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """),
-                (first_name, last_name, email, phone_number, is_manager, hashed_password, google_id)
-            )
-            conn.commit()
-            return jsonify({"message": "Employee added successfully"}), 201
-    except Exception as e:
-        print("Error adding employee:", e)
-        return jsonify({"message": "An error occurred while adding the employee"}), 500
-    finally:
-        conn.close()
-
-@app.route('/employees/<int:employee_id>', methods=['PUT'])
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    sql.SQL("""
+                        INSERT INTO employees (first_name, last_name, email, phone_number, is_manager, pass_hash, google_id)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """),
+                    (first_name, last_name, email, phone_number, is_manager, hashed_password, google_id)
+                )
+                bump_version(cursor, "employees")
+                conn.commit()
+                employee_cache.invalidate()
+                return jsonify({"message": "Employee added successfully"}), 201
+        except Exception as e:
+            print("Error adding employee:", e)
+            return jsonify({"message": "An error occurred while adding the employee"}), 500
+
+@api.route('/employees/<int:employee_id>', methods=['PUT'])
 def update_employee(employee_id):
     data = request.get_json()
 
@@ -392,86 +710,80 @@ def update_employee(employee_id):
     is_manager = data.get('is_manager')
     password = data.get('password')
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                update_fields = []
+                update_values = []
 
-    try:
-        with conn.cursor() as cursor:
-            update_fields = []
-            update_values = []
-
-            if first_name:
-                update_fields.append("first_name = %s")
-                update_values.append(first_name)
+                if first_name:
+                    update_fields.append("first_name = %s")
+                    update_values.append(first_name)
 
-            if last_name:
-                update_fields.append("last_name = %s")
-                update_values.append(last_name)
+                if last_name:
+                    update_fields.append("last_name = %s")
+                    update_values.append(last_name)
 
-            if email:
-                update_fields.append("email = %s")
-                update_values.append(email)
+                if email:
+                    update_fields.append("email = %s")
+                    update_values.append(email)
 
-            if phone_number:
-                update_fields.append("phone_number = %s")
-                update_values.append(phone_number)
+                if phone_number:
+                    update_fields.append("phone_number = %s")
+                    update_values.append(phone_number)
 
-            if is_manager is not None:
-                update_fields.append("is_manager = %s")
-                update_values.append(is_manager)
+                if is_manager is not None:
+                    update_fields.append("is_manager = %s")
+                    update_values.append(is_manager)
 
-            if password:
-                hashed_password = hash_password(password)
-                update_fields.append("pass_hash = %s")
-                update_values.append(hashed_password)
+                if password:
+                    hashed_password = hash_password(password)
+                    update_fields.append("pass_hash = %s")
+                    update_values.append(hashed_password)
 
-            update_values.append(employee_id)
+                update_values.append(employee_id)
 
-            if not update_fields:
-                return jsonify({"message": "No fields to update"}), 400
+                if not update_fields:
+                    return jsonify({"message": "No fields to update"}), 400
 
-            query = sql.SQL("""
-                UPDATE employees
-                SET {fields}
-                WHERE id = %s
-            """).format(fields=sql.SQL(", ").join(map(sql.SQL, update_fields)))
+                query = sql.SQL("""
+                    UPDATE employees
+                    SET {fields}
+                    WHERE id = %s
+                """).format(fields=sql.SQL(", ").join(map(sql.SQL, update_fields)))
 
-            cursor.execute(query, update_values)
-            conn.commit()
+                cursor.execute(query, update_values)
+                bump_version(cursor, "employees")
+                conn.commit()
+                employee_cache.invalidate()
 
-            return jsonify({"message": "Employee updated successfully"}), 200
-    except Exception as e:
-        print("Error updating employee:", e)
-        return jsonify({"message": "An error occurred while updating the employee"}), 500
-    finally:
-        conn.close()
+                return jsonify({"message": "Employee updated successfully"}), 200
+        except Exception as e:
+            print("Error updating employee:", e)
+            return jsonify({"message": "An error occurred while updating the employee"}), 500
 
-@app.route('/employees/<int:employee_id>', methods=['DELETE'])
+@api.route('/employees/<int:employee_id>', methods=['DELETE'])
 def delete_employee(employee_id):
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                sql.SQL("""
-                    DELETE FROM employees
-                    WHERE id = %s
-                """),
-                (employee_id,)
-            )
-            conn.commit()
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    sql.SQL("""
+                        DELETE FROM employees
+                        WHERE id = %s
+                    """),
+                    (employee_id,)
+                )
+                bump_version(cursor, "employees")
+                conn.commit()
+                employee_cache.invalidate()
 
-            return jsonify({"message": "Employee deleted successfully"}), 200
-    except Exception as e:
-        print("Error deleting employee:", e)
-        return jsonify({"message": "An error occurred while deleting the employee"}), 500
-    finally:
-        conn.close()
+                return jsonify({"message": "Employee deleted successfully"}), 200
+        except Exception as e:
+            print("Error deleting employee:", e)
+            return jsonify({"message": "An error occurred while deleting the employee"}), 500
 
-@app.route('/modify-prices', methods=["PUT"])
+@api.route('/modify-prices', methods=["PUT"])
 def modify_prices():
     """
     JSON body example:
@@ -486,62 +798,48 @@ def modify_prices():
             "price": 12.00
         }
     ]
-    """
-
-    data = request.get_json()
-    conn = get_db_connection()
-    
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-    
-    try:
-        cursor = conn.cursor()
 
-        for item in data:
-            name = item.get("name")
-            price = item.get("price")
+    The whole list is validated first and applied in one statement. The
+    response lists each name with "updated" or "not_found".
+    """
 
-            if name and price is not None:
-                cursor.execute(
-                    sql.SQL("UPDATE prices SET price = %s WHERE name = %s"),
-                    (price, name)
-                )
+    data = request.get_json(silent=True)
+    prices, errors = validate_updates(data, "price")
+    if errors:
+        return jsonify({"message": "Each item must include 'name' and a numeric 'price'.", "errors": errors}), 400
 
-        conn.commit()
-        return jsonify({"message": "Prices updated successfully"}), 200
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                matched = apply_updates(cursor, "prices", "name", "price", prices)
+                if matched:
+                    bump_version(cursor, "prices")
 
-    except Exception as e:
-        print("Error during price update:", e)
-        conn.rollback()
-        return jsonify({"message": "An error occurred during the update"}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
-@app.route('/view-prices', methods=["GET"])
+            conn.commit()
+            price_cache.invalidate()
+            return jsonify({
+                "message": "Prices updated successfully",
+                "updated": len(matched),
+                "not_found": [name for name in prices if name not in matched],
+                "results": update_results(prices, matched)
+            }), 200
+
+        except Exception as e:
+            print("Error during price update:", e)
+            conn.rollback()
+            return jsonify({"message": "An error occurred during the update"}), 500
+
+@api.route('/view-prices', methods=["GET"])
 def view_prices():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-    
     try:
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT name, price FROM prices")
-        rows = cursor.fetchall()
-
-        prices = [{"name": row[0], "price": row[1]} for row in rows]
-
-        return jsonify(prices), 200
+        prices = price_cache.get()
+        return cached_json(prices.rows, prices.rows_etag)
 
     except Exception as e:
         print("Error during fetching prices:", e)
         return jsonify({"message": "An error occurred while fetching prices"}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
-@app.route("/submit-order", methods=["POST"])
+@api.route("/submit-order", methods=["POST"])
 def submit_order():
     """
     Expected JSON body:
@@ -561,110 +859,123 @@ def submit_order():
         ]
     }
     """
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    error = validate_order(data)
+    if error:
+        return jsonify({"message": error}), 400
+
+    if order_ingestion == "queue":
+        try:
+            order_id = get_order_queue().enqueue(data)
+        except QueueFull as e:
+            print("Order queue full:", e)
+            response = jsonify({"message": "Too many orders are waiting to be processed, please retry"})
+            response.headers["Retry-After"] = "1"
+            return response, 503
+        return jsonify({"message": "Order accepted and queued", "order_id": order_id}), 202
+
+    with get_db_connection() as conn:
+        try:
+            cursor = conn.cursor()
+
+            order_id = write_order(cursor, data, recipe_cache.get(cursor), enforce_stock)
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-
-    try:
-        cursor = conn.cursor()
+            conn.commit()
+            return jsonify({"message": "Order submitted successfully and inventory updated", "order_id": order_id}), 201
 
-        employee_id = data.get("employee_id", None)
+        except MissingIngredientError as e:
+            conn.rollback()
+            print("ingredient not found in inventory:", e)
+            return jsonify({"message": f"Ingredient '{e.ingredient_names[0]}' not found in inventory."}), 400
 
-        cursor.execute(
-            """
-            INSERT INTO orders (customer_name, order_date, employee_id, total_price)
-            VALUES (%s, %s, %s, %s) RETURNING id
-            """,
-            (data["customer_name"], data["order_date"], employee_id, data["total_price"])
-        )
-        order_id = cursor.fetchone()[0]
+        except InsufficientStockError as e:
+            conn.rollback()
+            return jsonify({
+                "message": f"Not enough '{e.ingredient_names[0]}' in stock.",
+                "available": {name: float(quantity) for name, quantity in e.available.items()}
+            }), 409
 
-        ingredient_usage = {}
+        except Exception as e:
+            print("Error during order submission:", e)
+            conn.rollback()
+            return jsonify({"message": "An error occurred while submitting the order"}), 500
 
-        for meal in data["items"]:
-            cursor.execute(
-                """
-                INSERT INTO meals (order_id, meal_type)
-                VALUES (%s, %s) RETURNING id
-                """,
-                (order_id, meal["meal_type"])
-            )
-            meal_id = cursor.fetchone()[0]
+        finally:
+            cursor.close()
 
-            for item in meal["meal_items"]:
-                item_name = item["item_name"]
 
-                cursor.execute(
-                    """
-                    INSERT INTO meal_item (meal_id, item_name)
-                    VALUES (%s, %s)
-                    """,
-                    (meal_id, item_name)
-                )
 
-                cursor.execute(
-                    """
-                    SELECT ingredient_name, quantity_needed
-                    FROM item_ingredients
-                    WHERE item_name = %s
-                    """,
-                    (item_name,)
-                )
-                ingredients = cursor.fetchall()
-
-                for ingredient_name, quantity_needed in ingredients:
-                    if ingredient_name in ingredient_usage:
-                        ingredient_usage[ingredient_name] += quantity_needed
-                    else:
-                        ingredient_usage[ingredient_name] = quantity_needed
+@api.route("/submit-orders", methods=["POST"])
+def submit_orders():
+    """
+    Write a backlog of orders, e.g. from a kiosk that was offline, in one
+    transaction. Expected JSON body:
+    {
+        "orders": [
+            {"idempotency_key": "kiosk-3-000123", <a /submit-order body>},
+            ...
+        ]
+    }
 
-        for ingredient_name, total_needed in ingredient_usage.items():
-            cursor.execute(
-                """
-                SELECT quantity FROM inventory
-                WHERE name = %s
-                """,
-                (ingredient_name,)
-            )
-            result = cursor.fetchone()
-            if result is None:
+    Keys identify orders across retries: an order whose key was written
+    before (or appears earlier in the same batch) is not written again. The
+    response has one result per order, in order:
+    {"idempotency_key", "status": "created" | "duplicate" | "failed",
+     "order_id" (created/duplicate) or "message" (failed)}
+    """
+    data = request.get_json(silent=True)
+    orders = data.get("orders") if isinstance(data, dict) else None
+    if not isinstance(orders, list) or not orders:
+        return jsonify({"message": "'orders' must be a non-empty list"}), 400
+    if len(orders) > order_batch_max:
+        return jsonify({"message": f"At most {order_batch_max} orders per batch"}), 400
+
+    results = [None] * len(orders)
+    first_with_key = {}
+    to_write = []
+    for index, order in enumerate(orders):
+        error = validate_keyed_order(order)
+        if error:
+            key = order.get("idempotency_key") if isinstance(order, dict) else None
+            results[index] = {"idempotency_key": key, "status": "failed", "message": error}
+        elif order["idempotency_key"] in first_with_key:
+            continue
+        else:
+            first_with_key[order["idempotency_key"]] = index
+            to_write.append(index)
+
+    written = []
+    if to_write:
+        with get_db_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    written = write_order_batch(cursor, [orders[index] for index in to_write],
+                                                recipe_cache.get(cursor), enforce_stock)
+                conn.commit()
+            except Exception as e:
+                print("Error during batch order submission:", e)
                 conn.rollback()
-                print("ingredient not found in inventory")
-                return jsonify({"message": f"Ingredient '{ingredient_name}' not found in inventory."}), 400
-            available_quantity = result[0]
-
-            # prevents ordering if not enough inventory
-            # if available_quantity < total_needed:
-            #     conn.rollback()
-            #     print("insuffient inventory:", ingredient_name, "need:", total_needed, "have:", available_quantity)
-            #     return jsonify({"message": f"Not enough '{ingredient_name}' in inventory. Required: {total_needed}, Available: {available_quantity}"}), 400
-
-            cursor.execute(
-                """
-                UPDATE inventory
-                SET quantity = quantity - %s
-                WHERE name = %s
-                """,
-                (total_needed, ingredient_name)
-            )
-
-        conn.commit()
-        return jsonify({"message": "Order submitted successfully and inventory updated", "order_id": order_id}), 201
-
-    except Exception as e:
-        print("Error during order submission:", e)
-        conn.rollback()
-        return jsonify({"message": "An error occurred while submitting the order"}), 500
-
-    finally:
-        cursor.close()
-        conn.close()
-
-
-
-@app.route("/add-menu-item", methods=["POST"])
+                return jsonify({"message": "An error occurred while submitting the orders"}), 500
+
+    for index, (status, value) in zip(to_write, written):
+        result = {"idempotency_key": orders[index]["idempotency_key"], "status": status}
+        result["message" if status == "failed" else "order_id"] = value
+        results[index] = result
+    for index, order in enumerate(orders):
+        if results[index] is None:
+            # repeated key within the batch: same outcome as its first occurrence
+            first = results[first_with_key[order["idempotency_key"]]]
+            results[index] = dict(first, status="duplicate") if first["status"] != "failed" else dict(first)
+
+    counts = Counter(result["status"] for result in results)
+    return jsonify({
+        "results": results,
+        "created": counts["created"],
+        "duplicate": counts["duplicate"],
+        "failed": counts["failed"]
+    }), 200
+
+@api.route("/add-menu-item", methods=["POST"])
 def add_menu_item():
     """
     Expected JSON body:
@@ -680,253 +991,164 @@ def add_menu_item():
     if not name or not item_type:
         return jsonify({"message": "Missing 'name' or 'type' in request body"}), 400
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
+    with get_db_connection() as conn:
+        try:
+            cursor = conn.cursor()
 
-    try:
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            INSERT INTO items (name, type)
-            VALUES (%s, %s)
-            """,
-            (name, item_type)
-        )
+            cursor.execute(
+                """
+                INSERT INTO items (name, type)
+                VALUES (%s, %s)
+                """,
+                (name, item_type)
+            )
+            bump_version(cursor, "recipes")
 
-        conn.commit()
-        return jsonify({"message": "Menu item added successfully"}), 201
+            conn.commit()
+            recipe_cache.invalidate()
+            return jsonify({"message": "Menu item added successfully"}), 201
 
-    except Exception as e:
-        print("Error during menu item creation:", e)
-        conn.rollback()
-        return jsonify({"message": "An error occurred while creating the menu item"}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
-@app.route('/inventory', methods=['GET'])
+        except Exception as e:
+            print("Error during menu item creation:", e)
+            conn.rollback()
+            return jsonify({"message": "An error occurred while creating the menu item"}), 500
+        finally:
+            cursor.close()
+
+@api.route('/inventory', methods=['GET'])
 def get_inve(): ## call for getting inv
-    connect = get_db_connection() ## database connection
-    if connect is None:
-        return jsonify({"message": "Database error"}), 500 ## if cant connect
-    try:
-        with connect.cursor() as cursor:
-            cursor.execute("SELECT name, quantity, unit FROM inventory ORDER BY name ASC") ## ordering by alphabetical order of name query
-            inve = cursor.fetchall()
-            return jsonify([{"name": item[0], "quantity": item[1], "unit": item[2]} for item in inve]), 200 ## return from call
-    except Exception as e:
-        print("error", e)
-        return jsonify({"message": "error"}), 500 ## throw exceptions
-    finally:
-        connect.close() ## close connection
+    with get_db_connection() as connect:
+        try:
+            with connect.cursor() as cursor:
+                cursor.execute("SELECT name, quantity, unit FROM inventory ORDER BY name ASC") ## ordering by alphabetical order of name query
+                inve = cursor.fetchall()
+                return jsonify([{"name": item[0], "quantity": item[1], "unit": item[2]} for item in inve]), 200 ## return from call
+        except Exception as e:
+            print("error", e)
+            return jsonify({"message": "error"}), 500 ## throw exceptions
         
-@app.route('/inventory', methods=['POST'])
+@api.route('/inventory', methods=['POST'])
 def add_inve(): ## call for adding inv
     datainfo = request.get_json() ## requesting
     qty = datainfo.get('quantity') ## set to variable representing quanity
     name = datainfo.get('name') ## same for name and units
     unit = datainfo.get('unit') 
-    connect = get_db_connection()
-    if connect is None:
-        return jsonify({"message": "Database error"}), 500
-    try:
-        with connect.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO inventory (name, quantity, unit) VALUES (%s, %s, %s)", ## Query for adding
-                (name, qty, unit))
-            connect.commit()
-            return jsonify({"message": "Added "}), 201
-    except Exception as e:
-        print("error", e)
-        return jsonify({"message": "error"}), 500
-    finally:
-        connect.close()
-
-@app.route('/inventory/<string:name>', methods=['PUT'])
+    with get_db_connection() as connect:
+        try:
+            with connect.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO inventory (name, quantity, unit) VALUES (%s, %s, %s)", ## Query for adding
+                    (name, qty, unit))
+                record_manual_changes(cursor, {}, {name: qty}, "restock") ## opening stock goes in the ledger
+                connect.commit()
+                return jsonify({"message": "Added "}), 201
+        except Exception as e:
+            print("error", e)
+            return jsonify({"message": "error"}), 500
+
+@api.route('/inventory/<string:name>', methods=['PUT'])
 def updt_inve(name): ## call for updating
     datainfo = request.get_json() ## using variable for request
     unit = datainfo.get('unit')
     qty = datainfo.get('quantity')
-    connect = get_db_connection()
-    if connect is None:
-        return jsonify({"message": "Database error"}), 500
-    try:
-        with connect.cursor() as cursor:
-            cursor.execute(
-                "UPDATE inventory SET quantity = %s, unit = %s WHERE name = %s", ## query for updating
-                (qty, unit, name)) 
-            connect.commit()
-            return jsonify({"message": "Updated"}), 200
-    except Exception as e:
-        print("error:", e)
-        return jsonify({"message": "error"}), 500
-    finally:
-        connect.close()
-@app.route('/inventory/<string:name>', methods=['DELETE'])
+    reason = datainfo.get('reason', 'adjustment') ## restock, adjustment or waste, for the ledger
+    if reason not in MANUAL_REASONS:
+        return jsonify({"message": "error"}), 400
+    with get_db_connection() as connect:
+        try:
+            with connect.cursor() as cursor:
+                before = lock_quantities(cursor, [name])
+                cursor.execute(
+                    "UPDATE inventory SET quantity = %s, unit = %s WHERE name = %s", ## query for updating
+                    (qty, unit, name)) 
+                if before:
+                    record_manual_changes(cursor, before, {name: qty}, reason)
+                connect.commit()
+                return jsonify({"message": "Updated"}), 200
+        except Exception as e:
+            print("error:", e)
+            return jsonify({"message": "error"}), 500
+@api.route('/inventory/<string:name>', methods=['DELETE'])
 def del_inve(name): ## call for deleting
-    connect = get_db_connection()
-    if connect is None:
-        return jsonify({"message": "error"}), 500
-    try:
-        with connect.cursor() as cursor:
-            cursor.execute("DELETE FROM inventory WHERE name = %s", (name,)) ## query for deleting
-            connect.commit()
-            return jsonify({"message": "Deleted"}), 200
-    except Exception as e:
-        print("error:", e)
-        return jsonify({"message": "error"}), 500
-    finally:
-        connect.close()
+    with get_db_connection() as connect:
+        try:
+            with connect.cursor() as cursor:
+                before = lock_quantities(cursor, [name])
+                cursor.execute("DELETE FROM inventory WHERE name = %s", (name,)) ## query for deleting
+                record_manual_changes(cursor, before, {}, "adjustment") ## write off what was left
+                connect.commit()
+                return jsonify({"message": "Deleted"}), 200
+        except Exception as e:
+            print("error:", e)
+            return jsonify({"message": "error"}), 500
         
-@app.route('/get-customer-prices', methods=['GET'])
+@api.route('/get-customer-prices', methods=['GET'])
 def get_customer_prices():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT name, price FROM prices")
-            items = cursor.fetchall()
-            
-            prices = {
-                "Combo": {
-                    "Bowl": 0,
-                    "Plate": 0,
-                    "Bigger Plate": 0,
-                    "premiumUpcharge": 1.50
-                },
-                "A la Carte": {
-                    "regular": {"Small": 0, "Medium": 0, "Large": 0},
-                    "premium": {"Small": 0, "Medium": 0, "Large": 0}
-                },
-                "Appetizers": {"Small": 0, "Large": 0},
-                "Drinks": {"Small": 0, "Medium": 0, "Large": 0}
-            }
-            
-            # Map database names to price structure
-            for item in items:
-                name, price = item
-                if name == 'base_bowl':
-                    prices['Combo']['Bowl'] = float(price)
-                elif name == 'base_plate':
-                    prices['Combo']['Plate'] = float(price)
-                elif name == 'base_bigger_plate':
-                    prices['Combo']['Bigger Plate'] = float(price)
-                elif name == 'premium_upcharge':
-                    prices['Combo']['premiumUpcharge'] = float(price)
-                elif name == 'ala s reg':
-                    prices['A la Carte']['regular']['Small'] = float(price)
-                elif name == 'ala m reg':
-                    prices['A la Carte']['regular']['Medium'] = float(price)
-                elif name == 'ala l reg':
-                    prices['A la Carte']['regular']['Large'] = float(price)
-                elif name == 'ala s prem':
-                    prices['A la Carte']['premium']['Small'] = float(price)
-                elif name == 'ala m prem':
-                    prices['A la Carte']['premium']['Medium'] = float(price)
-                elif name == 'ala l prem':
-                    prices['A la Carte']['premium']['Large'] = float(price)
-                elif name == 'appetizer s':
-                    prices['Appetizers']['Small'] = float(price)
-                elif name == 'appetizer l':
-                    prices['Appetizers']['Large'] = float(price)
-                elif name == 'ftn drk s':
-                    prices['Drinks']['Small'] = float(price)
-                elif name == 'ftn drk m':
-                    prices['Drinks']['Medium'] = float(price)
-                elif name == 'ftn drk l':
-                    prices['Drinks']['Large'] = float(price)
-            
-            return jsonify(prices)
-            
+        prices = price_cache.get()
+        return cached_json(prices.customer, prices.customer_etag)
+
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"message": "Database error"}), 500
-    finally:
-        conn.close()
 
-@app.route("/menu-items", methods=["GET"])
-def get_menu_items():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
+MENU_ITEMS_QUERY = "SELECT name, type FROM items"
 
-    try:
-        cursor = conn.cursor()
+@api.route("/menu-items", methods=["GET"])
+def get_menu_items():
+    with get_db_connection() as conn:
+        try:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT name, type FROM items")
-        rows = cursor.fetchall()
+            cursor.execute(MENU_ITEMS_QUERY)
+            rows = cursor.fetchall()
 
-        items = [{"name": row[0], "type": row[1]} for row in rows]
+            items = [{"name": row[0], "type": row[1]} for row in rows]
 
-        return jsonify(items), 200
+            return jsonify(items), 200
 
-    except Exception as e:
-        print("Error fetching menu items:", e)
-        return jsonify({"message": "An error occurred while fetching menu items"}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        except Exception as e:
+            print("Error fetching menu items:", e)
+            return jsonify({"message": "An error occurred while fetching menu items"}), 500
+        finally:
+            cursor.close()
 
-@app.route('/get-sales-trends', methods=['GET'])
+@api.route('/get-sales-trends', methods=['GET'])
 def get_sales_trends():
+    """
+    Orders containing each item, per period, from start_date up to (not
+    including) end_date, read from the item_sales_daily rollup.
+
+    granularity: "day" (default), "week" or "month"; each point is dated
+    with the first day of its period
+    item_name: repeat to chart several items; omit (or leave empty) for all
+    """
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    item_name = request.args.get('item_name', '')
+    item_names = [name for name in request.args.getlist('item_name') if name]
+    granularity = request.args.get('granularity', 'day')
 
     if not start_date or not end_date:
         return jsonify({"message": "Start and end dates are required"}), 400
+    if granularity not in TREND_BUCKETS:
+        return jsonify({"message": f"granularity must be one of: {', '.join(TREND_BUCKETS)}"}), 400
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # SQL query for sales trends
-        query = """
-            SELECT o.order_date::date AS order_day, mi.item_name, COUNT(DISTINCT o.id) AS order_count
-            FROM orders o
-            JOIN meals m ON o.id = m.order_id
-            JOIN meal_item mi ON m.id = mi.meal_id
-            WHERE o.order_date BETWEEN %s AND %s
-        """
-        if item_name:
-            query += " AND mi.item_name = %s"
-
-        query += """
-            GROUP BY o.order_date::date, mi.item_name
-            ORDER BY o.order_date::date, mi.item_name
-        """
-        
-        params = [start_date, end_date]
-        if item_name:
-            params.append(item_name)
-
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            results = item_sales_trends(cursor, start_date, end_date, granularity, item_names)
 
         # Structure the data for frontend
         data = {}
-        for row in results:
-            order_day = row[0]
-            item_name = row[1]
-            order_count = row[2]
-
-            if item_name not in data:
-                data[item_name] = []
-            data[item_name].append({'date': order_day, 'count': order_count})
+        for bucket, item_name, order_count, servings in results:
+            data.setdefault(item_name, []).append({'date': bucket, 'count': order_count, 'servings': servings})
 
         return jsonify(data)
     
     except Exception as e:
         return jsonify({"message": str(e)}), 500
-    finally:
-        conn.close()
 
 # Route for X-Report (Hourly Sales Data)
-@app.route('/get-x-report', methods=['GET'])
+@api.route('/get-x-report', methods=['GET'])
 def get_x_report():
     # Use current date if report_date is not provided
     report_date = request.args.get('report_date', default=datetime.now().strftime('%Y-%m-%d'))  # Default to today
@@ -936,45 +1158,17 @@ def get_x_report():
         return jsonify({"error": "Missing parameters"}), 400
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # SQL query for X-Report (hourly sales)
-        query = """
-            SELECT order_date, total_price
-            FROM orders
-            WHERE order_date::date = %s
-            AND EXTRACT(HOUR FROM order_date) < %s
-        """
-        cursor.execute(query, [report_date, up_to_hour])
-        results = cursor.fetchall()
-
-        # Aggregate results by hour
-        hourly_sales = defaultdict(lambda: {"totalOrders": 0, "orderValue": 0.0})
-
-        for row in results:
-            order_hour = row[0].hour  # Assuming `row[0]` is a timestamp
-            total_price = float(row[1])  # Convert Decimal to float
-            hourly_sales[order_hour]["totalOrders"] += 1
-            hourly_sales[order_hour]["orderValue"] += total_price
-
-        # Prepare data for frontend
-        data = {
-            "hourly_sales": [
-                {"hour": hour, "totalOrders": values["totalOrders"], "orderValue": values["orderValue"]}
-                for hour, values in sorted(hourly_sales.items())
-            ]
-        }
+        with get_db_cursor() as cursor:
+            # Read the hourly rollup maintained by submit_order
+            data = {"hourly_sales": hourly_sales(cursor, report_date, up_to_hour)}
 
         return jsonify(data)
 
     except Exception as e:
         return jsonify({"message": str(e)}), 500
-    finally:
-        conn.close()
 
 # Route for Z-Report (Total Sales per Day or Item)
-@app.route('/get-z-report', methods=['GET'])
+@api.route('/get-z-report', methods=['GET'])
 def get_z_report():
     # Use current date if report_date is not provided
     report_date = request.args.get('report_date', default=datetime.now().strftime('%Y-%m-%d'))  # Default to today
@@ -984,171 +1178,271 @@ def get_z_report():
         return jsonify({"error": "Missing parameters"}), 400
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # SQL query for X-Report (hourly sales)
-        query = """
-            SELECT order_date, total_price
-            FROM orders
-            WHERE order_date::date = %s
-            AND EXTRACT(HOUR FROM order_date) < %s
-        """
-        cursor.execute(query, [report_date, up_to_hour])
-        results = cursor.fetchall()
-
-        # Aggregate results by hour
-        hourly_sales = defaultdict(lambda: {"totalOrders": 0, "orderValue": 0.0})
-
-        for row in results:
-            order_hour = row[0].hour  # Assuming `row[0]` is a timestamp
-            total_price = float(row[1])  # Convert Decimal to float
-            hourly_sales[order_hour]["totalOrders"] += 1
-            hourly_sales[order_hour]["orderValue"] += total_price
-
-        # Prepare data for frontend
-        data = {
-            "hourly_sales": [
-                {"hour": hour, "totalOrders": values["totalOrders"], "orderValue": values["orderValue"]}
-                for hour, values in sorted(hourly_sales.items())
-            ]
-        }
+        closed = date.fromisoformat(report_date) < date.today()
+    except ValueError:
+        return jsonify({"error": "Invalid report_date"}), 400
+
+    try:
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            if closed:
+                # Finished days are served from z_reports until a late order for the day drops it
+                closed_at, hourly, summary = z_report_snapshot(cursor, report_date)
+                conn.commit()
+                if up_to_hour < 24:
+                    hourly = [row for row in hourly if row["hour"] < up_to_hour]
+                    summary = summarize(hourly)
+            else:
+                closed_at = None
+                hourly = hourly_sales(cursor, report_date, up_to_hour)
+                summary = summarize(hourly)
+
+        data = {"hourly_sales": hourly, "closed": closed, "closed_at": closed_at}
+        data.update(summary)
 
         return jsonify(data)
 
     except Exception as e:
         return jsonify({"message": str(e)}), 500
-    finally:
-        conn.close()
 
-@app.route('/get-productusage', methods=['GET'])
+@api.route('/get-productusage', methods=['GET'])
 def get_productusage():
+    """
+    Ingredients used by orders from start_date up to (not including)
+    end_date, summed from the daily inventory ledger aggregate.
+    """
     start_date = request.args.get('start_date') 
     end_date = request.args.get('end_date')
     if not end_date or not start_date:
         return jsonify({"message": "error"}), 400
     try:
-        connection = get_db_connection()  # Database connection
-        if connection is None:
-            raise Exception("error")
-        cursor = connection.cursor()
-        query = """
-            SELECT ii.ingredient_name,
-                   SUM(ii.quantity_needed) AS total_used
-            FROM orders o
-            LEFT JOIN meals m ON o.id = m.order_id
-            LEFT JOIN meal_item mi ON mi.meal_id = m.id
-            LEFT JOIN item_ingredients ii ON mi.item_name = ii.item_name
-            WHERE o.order_date BETWEEN %s AND %s
-            GROUP BY ii.ingredient_name
-            ORDER BY ii.ingredient_name;
-        """
-        cursor.execute(query, (start_date + " 00:00:00", end_date + " 00:00:00"))
-        data = cursor.fetchall()
-        result = [{"ingredient_name": row[0], "total_used": row[1]} for row in data]
-        return jsonify(result), 200
+        with get_db_connection() as connection, connection.cursor() as cursor:
+            data = product_usage(cursor, start_date, end_date)
+            result = [{"ingredient_name": row[0], "total_used": float(row[1])} for row in data]
+            return jsonify(result), 200
     except Exception as e:
         return jsonify({"message": "error", "error": str(e)}), 500
-    finally:
-        if connection:
-            connection.close()
    
   
   
-@app.route('/orders', methods=['GET'])
+def encode_order_cursor(order_date, order_id):
+    raw = json.dumps([order_date.isoformat(), order_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_order_cursor(token):
+    order_date, order_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    return datetime.fromisoformat(order_date), int(order_id)
+
+def parse_date_bound(value, end=False):
+    """Parse a date or timestamp filter. A bare end date covers that whole day."""
+    bound = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        bound += timedelta(days=1)
+    return bound
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# largest page /orders serves
+ORDERS_LIMIT_MAX = 500
+
+@api.route('/orders', methods=['GET'])
 def get_orders():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
+    """
+    Order history, newest first.
+
+    Pagination: pass the "next_cursor" of the previous response as "after"
+    to get the following page. "page" (offset paging) still works but slows
+    down on deep pages.
 
+    Index-friendly filters: date_from, date_to (YYYY-MM-DD or ISO timestamp,
+    inclusive), price_min, price_max, employee_id, customer_prefix.
+    The older substring filters (customer, date, employee, price) are still
+    accepted but cannot use an index.
+    """
     try:
-        page = int(request.args.get('page', 0))
         limit = int(request.args.get('limit', 10))
-        offset = page * limit
+        page = int(request.args.get('page', 0))
+        after = request.args.get('after')
+        if not 1 <= limit <= ORDERS_LIMIT_MAX:
+            raise ValueError(f"limit must be between 1 and {ORDERS_LIMIT_MAX}")
+        if page < 0:
+            raise ValueError("page must not be negative")
+
+        conditions = []
+        params = []
+
+        if after:
+            after_date, after_id = decode_order_cursor(after)
+            conditions.append("(o.order_date, o.id) < (%s, %s)")
+            params.extend([after_date, after_id])
+
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        price_min = request.args.get('price_min', type=float)
+        price_max = request.args.get('price_max', type=float)
+        employee_id = request.args.get('employee_id', type=int)
+        customer_prefix = request.args.get('customer_prefix')
+
+        if date_from:
+            conditions.append("o.order_date >= %s")
+            params.append(parse_date_bound(date_from))
+        if date_to:
+            conditions.append("o.order_date < %s" if len(date_to) == 10 else "o.order_date <= %s")
+            params.append(parse_date_bound(date_to, end=True))
+        if price_min is not None:
+            conditions.append("o.total_price >= %s")
+            params.append(price_min)
+        if price_max is not None:
+            conditions.append("o.total_price <= %s")
+            params.append(price_max)
+        if employee_id is not None:
+            conditions.append("o.employee_id = %s")
+            params.append(employee_id)
+        if customer_prefix:
+            conditions.append("lower(o.customer_name) LIKE %s")
+            params.append(escape_like(customer_prefix.lower()) + "%")
 
         customer_filter = request.args.get('customer', '')
         date_filter = request.args.get('date', '')
         employee_filter = request.args.get('employee', '')
         price_filter = request.args.get('price', '')
 
-        with conn.cursor() as cursor:
-            query = """
-                SELECT 
-                    o.id,  -- Include the order ID
-                    o.customer_name, 
-                    o.order_date, 
-                    e.first_name AS employee_first_name, 
-                    e.last_name AS employee_last_name, 
-                    o.total_price 
-                FROM orders o
-                JOIN employees e ON o.employee_id = e.id
-                WHERE o.customer_name ILIKE %s
-                  AND (TO_CHAR(o.order_date, 'MM/DD/YYYY HH24:MI:SS') ILIKE %s
-                       OR TO_CHAR(o.order_date, 'YYYY-MM-DD') ILIKE %s)
-                  AND (e.first_name || ' ' || e.last_name) ILIKE %s
-                  AND CAST(o.total_price AS TEXT) ILIKE %s
-                ORDER BY o.order_date DESC
-                LIMIT %s OFFSET %s
-            """
-            cursor.execute(query, (
-                f"%{customer_filter}%",
-                f"%{date_filter}%",
-                f"%{date_filter}%",
-                f"%{employee_filter}%",
-                f"%{price_filter}%",
-                limit,
-                offset
-            ))
-            orders = cursor.fetchall()
-            result = [
-                {
-                    "id": order[0],
-                    "customer_name": order[1],
-                    "order_date": order[2],
-                    "employee_first_name": order[3],
-                    "employee_last_name": order[4],
-                    "total_price": order[5]
-                }
-                for order in orders
-            ]
-            return jsonify({"orders": result}), 200
-    except Exception as e:
-        print("Error fetching orders:", e)
-        return jsonify({"message": "An error occurred while fetching orders"}), 500
-    finally:
-        conn.close()
+        if customer_filter:
+            conditions.append("o.customer_name ILIKE %s")
+            params.append(f"%{customer_filter}%")
+        if date_filter:
+            conditions.append("(TO_CHAR(o.order_date, 'MM/DD/YYYY HH24:MI:SS') ILIKE %s"
+                              " OR TO_CHAR(o.order_date, 'YYYY-MM-DD') ILIKE %s)")
+            params.extend([f"%{date_filter}%", f"%{date_filter}%"])
+        if employee_filter:
+            conditions.append("(e.first_name || ' ' || e.last_name) ILIKE %s")
+            params.append(f"%{employee_filter}%")
+        if price_filter:
+            conditions.append("CAST(o.total_price AS TEXT) ILIKE %s")
+            params.append(f"%{price_filter}%")
+    except (TypeError, ValueError) as e:
+        return jsonify({"message": f"Invalid query parameter: {e}"}), 400
+
+    query = sql.SQL("""
+        SELECT 
+            o.id,  -- Include the order ID
+            o.customer_name, 
+            o.order_date, 
+            e.first_name AS employee_first_name, 
+            e.last_name AS employee_last_name, 
+            o.total_price 
+        FROM orders o
+        JOIN employees e ON o.employee_id = e.id
+        {where}
+        ORDER BY o.order_date DESC, o.id DESC
+        LIMIT %s {offset}
+    """).format(
+        where=sql.SQL("WHERE ") + sql.SQL(" AND ").join(map(sql.SQL, conditions)) if conditions else sql.SQL(""),
+        offset=sql.SQL("") if after else sql.SQL("OFFSET %s")
+    )
+    params.append(limit)
+    if not after:
+        params.append(page * limit)
+
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                orders = cursor.fetchall()
+                result = [
+                    {
+                        "id": order[0],
+                        "customer_name": order[1],
+                        "order_date": order[2],
+                        "employee_first_name": order[3],
+                        "employee_last_name": order[4],
+                        "total_price": order[5]
+                    }
+                    for order in orders
+                ]
+                next_cursor = encode_order_cursor(orders[-1][2], orders[-1][0]) if len(orders) == limit else None
+                return jsonify({"orders": result, "next_cursor": next_cursor}), 200
+        except Exception as e:
+            print("Error fetching orders:", e)
+            return jsonify({"message": "An error occurred while fetching orders"}), 500
+
+@api.route('/orders/export', methods=['GET'])
+def export_order_history():
+    """
+    Stream orders with their meals and meal items for a date range.
 
-@app.route('/orders/<int:order_id>/details', methods=['GET'])
-def get_order_details(order_id):
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection error"}), 500
+    date_from, date_to: YYYY-MM-DD or ISO timestamp, inclusive, both optional
+    format: "csv" (one row per meal item, default) or "ndjson" (one order per line)
+    gzip: "1" to receive a .gz file
 
+    Rows are read through a server-side cursor and written out as they
+    arrive, so memory use does not depend on the size of the range.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"message": f"Unsupported format '{fmt}', use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    compress = request.args.get('gzip') in ('1', 'true')
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT m.meal_type, mi.item_name
-                FROM meals m
-                JOIN meal_item mi ON m.id = mi.meal_id
-                WHERE m.order_id = %s
-            """, (order_id,))
-            results = cursor.fetchall()
-
-            meal_details = {}
-            for meal_type, item_name in results:
-                if meal_type not in meal_details:
-                    meal_details[meal_type] = []
-                meal_details[meal_type].append(item_name)
-
-            formatted_details = [{"meal_type": key, "items": value} for key, value in meal_details.items()]
-
-            return jsonify({"details": formatted_details}), 200
-    except Exception as e:
-        print("Error fetching order details:", e)
-        return jsonify({"message": "An error occurred while fetching order details"}), 500
-    finally:
-        conn.close()
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        start = parse_date_bound(date_from) if date_from else None
+        end = parse_date_bound(date_to, end=True) if date_to else None
+        if end is not None and len(date_to) != 10:
+            end += timedelta(microseconds=1)
+    except ValueError as e:
+        return jsonify({"message": f"Invalid query parameter: {e}"}), 400
+
+    chunks = export_orders(get_db_connection, start, end, fmt, compress)
+    try:
+        first = next(chunks)
+    except psycopg2.Error as e:
+        print("Error exporting orders:", e)
+        return jsonify({"message": "An error occurred while exporting orders"}), 500
+
+    def stream():
+        try:
+            yield first
+            yield from chunks
+        except Exception as e:
+            # the status line is already sent; the client sees a truncated file
+            print("Error streaming order export:", e)
+        finally:
+            chunks.close()
+
+    filename = f"orders_{date_from or 'start'}_{date_to or 'now'}.{fmt}" + (".gz" if compress else "")
+    return Response(stream(), mimetype="application/gzip" if compress else EXPORT_FORMATS[fmt][0], headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+    })
+
+@api.route('/orders/<int:order_id>/details', methods=['GET'])
+def get_order_details(order_id):
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT m.meal_type, mi.item_name
+                    FROM meals m
+                    JOIN meal_item mi ON m.id = mi.meal_id
+                    WHERE m.order_id = %s
+                """, (order_id,))
+                results = cursor.fetchall()
+
+                meal_details = {}
+                for meal_type, item_name in results:
+                    if meal_type not in meal_details:
+                        meal_details[meal_type] = []
+                    meal_details[meal_type].append(item_name)
+
+                formatted_details = [{"meal_type": key, "items": value} for key, value in meal_details.items()]
+
+                return jsonify({"details": formatted_details}), 200
+        except Exception as e:
+            print("Error fetching order details:", e)
+            return jsonify({"message": "An error occurred while fetching order details"}), 500
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000)) 
-    app.run(host='0.0.0.0', port=port)
\ No newline at end of file
+    warm_worker()
+    create_app().run(host='0.0.0.0', port=port)
@@ -0,0 +1,493 @@
+"""
+ASGI serving mode:
+
+    uvicorn asgi:app --app-dir backend --workers 2
+
+The read-heavy menu, price, report, translation and chat routes are
+served by coroutines on an async Postgres pool (psycopg 3) with async
+outbound HTTP (httpx), so slow upstream calls, streamed chat replies and
+many concurrent kiosk reads share one event loop instead of pinning a
+thread each. Every other route is the Flask app from app.py, run on a
+thread pool; responses are the same in both modes.
+"""
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import httpx
+import openai
+from a2wsgi import WSGIMiddleware
+from psycopg import AsyncCursor
+from psycopg_pool import AsyncConnectionPool
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags
+
+from app import (
+    CORS_ORIGINS, MENU_ITEMS_QUERY, chat_cache, chat_model, chat_session_ttl, chat_timeout, chat_window,
+    compress_min_size, create_app, db_host, db_name, db_password, db_port, db_user, google_translate_api_key,
+    google_translate_api_url, openai_key, price_cache, restock_query, restock_rows, shutdown, warm_worker,
+)
+from chat import (
+    SESSION_LOAD_QUERY, SESSION_SAVE_QUERY, SSE_HEADERS, STREAM_DONE, add_messages, build_conversation, cache_key,
+    completion_deltas, parse_stream_line, sse,
+)
+from encoding import choose_encoding, compress_body, compressible
+from ledger import PRODUCT_USAGE_QUERY
+from metrics import begin_request, end_request, record_outbound, record_statement
+from prices import PRICES_QUERY, PriceTable
+from rollups import HOURLY_SALES_QUERY, TREND_BUCKETS, hourly_sales_rows, item_sales_trends_query
+from translations import AsyncTranslator, TranslationError
+
+
+class InstrumentedAsyncCursor(AsyncCursor):
+    """AsyncCursor that reports every statement's duration to the current request."""
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            record_statement(time.perf_counter() - started)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            record_statement(time.perf_counter() - started)
+
+
+class TimedTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records each call under ``target``, like metrics.TimedSession."""
+
+    def __init__(self, target, transport=None):
+        self.target = target
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self.transport.handle_async_request(request)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            record_outbound(self.target, outcome, time.perf_counter() - started)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+flask_app = create_app()
+
+db_pool = AsyncConnectionPool(
+    min_size=int(os.getenv("ASGI_DB_POOL_MIN", 1)),
+    max_size=int(os.getenv("ASGI_DB_POOL_MAX", 10)),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+    max_idle=float(os.getenv("ASGI_DB_POOL_MAX_IDLE", 600)),
+    check=AsyncConnectionPool.check_connection,
+    kwargs={
+        "user": db_user,
+        "password": db_password,
+        "host": db_host,
+        "port": db_port,
+        "dbname": db_name,
+        "cursor_factory": InstrumentedAsyncCursor,
+    },
+    open=False
+)
+
+
+@asynccontextmanager
+async def db_cursor():
+    async with db_pool.connection() as conn, conn.cursor() as cursor:
+        yield cursor
+
+
+async def load_prices(cursor):
+    await cursor.execute(PRICES_QUERY)
+    return PriceTable(await cursor.fetchall())
+
+
+http_client = httpx.AsyncClient(transport=TimedTransport("google_translate"))
+openai_client = httpx.AsyncClient(
+    base_url=openai.api_base,
+    headers={"Authorization": f"Bearer {openai_key}"},
+    timeout=chat_timeout,
+    transport=TimedTransport("openai")
+)
+
+translator = AsyncTranslator(
+    db_pool.connection,
+    google_translate_api_key,
+    http_client,
+    api_url=google_translate_api_url,
+    cache_size=int(os.getenv("TRANSLATION_CACHE_SIZE", 5000))
+)
+
+
+def json_response(payload, status=200):
+    """What jsonify() would send, encoded by the Flask app's JSON provider."""
+    body = flask_app.json.response(payload).get_data()
+    return Response(body, status, media_type="application/json")
+
+
+def compress(request, response):
+    """encoding.compress_responses() for the async routes."""
+    if isinstance(response, StreamingResponse) or not compressible(response.media_type):
+        return
+    if compress_min_size < 0 or response.status_code in (204, 304) or "content-encoding" in response.headers:
+        return
+    response.headers["vary"] = "Accept-Encoding"
+    if len(response.body) < compress_min_size:
+        return
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding is None:
+        return
+    response.body = compress_body(response.body, encoding)
+    response.headers["content-length"] = str(len(response.body))
+    response.headers["content-encoding"] = encoding
+    etag = response.headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        response.headers["etag"] = "W/" + etag
+
+
+def cached_json(request, payload, etag):
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if parse_etags(request.headers.get("if-none-match")).contains_weak(etag):
+        return Response(status_code=304, headers=headers)
+    response = json_response(payload)
+    response.headers.update(headers)
+    return response
+
+
+def query_arg(request, name, type=str, default=None):
+    """request.args.get() semantics: ``default`` when missing or not convertible."""
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        return type(value)
+    except ValueError:
+        return default
+
+
+def route(path, methods=("GET",)):
+    """Register an async endpoint, accounted in /metrics like the Flask routes."""
+    def register(handler):
+        async def endpoint(request):
+            started = begin_request(path)
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                compress(request, response)
+                return response
+            finally:
+                end_request(started, request.method, status)
+        routes.append(Route(path, endpoint, methods=list(methods)))
+        return handler
+    return register
+
+
+routes = []
+
+
+@route("/menu-items")
+async def get_menu_items(request):
+    try:
+        async with db_cursor() as cursor:
+            await cursor.execute(MENU_ITEMS_QUERY)
+            rows = await cursor.fetchall()
+        return json_response([{"name": row[0], "type": row[1]} for row in rows])
+    except Exception as e:
+        print("Error fetching menu items:", e)
+        return json_response({"message": "An error occurred while fetching menu items"}, 500)
+
+
+@route("/view-prices")
+async def view_prices(request):
+    try:
+        prices = await price_cache.get_async(db_cursor, load_prices)
+        return cached_json(request, prices.rows, prices.rows_etag)
+    except Exception as e:
+        print("Error during fetching prices:", e)
+        return json_response({"message": "An error occurred while fetching prices"}, 500)
+
+
+@route("/get-customer-prices")
+async def get_customer_prices(request):
+    try:
+        prices = await price_cache.get_async(db_cursor, load_prices)
+        return cached_json(request, prices.customer, prices.customer_etag)
+    except Exception as e:
+        print(f"Error: {e}")
+        return json_response({"message": "Database error"}, 500)
+
+
+@route("/inventory-restock-info")
+async def get_restock_info(request):
+    limit = query_arg(request, "limit", int)
+    min_priority = query_arg(request, "min_priority", float)
+    if limit is not None and limit < 0:
+        return json_response({"message": "Invalid query parameter: limit must not be negative"}, 400)
+
+    try:
+        async with db_cursor() as cursor:
+            await cursor.execute(*restock_query(limit, min_priority))
+            return json_response(restock_rows(await cursor.fetchall()))
+    except Exception as e:
+        print("Error fetching restock information:", e)
+        return json_response({"message": "An error occurred while fetching restock information"}, 500)
+
+
+@route("/get-sales-trends")
+async def get_sales_trends(request):
+    start_date = request.query_params.get("start_date")
+    end_date = request.query_params.get("end_date")
+    item_names = [name for name in request.query_params.getlist("item_name") if name]
+    granularity = request.query_params.get("granularity", "day")
+
+    if not start_date or not end_date:
+        return json_response({"message": "Start and end dates are required"}, 400)
+    if granularity not in TREND_BUCKETS:
+        return json_response({"message": f"granularity must be one of: {', '.join(TREND_BUCKETS)}"}, 400)
+
+    try:
+        async with db_cursor() as cursor:
+            await cursor.execute(*item_sales_trends_query(start_date, end_date, granularity, item_names))
+            results = await cursor.fetchall()
+
+        data = {}
+        for bucket, item_name, order_count, servings in results:
+            data.setdefault(item_name, []).append({'date': bucket, 'count': order_count, 'servings': servings})
+        return json_response(data)
+    except Exception as e:
+        return json_response({"message": str(e)}, 500)
+
+
+@route("/get-x-report")
+async def get_x_report(request):
+    report_date = query_arg(request, "report_date", default=datetime.now().strftime('%Y-%m-%d'))
+    up_to_hour = query_arg(request, "up_to_hour", int)
+
+    if not report_date or not up_to_hour:
+        return json_response({"error": "Missing parameters"}, 400)
+
+    try:
+        async with db_cursor() as cursor:
+            await cursor.execute(HOURLY_SALES_QUERY, (report_date, up_to_hour))
+            hourly = hourly_sales_rows(await cursor.fetchall())
+        return json_response({"hourly_sales": hourly})
+    except Exception as e:
+        return json_response({"message": str(e)}, 500)
+
+
+@route("/get-productusage")
+async def get_productusage(request):
+    start_date = request.query_params.get("start_date")
+    end_date = request.query_params.get("end_date")
+    if not end_date or not start_date:
+        return json_response({"message": "error"}, 400)
+    try:
+        async with db_cursor() as cursor:
+            await cursor.execute(PRODUCT_USAGE_QUERY, (start_date, end_date))
+            data = await cursor.fetchall()
+        return json_response([{"ingredient_name": row[0], "total_used": float(row[1])} for row in data])
+    except Exception as e:
+        return json_response({"message": "error", "error": str(e)}, 500)
+
+
+@route("/get-translation", methods=("POST",))
+async def get_translated_word(request):
+    try:
+        data = await request.json()
+        english_word = data.get("en")
+
+        if not english_word or not isinstance(english_word, str):
+            return json_response({"message": "Invalid English word"}, 400)
+
+        translations, failed = await translator.translate([english_word])
+        if english_word in translations:
+            return json_response({"es": translations[english_word]})
+
+        error = failed[english_word]
+        if isinstance(error, TranslationError):
+            return json_response({"error": "Translation failed", "details": error.details}, error.status_code)
+        raise error
+
+    except Exception as e:
+        print("Error getting or adding translation:", e)
+        return json_response({"message": "An error occurred while processing translation"}, 500)
+
+
+@route("/get-translations", methods=("POST",))
+async def get_translated_words(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    words = data.get("en") if isinstance(data, dict) else None
+
+    if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+        return json_response({"message": "'en' must be a list of strings"}, 400)
+
+    try:
+        translations, failed = await translator.translate(words)
+    except Exception as e:
+        print("Error getting or adding translations:", e)
+        return json_response({"message": "An error occurred while processing translation"}, 500)
+
+    if failed:
+        print("Translations failed for", len(failed), "strings:", next(iter(failed.values())))
+    status = 502 if failed and not translations else 200
+    return json_response({"translations": translations, "failed": list(failed)}, status)
+
+
+async def chat_request(request):
+    """app.chat_request() for the async routes."""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    conversation = build_conversation(data)
+    session_id = data.get("session_id")
+    if session_id is None:
+        return None, None, chat_window.conversation(conversation)
+
+    async with db_cursor() as cursor:
+        await cursor.execute(SESSION_LOAD_QUERY, (str(session_id), chat_session_ttl))
+        row = await cursor.fetchone()
+        if row is None:
+            raise LookupError("Chat session not found or expired")
+        state = chat_window.trim(add_messages(row[0], conversation))
+        # stored before the model call, as in app.chat_request()
+        await cursor.execute(SESSION_SAVE_QUERY, (str(session_id), json.dumps(state)))
+    return session_id, state, chat_window.messages(state)
+
+
+async def save_chat_reply(session_id, state, reply):
+    if session_id is None:
+        return
+    chat_window.trim(add_messages(state, [{"role": "assistant", "content": reply}]))
+    async with db_cursor() as cursor:
+        await cursor.execute(SESSION_SAVE_QUERY, (str(session_id), json.dumps(state)))
+
+
+def completion_error(response):
+    return json_response({"error with open ai": f"{response.status_code}: {response.text}"}, 500)
+
+
+@route("/chat", methods=("POST",))
+async def chat(request):
+    try:
+        session_id, state, conversation = await chat_request(request)
+    except ValueError as e:
+        return json_response({"message": str(e)}, 400)
+    except LookupError as e:
+        return json_response({"message": str(e)}, 404)
+
+    key = cache_key(chat_model, conversation)
+    cached = chat_cache.get(key)
+    if cached is not None:
+        await save_chat_reply(session_id, state, cached)
+        return json_response({"response": cached, "cached": True})
+
+    try:
+        response = await openai_client.post("/chat/completions", json={"model": chat_model, "messages": conversation})
+        if response.status_code != 200:
+            return completion_error(response)
+        reply = response.json()["choices"][0]["message"]["content"]
+    except Exception as e:
+        return json_response({"error with open ai": str(e)}, 500)
+    chat_cache.put(key, reply)
+    await save_chat_reply(session_id, state, reply)
+    return json_response({"response": reply})
+
+
+@route("/chat/stream", methods=("POST",))
+async def chat_stream(request):
+    """app.chat_stream() relayed from the provider's event stream without a thread per conversation."""
+    try:
+        session_id, state, conversation = await chat_request(request)
+    except ValueError as e:
+        return json_response({"message": str(e)}, 400)
+    except LookupError as e:
+        return json_response({"message": str(e)}, 404)
+
+    key = cache_key(chat_model, conversation)
+    cached = chat_cache.get(key)
+    if cached is not None:
+        await save_chat_reply(session_id, state, cached)
+        events = [sse({"delta": cached}), sse({"response": cached, "cached": True}, "done")]
+        return StreamingResponse(iter(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    upstream_request = openai_client.build_request(
+        "POST", "/chat/completions", json={"model": chat_model, "messages": conversation, "stream": True})
+    try:
+        upstream = await openai_client.send(upstream_request, stream=True)
+    except Exception as e:
+        return json_response({"error with open ai": str(e)}, 500)
+    if upstream.status_code != 200:
+        await upstream.aread()
+        await upstream.aclose()
+        return completion_error(upstream)
+
+    async def chunks():
+        async for line in upstream.aiter_lines():
+            chunk = parse_stream_line(line)
+            if chunk is STREAM_DONE:
+                return
+            if chunk is not None:
+                yield chunk
+
+    async def relay():
+        parts = []
+        try:
+            async for chunk in chunks():
+                for delta in completion_deltas([chunk]):
+                    parts.append(delta)
+                    yield sse({"delta": delta})
+        except Exception as e:
+            print("Error streaming chat reply:", e)
+            yield sse({"error": str(e)}, "error")
+            return
+        finally:
+            # also runs when the client goes away, which stops the generation upstream
+            await upstream.aclose()
+        reply = "".join(parts)
+        chat_cache.put(key, reply)
+        try:
+            await save_chat_reply(session_id, state, reply)
+        except Exception as e:
+            print("Error saving chat session:", e)
+        yield sse({"response": reply, "cached": False}, "done")
+
+    return StreamingResponse(relay(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@asynccontextmanager
+async def lifespan(_):
+    await db_pool.open()
+    await asyncio.to_thread(warm_worker)
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(shutdown)
+        await http_client.aclose()
+        await openai_client.aclose()
+        await db_pool.close()
+
+
+app = Starlette(
+    routes=routes + [Mount("/", WSGIMiddleware(flask_app, workers=int(os.getenv("ASGI_WSGI_THREADS", 10))))],
+    middleware=[Middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan
+)
@@ -0,0 +1,70 @@
+from numbers import Real
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+
+def validate_updates(rows, value_key):
+    """
+    Check a JSON list of {"name": ..., <value_key>: ...} objects before any of
+    it is applied. Returns ({name: value}, errors); a later row for the same
+    name replaces an earlier one.
+    """
+    updates = {}
+    errors = []
+
+    if not isinstance(rows, list):
+        return updates, [{"index": None, "error": "Expected a list of updates"}]
+
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({"index": index, "error": "Each update must be an object"})
+            continue
+
+        name = row.get("name")
+        value = row.get(value_key)
+        if not isinstance(name, str) or not name:
+            errors.append({"index": index, "error": "Missing 'name'"})
+        elif isinstance(value, bool) or not isinstance(value, Real):
+            errors.append({"index": index, "name": name, "error": f"'{value_key}' must be a number"})
+        else:
+            updates[name] = value
+
+    return updates, errors
+
+
+def apply_updates(cursor, table, key_column, value_column, updates):
+    """
+    Set ``value_column`` for every {key: value} in ``updates`` with a single
+    UPDATE ... FROM (VALUES ...). Returns the set of keys that matched a row.
+    """
+    if not updates:
+        return set()
+
+    query = sql.SQL("""
+        UPDATE {table} AS t
+        SET {value} = v.value
+        FROM (VALUES %s) AS v (key, value)
+        WHERE t.{key} = v.key
+        RETURNING t.{key}
+    """).format(
+        table=sql.Identifier(table),
+        key=sql.Identifier(key_column),
+        value=sql.Identifier(value_column)
+    )
+    matched = execute_values(
+        cursor,
+        query.as_string(cursor),
+        list(updates.items()),
+        page_size=len(updates),
+        fetch=True
+    )
+    return {row[0] for row in matched}
+
+
+def update_results(updates, matched):
+    """Per-row outcome for a response body."""
+    return [
+        {"name": name, "status": "updated" if name in matched else "not_found"}
+        for name in updates
+    ]
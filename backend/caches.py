@@ -0,0 +1,158 @@
+import threading
+import time
+
+
+def bump_version(cursor, name):
+    """
+    Mark the cache called ``name`` stale in every worker. Call inside the
+    transaction that changes the underlying data so the bump commits with it.
+    """
+    cursor.execute(
+        """
+        INSERT INTO cache_versions (name, version) VALUES (%s, 1)
+        ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1
+        RETURNING version
+        """,
+        (name,)
+    )
+    return cursor.fetchone()[0]
+
+
+VERSION_QUERY = "SELECT version FROM cache_versions WHERE name = %s"
+
+
+def read_version(cursor, name):
+    cursor.execute(VERSION_QUERY, (name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+class VersionedCache:
+    """
+    Per-process copy of a table that rarely changes.
+
+    ``loader(cursor)`` builds the cached value. The value is stamped with the
+    row in cache_versions named ``name`` at load time; ``get()`` compares that
+    stamp with the database at most every ``check_interval`` seconds and
+    reloads when another worker (or this one) has bumped it.
+
+    ``connect()`` must return a context manager yielding a cursor. It is only
+    entered when ``get()`` is called without a cursor and a version check or
+    reload is due, so hits never touch the database.
+    """
+
+    def __init__(self, name, loader, connect, check_interval=2.0):
+        self.name = name
+        self.loader = loader
+        self.connect = connect
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._invalidations = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+
+    def _due(self):
+        return self._stale or time.monotonic() - self._checked_at >= self.check_interval
+
+    def get(self, cursor=None):
+        with self._lock:
+            if not self._due():
+                self._hits += 1
+                return self._value
+
+        # borrow the connection before taking the lock so a thread holding
+        # the lock never waits on the pool
+        if cursor is None:
+            with self.connect() as cursor:
+                return self._refresh(cursor)
+        return self._refresh(cursor)
+
+    def _refresh(self, cursor):
+        with self._lock:
+            if not self._stale and self._due():
+                self._stale = read_version(cursor, self.name) != self._version
+                self._checked_at = time.monotonic()
+
+            if self._stale:
+                self._misses += 1
+                self._reload(cursor)
+            else:
+                self._hits += 1
+            return self._value
+
+    def _reload(self, cursor):
+        version = read_version(cursor, self.name)
+        self._value = self.loader(cursor)
+        self._version = version
+        self._checked_at = time.monotonic()
+        self._stale = False
+        self._reloads += 1
+
+    async def get_async(self, connect, loader):
+        """
+        ``get()`` for asyncio code, sharing this cache's value with the
+        threads that use ``get()``. ``connect()`` is an async context manager
+        yielding an async cursor and ``loader(cursor)`` a coroutine building
+        the same value as ``self.loader``. The database is awaited outside
+        the lock, so a load racing ``invalidate()`` stays stale.
+        """
+        with self._lock:
+            if not self._due():
+                self._hits += 1
+                return self._value
+            invalidations = self._invalidations
+
+        async with connect() as cursor:
+            await cursor.execute(VERSION_QUERY, (self.name,))
+            row = await cursor.fetchone()
+            version = row[0] if row else 0
+            with self._lock:
+                if not self._stale and version == self._version:
+                    self._checked_at = time.monotonic()
+                    self._hits += 1
+                    return self._value
+            value = await loader(cursor)
+
+        with self._lock:
+            self._misses += 1
+            self._reloads += 1
+            self._value = value
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._stale = self._invalidations != invalidations
+            return value
+
+    def load(self, cursor=None):
+        """Unconditionally (re)load, e.g. at startup."""
+        if cursor is None:
+            with self.connect() as cursor:
+                return self.load(cursor)
+        with self._lock:
+            self._reload(cursor)
+
+    def invalidate(self):
+        """Drop this worker's copy; the next get() reloads."""
+        with self._lock:
+            self._stale = True
+            self._invalidations += 1
+
+    @property
+    def version(self):
+        return self._version
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self._version,
+                "loaded": self._version is not None,
+                "hits": self._hits,
+                "misses": self._misses,
+                "reloads": self._reloads,
+            }
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Frontend "sender" -> chat completion role; anything else is the assistant
+ROLES = {"user": "user", "system": "system"}
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# returned by parse_stream_line() for the provider's final "[DONE]"
+STREAM_DONE = object()
+
+# Rough token count without a tokenizer: about 4 characters per token for
+# English, plus the per-message framing the chat format adds
+CHARS_PER_TOKEN = 4
+MESSAGE_TOKENS = 4
+# How much of each turn dropped from the window is kept in the summary
+SUMMARY_LINE_CHARS = 160
+SUMMARY_HEADER = "Earlier in this conversation:\n"
+SUMMARY_HEADER_TOKENS = len(SUMMARY_HEADER) // CHARS_PER_TOKEN + 1 + MESSAGE_TOKENS
+
+SESSION_LOAD_QUERY = """
+    SELECT state FROM chat_sessions
+    WHERE id = %s AND updated_at > now() - %s * interval '1 second'
+"""
+SESSION_SAVE_QUERY = """
+    INSERT INTO chat_sessions (id, state, updated_at) VALUES (%s, %s::jsonb, now())
+    ON CONFLICT (id) DO UPDATE SET state = EXCLUDED.state, updated_at = now()
+"""
+SESSION_DELETE_QUERY = "DELETE FROM chat_sessions WHERE id = %s"
+# idle sessions past the TTL, then the least recently used beyond the cap
+SESSION_EXPIRE_QUERY = """
+    DELETE FROM chat_sessions
+    WHERE updated_at < now() - %s * interval '1 second'
+       OR id IN (SELECT id FROM chat_sessions ORDER BY updated_at DESC OFFSET %s)
+"""
+
+
+def normalize_question(text):
+    """'Is the Orange Chicken spicy?!' -> 'is the orange chicken spicy'"""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", text.lower())).strip()
+
+
+def build_conversation(data):
+    """
+    The frontend's {"messages": [{"sender", "text"}]} body as chat completion
+    messages. Raises ValueError when it is malformed.
+    """
+    try:
+        conversation = [{"role": ROLES.get(message["sender"], "assistant"), "content": str(message["text"])}
+                        for message in (data or {}).get("messages", [])]
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError("messages must be a list of {sender, text} objects") from e
+    if not conversation:
+        raise ValueError("messages must not be empty")
+    return conversation
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def new_session():
+    """Session state: the system prompt, summary lines of trimmed turns and the recent turns."""
+    return {"system": None, "summary": [], "turns": []}
+
+
+def add_messages(state, conversation):
+    """Append chat completion messages to a session; a system message replaces the session's prompt."""
+    for message in conversation:
+        if message["role"] == "system":
+            state["system"] = message["content"]
+        else:
+            state["turns"].append(message)
+    return state
+
+
+class ContextWindow:
+    """
+    Token budget for what is sent to the model from a conversation.
+
+    ``trim()`` keeps the system prompt and the most recent turns that fit in
+    ``max_tokens``, and folds the turns it drops into summary lines (the
+    start of each dropped turn) capped at ``summary_tokens``, oldest lines
+    going first. The latest turn is always kept, cut to what fits if it is
+    larger than the whole budget. A trimmed session is all that is stored,
+    so its size stays bounded however long the conversation runs.
+    """
+
+    def __init__(self, max_tokens=2000, summary_tokens=300):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+
+    def trim(self, state):
+        turns = state["turns"]
+        costs = [estimate_tokens(message["content"]) + MESSAGE_TOKENS for message in turns]
+        budget = self.max_tokens - (estimate_tokens(state["system"]) + MESSAGE_TOKENS if state["system"] else 0)
+        if state["summary"] or sum(costs) > budget:
+            budget -= self.summary_tokens + SUMMARY_HEADER_TOKENS
+
+        kept, used = 0, 0
+        for cost in reversed(costs):
+            if kept and used + cost > budget:
+                break
+            used += cost
+            kept += 1
+
+        dropped, state["turns"] = turns[:len(turns) - kept], turns[len(turns) - kept:]
+        if dropped:
+            self._summarize(state, dropped)
+        if state["turns"]:
+            latest = state["turns"][-1]
+            room = max(self.max_tokens - MESSAGE_TOKENS, 1) * CHARS_PER_TOKEN
+            if len(latest["content"]) > room:
+                state["turns"][-1] = {**latest, "content": latest["content"][:room]}
+        return state
+
+    def _summarize(self, state, dropped):
+        lines = state["summary"]
+        for message in dropped:
+            text = " ".join(message["content"].split())
+            if len(text) > SUMMARY_LINE_CHARS:
+                text = text[:SUMMARY_LINE_CHARS - 3] + "..."
+            lines.append(f"{message['role']}: {text}")
+        while lines and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+
+    def messages(self, state):
+        """The chat completion messages for a trimmed session."""
+        messages = [{"role": "system", "content": state["system"]}] if state["system"] else []
+        if state["summary"]:
+            summary = "\n".join(state["summary"])
+            messages.append({"role": "system", "content": SUMMARY_HEADER + summary})
+        return messages + state["turns"]
+
+    def conversation(self, conversation):
+        """A posted full conversation (no session) cut to the window."""
+        return self.messages(self.trim(add_messages(new_session(), conversation)))
+
+
+def cache_key(model, conversation):
+    """
+    Cache key for a conversation that is one question after (optionally) a
+    system prompt: the model, the prompt and the normalized question. Follow
+    ups depend on earlier answers and get None, i.e. are never cached.
+    """
+    if not conversation or conversation[-1]["role"] != "user":
+        return None
+    if any(message["role"] != "system" for message in conversation[:-1]):
+        return None
+    question = normalize_question(conversation[-1]["content"])
+    if not question:
+        return None
+    context = [message["content"] for message in conversation[:-1]]
+    return hashlib.sha256(json.dumps([model, context, question]).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """LRU of model replies by ``cache_key()``, each kept for ``ttl`` seconds."""
+
+    def __init__(self, size=1000, ttl=3600.0):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._answers = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._answers.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._answers[key]
+                self._misses += 1
+                return None
+            self._answers.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key, answer):
+        if key is None or not answer or self.size <= 0:
+            return
+        with self._lock:
+            self._answers[key] = (answer, time.monotonic() + self.ttl)
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.size:
+                self._answers.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"cached": len(self._answers), "size": self.size, "hits": self._hits, "misses": self._misses}
+
+
+def sse(data, event=None):
+    """One server-sent event carrying ``data`` as JSON."""
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+
+def completion_deltas(chunks):
+    """Text pieces of a streamed ChatCompletion (openai's chunk objects or decoded JSON)."""
+    for chunk in chunks:
+        choices = chunk.get("choices") or [{}]
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
+
+
+def parse_stream_line(line):
+    """
+    Decoded JSON chunk from one line of the provider's event stream, None
+    for lines without one, and STREAM_DONE at the final "[DONE]".
+    """
+    if not line.startswith("data:"):
+        return None
+    payload = line[5:].strip()
+    if payload == "[DONE]":
+        return STREAM_DONE
+    return json.loads(payload)
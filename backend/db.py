@@ -0,0 +1,212 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when a connection cannot be checked out of the pool."""
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of psycopg2 connections.
+
+    Connections are opened lazily up to ``maxconn``; ``prefill()`` opens
+    ``minconn`` of them ahead of the first request. A borrower waits at most ``timeout`` seconds for a free
+    connection. Connections idle for longer than ``check_after`` seconds are
+    pinged before being handed out, and a connection is closed and replaced
+    once it has been borrowed ``max_uses`` times.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=5.0, max_uses=1000,
+                 check_after=30.0, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool bounds: min=%s max=%s" % (minconn, maxconn))
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.check_after = check_after
+        self.connect_kwargs = connect_kwargs
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (conn, returned_at)
+        self._uses = {}  # id(conn) -> number of checkouts
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._failed_checks = 0
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        self._uses[id(conn)] = 0
+        return conn
+
+    def _discard(self, conn):
+        self._uses.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def prefill(self):
+        """Open connections until ``minconn`` are available."""
+        with self._lock:
+            while self._size < self.minconn:
+                self._idle.append((self._connect(), time.monotonic()))
+                self._size += 1
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        with self._lock:
+            if self._closed:
+                raise DatabaseUnavailable("Connection pool is closed")
+
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    # reserve the slot so other threads don't overshoot maxconn
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise DatabaseUnavailable(
+                        "Timed out after %.1fs waiting for a database connection" % self.timeout
+                    )
+                self._waiting += 1
+                try:
+                    self._lock.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            if conn is not None and not self._is_alive(conn, returned_at):
+                with self._lock:
+                    self._failed_checks += 1
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except psycopg2.Error as e:
+            with self._lock:
+                self._size -= 1
+                self._in_use -= 1
+                self._lock.notify()
+            raise DatabaseUnavailable("Error connecting to the database: %s" % e) from e
+
+        waited = time.monotonic() - start
+        with self._lock:
+            self._uses[id(conn)] = self._uses.get(id(conn), 0) + 1
+            self._checkouts += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        if not conn.closed and not discard:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._lock:
+            recycle = self._uses.get(id(conn), 0) >= self.max_uses
+            if recycle:
+                self._recycled += 1
+
+            self._in_use -= 1
+            if self._closed or discard or recycle or conn.closed:
+                self._size -= 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a ``with`` block. Any
+        transaction left open is rolled back when the connection is returned.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except psycopg2.InterfaceError:
+            broken = True
+            raise
+        except psycopg2.OperationalError:
+            broken = conn.closed != 0
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def check(self):
+        """Borrow a connection and run a trivial query. Returns True if the database answers."""
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    return cursor.fetchone() == (1,)
+        except (DatabaseUnavailable, psycopg2.Error):
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "total_wait_seconds": round(self._wait_time, 6),
+                "avg_wait_seconds": round(self._wait_time / self._checkouts, 6) if self._checkouts else 0.0,
+                "max_wait_seconds": round(self._max_wait, 6),
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "failed_health_checks": self._failed_checks,
+            }
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                self._discard(conn)
+            self._lock.notify_all()
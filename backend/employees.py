@@ -0,0 +1,46 @@
+import hmac
+
+
+EMPLOYEES_QUERY = """
+    SELECT id, first_name, last_name, email, phone_number, is_manager, google_id, pass_hash
+    FROM employees
+"""
+
+
+class EmployeeDirectory:
+    """
+    Every employee, indexed for the login routes: by Google account id and
+    by email. Several employees may share an email; a password login
+    matches the one whose hash agrees, as the SQL lookup did.
+    """
+
+    def __init__(self, rows):
+        self.by_google_id = {}
+        self.by_email = {}
+        for row in rows:
+            employee = {
+                "id": row[0],
+                "first_name": row[1],
+                "last_name": row[2],
+                "email": row[3],
+                "phone_number": row[4],
+                "is_manager": row[5],
+            }
+            if row[6]:
+                self.by_google_id[row[6]] = employee
+            if row[3]:
+                self.by_email.setdefault(row[3], []).append((row[7], employee))
+
+    def google_user(self, google_id):
+        return self.by_google_id.get(google_id)
+
+    def password_user(self, email, pass_hash):
+        for stored, employee in self.by_email.get(email, ()):
+            if stored and hmac.compare_digest(stored, pass_hash):
+                return employee
+        return None
+
+
+def load_employees(cursor):
+    cursor.execute(EMPLOYEES_QUERY)
+    return EmployeeDirectory(cursor.fetchall())
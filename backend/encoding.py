@@ -0,0 +1,137 @@
+import gzip
+import os
+import uuid
+from functools import lru_cache
+from datetime import date
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from werkzeug.datastructures import Accept
+from werkzeug.http import http_date, parse_accept_header
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Types that compress well; everything else (images, already-gzipped exports) is sent as is
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# event streams must reach the client event by event, whatever the body was built from
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+@lru_cache(maxsize=4096)
+def _day(value):
+    return http_date(value)
+
+
+def _default(value):
+    # same conversions as Flask's default provider; report dates repeat a
+    # lot, so plain dates are formatted once each
+    if type(value) is date:
+        return _day(value)
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson. Output is what the default
+    provider produces (sorted keys; dates as HTTP dates and Decimals as
+    strings, so clients see the same values) except that non-ASCII text
+    is sent as UTF-8 instead of \\u escapes.
+    """
+
+    mimetype = "application/json"
+    options = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=_default, option=self.options)
+
+    def dumps(self, obj, **kwargs):
+        # indent/separators from callers are ignored: output is always compact
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {
+    "orjson": OrjsonProvider,
+    "stdlib": DefaultJSONProvider,
+}
+
+
+def json_provider_class(name=None):
+    """The provider named by ``name`` or $JSON_PROVIDER (default orjson, stdlib when orjson is missing)."""
+    name = name or os.getenv("JSON_PROVIDER", "orjson")
+    if name == "orjson" and orjson is None:
+        return DefaultJSONProvider
+    return JSON_PROVIDERS[name]
+
+
+def choose_encoding(accept_encoding):
+    """Best of br/gzip the client accepts, or None."""
+    offers = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return parse_accept_header(accept_encoding or "", Accept).best_match(offers)
+
+
+def compressible(mimetype):
+    mimetype = mimetype or ""
+    return mimetype.startswith(COMPRESSIBLE_TYPES) and not mimetype.startswith(UNCOMPRESSED_TYPES)
+
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def compress_responses(app, min_size=1024):
+    """
+    Compress buffered responses of at least ``min_size`` bytes with brotli
+    or gzip, whichever the client prefers. Streamed responses (order
+    exports), server-sent events and responses that already carry a
+    Content-Encoding are sent untouched.
+    """
+    from flask import request
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+                or response.status_code in (204, 304) or "Content-Encoding" in response.headers):
+            return response
+        if not compressible(response.mimetype):
+            return response
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+
+        response.set_data(compress_body(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        # the compressed bytes differ per encoding, so the validator becomes weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,150 @@
+import csv
+import io
+import itertools
+import json
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+
+EXPORT_COLUMNS = [
+    "order_id", "customer_name", "order_date", "employee_id", "total_price",
+    "meal_id", "meal_type", "item_name",
+]
+
+# rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = 5000
+
+
+def order_export_batches(conn, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield lists of order/meal/item rows (see EXPORT_COLUMNS) for orders with
+    ``start <= order_date < end``, oldest first, reading them through a named
+    cursor so only ``batch_size`` rows are held in memory at a time.
+    Orders without meals, or meals without items, appear once with NULLs.
+    """
+    conditions = ["TRUE"]
+    params = []
+    if start is not None:
+        conditions.append("o.order_date >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("o.order_date < %s")
+        params.append(end)
+
+    with conn.cursor(name="order_export") as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(
+            f"""
+            SELECT o.id, o.customer_name, o.order_date, o.employee_id, o.total_price,
+                   m.id, m.meal_type, mi.item_name
+            FROM orders o
+            LEFT JOIN meals m ON m.order_id = o.id
+            LEFT JOIN meal_item mi ON mi.meal_id = m.id
+            WHERE {" AND ".join(conditions)}
+            ORDER BY o.order_date, o.id, m.id
+            """,
+            params
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def csv_chunks(batches):
+    """Encode row batches as CSV with a header line, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode("utf-8")
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_plain(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(batches):
+    """
+    Encode row batches as newline-delimited JSON, one object per order with
+    its meals and items nested. Rows arrive grouped by order, so only the
+    order being assembled is carried from one batch to the next. Money
+    values are strings holding the exact amount, e.g. "12.50".
+    """
+    current = None
+    for rows in batches:
+        lines = []
+        for order_id, customer_name, order_date, employee_id, total_price, meal_id, meal_type, item_name in rows:
+            if current is None or current["id"] != order_id:
+                if current is not None:
+                    lines.append(json.dumps(current, default=_plain))
+                current = {
+                    "id": order_id,
+                    "customer_name": customer_name,
+                    "order_date": _plain(order_date),
+                    "employee_id": employee_id,
+                    # the exact Decimal string, as in the CSV export; a float could round it
+                    "total_price": _plain(total_price),
+                    "meals": [],
+                }
+            if meal_id is None:
+                continue
+            meals = current["meals"]
+            if not meals or meals[-1]["id"] != meal_id:
+                meals.append({"id": meal_id, "meal_type": meal_type, "meal_items": []})
+            if item_name is not None:
+                meals[-1]["meal_items"].append(item_name)
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+    if current is not None:
+        yield (json.dumps(current, default=_plain) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of byte chunks into one gzip stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", csv_chunks),
+    "ndjson": ("application/x-ndjson", ndjson_chunks),
+}
+
+
+def export_orders(connect, start=None, end=None, fmt="csv", compress=False, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Generator of response chunks for an order export. Holds one pooled
+    connection (from ``connect()``) for as long as it is being consumed and
+    returns it when exhausted or closed, e.g. when the client disconnects.
+
+    The query runs and its first batch is fetched before the first chunk is
+    produced, so connection and query errors surface on the first next()
+    call, while an error status can still be sent.
+    """
+    encode = EXPORT_FORMATS[fmt][1]
+    with connect() as conn:
+        batches = order_export_batches(conn, start, end, batch_size)
+        try:
+            first = next(batches, None)
+            chunks = encode(itertools.chain([first] if first else [], batches))
+            if compress:
+                chunks = gzip_chunks(chunks)
+            yield from chunks
+        finally:
+            batches.close()
@@ -0,0 +1,185 @@
+import email.utils
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from google.auth import jwt
+
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class CertificateError(Exception):
+    """Google's signing certificates could not be fetched and none are cached."""
+
+
+def cache_lifetime(headers, default=300.0):
+    """
+    Seconds a certificate response may be reused, from its Cache-Control
+    max-age (less Age) or Expires header; ``default`` when it has neither.
+    """
+    headers = {name.lower(): value for name, value in headers.items()}
+    cache_control = headers.get("cache-control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return max(0.0, float(match.group(1)) - float(headers.get("age", 0) or 0))
+    expires = headers.get("expires")
+    if expires:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(expires).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0.0
+    return default
+
+
+class GoogleCerts:
+    """
+    Google's OAuth2 signing certificates ({key id: PEM}), fetched with
+    ``request`` (a google.auth transport Request) and reused for as long as
+    the response's cache headers allow.
+
+    Threads that find the set expired wait for a single fetch. If a fetch
+    fails while an older set is cached, the older set is kept and the fetch
+    is retried after ``retry_after`` seconds. ``get(refresh=True)`` refetches
+    ahead of expiry, for a token signed by a key id the cached set does not
+    have (Google rotated its keys); it is honored at most once per
+    ``retry_after`` seconds so unknown key ids cannot cause a fetch each.
+    """
+
+    def __init__(self, request, url=GOOGLE_CERTS_URL, retry_after=30.0, default_ttl=300.0):
+        self.request = request
+        self.url = url
+        self.retry_after = retry_after
+        self.default_ttl = default_ttl
+
+        self._lock = threading.Lock()
+        self._certs = None
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+        self._fetches = 0
+        self._failures = 0
+
+    def get(self, refresh=False):
+        with self._lock:
+            now = time.monotonic()
+            due = now >= self._expires_at or (refresh and now - self._fetched_at >= self.retry_after)
+            if due and (self._certs is None or now - self._fetched_at >= self.retry_after):
+                self._fetch(now)
+            if self._certs is None:
+                raise CertificateError(f"Could not fetch certificates from {self.url}")
+            return self._certs
+
+    def _fetch(self, now):
+        self._fetched_at = now
+        self._fetches += 1
+        try:
+            response = self.request(self.url, method="GET")
+            if response.status != 200:
+                raise CertificateError(f"{self.url} returned {response.status}")
+            certs = json.loads(response.data.decode("utf-8"))
+        except Exception as e:
+            self._failures += 1
+            print("Error fetching Google certificates:", e)
+            return
+        self._certs = certs
+        self._expires_at = now + cache_lifetime(response.headers, self.default_ttl)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "keys": len(self._certs or ()),
+                "expires_in": max(0.0, round(self._expires_at - time.monotonic(), 1)),
+                "fetches": self._fetches,
+                "failures": self._failures,
+            }
+
+
+class FileCerts:
+    """
+    A fixed certificate set read from a JSON file ({key id: PEM}), so logins
+    can be verified offline against locally generated test keys (see
+    scripts/make_test_google_token.py).
+    """
+
+    def __init__(self, path):
+        with open(path) as f:
+            self._certs = json.load(f)
+
+    def get(self, refresh=False):
+        return self._certs
+
+    def stats(self):
+        return {"keys": len(self._certs), "file": True}
+
+
+class TokenVerifier:
+    """
+    Verifies Google ID tokens against ``certs`` for ``audience`` (the OAuth
+    client id), as google.oauth2.id_token.verify_oauth2_token does, and
+    remembers verified tokens for up to ``ttl`` seconds (never past their
+    expiry) so a token presented again is not checked again.
+
+    ``verify()`` returns the token's claims and raises ValueError for a
+    token that is malformed, expired, for another audience or issuer, or
+    not signed by Google; it raises CertificateError when no certificates
+    can be had.
+    """
+
+    def __init__(self, certs, audience, ttl=300.0, size=1000, clock_skew=10):
+        self.certs = certs
+        self.audience = audience
+        self.ttl = ttl
+        self.size = size
+        self.clock_skew = clock_skew
+
+        self._lock = threading.Lock()
+        self._verified = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def verify(self, token):
+        if isinstance(token, bytes):
+            token = token.decode("utf-8")
+        key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._verified.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._verified.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._verified.pop(key, None)
+            self._misses += 1
+
+        claims = self._decode(token)
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+
+        expires_at = min(time.time() + self.ttl, float(claims["exp"]))
+        if self.size > 0:
+            with self._lock:
+                self._verified[key] = (claims, expires_at)
+                while len(self._verified) > self.size:
+                    self._verified.popitem(last=False)
+        return claims
+
+    def _decode(self, token):
+        certs = self.certs.get()
+        try:
+            key_id = jwt.decode_header(token).get("kid")
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Malformed token: {e}") from e
+        if key_id is not None and key_id not in certs:
+            certs = self.certs.get(refresh=True)
+        return jwt.decode(token, certs=certs, audience=self.audience, clock_skew_in_seconds=self.clock_skew)
+
+    def stats(self):
+        with self._lock:
+            return {"cached": len(self._verified), "size": self.size, "hits": self._hits, "misses": self._misses}
@@ -0,0 +1,54 @@
+"""
+Production entry point:
+
+    gunicorn -c backend/gunicorn.conf.py
+
+Runs WEB_CONCURRENCY worker processes of GUNICORN_THREADS threads each.
+Every worker imports app.py itself after the fork (no preload), so its
+connection pool, caches and order queue writer belong to that process
+alone. A worker opens its pool and loads the menu recipes and prices
+before it accepts connections, and on shutdown finishes in-flight
+requests and drains the order queue before closing its connections.
+
+The default sizes below are starting points derived from how the app
+uses threads and connections, not from benchmark results; see
+"Production serving" in the README for measuring them on the target host.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+wsgi_app = "app:create_app()"
+chdir = BACKEND_DIR
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+# every thread can hold a connection, plus the order queue writer and a spare
+os.environ.setdefault("DB_POOL_MAX", str(threads + 2))
+
+preload_app = False
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+# recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+
+
+def post_worker_init(worker):
+    import app
+
+    app.warm_worker()
+
+
+def worker_exit(server, worker):
+    import app
+
+    # leave a margin inside graceful_timeout for closing connections
+    app.shutdown(timeout=max(1.0, graceful_timeout - 5.0))
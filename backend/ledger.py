@@ -0,0 +1,136 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from rollups import date_range
+
+
+# "order" rows come from submit_order; the others from the inventory screens
+MANUAL_REASONS = ("restock", "adjustment", "waste")
+
+
+def record_movements(cursor, movements):
+    """
+    Append inventory changes to inventory_movements and add them to the
+    inventory_usage_daily pre-aggregate. ``movements`` is an iterable of
+    (ts, ingredient_name, delta, reason, order_id or None). Zero deltas are
+    dropped. Daily rows are upserted in key order so concurrent writers lock
+    them in the same order.
+    """
+    movements = [movement for movement in movements if movement[2]]
+    if not movements:
+        return
+
+    execute_values(
+        cursor,
+        "INSERT INTO inventory_movements (ts, ingredient_name, delta, reason, order_id) VALUES %s",
+        movements,
+        page_size=len(movements)
+    )
+
+    daily = defaultdict(int)
+    for ts, ingredient_name, delta, reason, _ in movements:
+        daily[(ts.date(), ingredient_name, reason)] += delta
+    execute_values(
+        cursor,
+        """
+        INSERT INTO inventory_usage_daily (usage_date, ingredient_name, reason, delta)
+        VALUES %s
+        ON CONFLICT (usage_date, ingredient_name, reason) DO UPDATE
+        SET delta = inventory_usage_daily.delta + EXCLUDED.delta
+        """,
+        [key + (delta,) for key, delta in sorted(daily.items())],
+        page_size=len(daily)
+    )
+
+
+def lock_quantities(cursor, names):
+    """Current {name: quantity} for ``names``, row-locked in name order until commit."""
+    cursor.execute(
+        "SELECT name, quantity FROM inventory WHERE name = ANY(%s) ORDER BY name FOR UPDATE",
+        (list(names),)
+    )
+    return dict(cursor.fetchall())
+
+
+def record_manual_changes(cursor, before, after, reason):
+    """Ledger rows for inventory quantities edited by hand: {name: old} -> {name: new}."""
+    now = datetime.now()
+    record_movements(cursor, [
+        (now, name, Decimal(str(after.get(name) or 0)) - Decimal(str(before.get(name) or 0)), reason, None)
+        for name in sorted(before.keys() | after.keys())
+    ])
+
+
+PRODUCT_USAGE_QUERY = """
+    SELECT ingredient_name, -SUM(delta) AS total_used
+    FROM inventory_usage_daily
+    WHERE reason = 'order' AND usage_date >= %s AND usage_date < %s
+    GROUP BY ingredient_name
+    ORDER BY ingredient_name
+"""
+
+
+def product_usage(cursor, start, end):
+    """
+    Ingredients consumed by orders on dates start <= day < end, as
+    [(ingredient_name, total_used)], read from inventory_usage_daily.
+    """
+    cursor.execute(PRODUCT_USAGE_QUERY, (start, end))
+    return cursor.fetchall()
+
+
+def backfill_inventory_movements(cursor, start=None, end=None):
+    """
+    Rebuild the "order" rows of inventory_movements from order history,
+    optionally only for order dates between ``start`` and ``end``
+    (inclusive), then recompute inventory_usage_daily for those days from
+    the ledger. Manual movements are left alone. Returns the number of
+    ledger rows written.
+    """
+    # hold off live ledger writes until the rebuilt rows are committed
+    cursor.execute("LOCK TABLE inventory_movements, inventory_usage_daily IN EXCLUSIVE MODE")
+
+    where, params = date_range("ts", start, end)
+    cursor.execute(
+        sql.SQL("DELETE FROM inventory_movements WHERE reason = 'order' AND {where}").format(where=where),
+        params
+    )
+
+    where, params = date_range("o.order_date", start, end)
+    cursor.execute(
+        sql.SQL("""
+            INSERT INTO inventory_movements (ts, ingredient_name, delta, reason, order_id)
+            SELECT o.order_date, ii.ingredient_name, -SUM(ii.quantity_needed), 'order', o.id
+            FROM orders o
+            JOIN meals m ON m.order_id = o.id
+            JOIN meal_item mi ON mi.meal_id = m.id
+            JOIN item_ingredients ii ON ii.item_name = mi.item_name
+            WHERE {where}
+            GROUP BY o.id, o.order_date, ii.ingredient_name
+            HAVING SUM(ii.quantity_needed) <> 0
+        """).format(where=where),
+        params
+    )
+    rows = cursor.rowcount
+
+    where, params = date_range("usage_date", start, end)
+    cursor.execute(
+        sql.SQL("DELETE FROM inventory_usage_daily WHERE {where}").format(where=where),
+        params
+    )
+    where, params = date_range("ts", start, end)
+    cursor.execute(
+        sql.SQL("""
+            INSERT INTO inventory_usage_daily (usage_date, ingredient_name, reason, delta)
+            SELECT ts::date, ingredient_name, reason, SUM(delta)
+            FROM inventory_movements
+            WHERE {where}
+            GROUP BY 1, 2, 3
+        """).format(where=where),
+        params
+    )
+    return rows
@@ -0,0 +1,258 @@
+import bisect
+import contextvars
+import threading
+import time
+
+import requests
+from psycopg2 import extensions
+
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# SQL statements issued by one request
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; ``observe()`` is one bisect and one lock."""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, [('le', _number(bound))])}"
+                                 f" {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Gauges:
+    """Values read from ``collect()`` (returning {labels tuple: value}) at scrape time."""
+
+    def __init__(self, name, help, collect, labels=()):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self.label_names = tuple(labels)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.collect()
+        except Exception as e:
+            print("Error collecting", self.name, e)
+            return lines
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "Requests handled, by route template, method and status.",
+    ("route", "method", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Time spent handling a request.", ("route", "method")))
+db_statements = registry.register(Histogram(
+    "db_statements_per_request", "SQL statements executed while handling one request.", ("route",),
+    buckets=STATEMENT_BUCKETS))
+db_time = registry.register(Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements while handling one request.", ("route",)))
+db_statements_total = registry.register(Counter(
+    "db_statements_total", "SQL statements executed, by route ('' outside requests).", ("route",)))
+outbound_latency = registry.register(Histogram(
+    "outbound_http_duration_seconds", "Outgoing HTTP calls, by target and outcome.", ("target", "outcome")))
+outbound_time = registry.register(Histogram(
+    "outbound_http_time_per_request_seconds", "Time spent in outgoing HTTP calls by requests that made any.",
+    ("route",)))
+
+
+class RequestStats:
+    __slots__ = ("route", "statements", "db_seconds", "http_seconds")
+
+    def __init__(self, route):
+        self.route = route
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.http_seconds = 0.0
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_request():
+    """The RequestStats of the request being handled, or None."""
+    return _current.get()
+
+
+def record_statement(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += seconds
+    db_statements_total.inc(stats.route if stats is not None else "")
+
+
+def record_outbound(target, outcome, seconds):
+    outbound_latency.observe(seconds, target, outcome)
+    stats = _current.get()
+    if stats is not None:
+        stats.http_seconds += seconds
+
+
+class InstrumentedCursor(extensions.cursor):
+    """Cursor that reports every statement's duration to the current request."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_statement(time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_statement(time.perf_counter() - started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            record_statement(time.perf_counter() - started)
+
+
+class TimedSession(requests.Session):
+    """requests.Session that records each call under ``target``."""
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = super().send(request, **kwargs)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            record_outbound(self.target, outcome, time.perf_counter() - started)
+
+
+def begin_request(route):
+    """Start accounting a request under ``route``; pass the result to ``end_request()``."""
+    return time.perf_counter(), _current.set(RequestStats(route))
+
+
+def end_request(started, method, status):
+    """Record the request begun by ``begin_request()`` and stop accounting statements to it."""
+    started, token = started
+    stats = _current.get()
+    elapsed = time.perf_counter() - started
+    http_requests.inc(stats.route, method, str(status))
+    http_latency.observe(elapsed, stats.route, method)
+    db_statements.observe(stats.statements, stats.route)
+    db_time.observe(stats.db_seconds, stats.route)
+    if stats.http_seconds:
+        outbound_time.observe(stats.http_seconds, stats.route)
+    _current.reset(token)
+
+
+def instrument(app):
+    """
+    Time every request of a Flask app and account its SQL statements.
+    Statements run while a streamed response body is being sent happen after
+    the request is recorded and count under route "".
+    """
+    from flask import request
+
+    @app.before_request
+    def start_request_metrics():
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        request.environ["metrics.started"] = begin_request(rule)
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = request.environ.pop("metrics.started", None)
+        if started is not None:
+            end_request(started, request.method, response.status_code)
+        return response
@@ -0,0 +1,263 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from orders import CONNECTION_ERRORS, order_failure, reserve_ids, write_orders
+
+
+class QueueFull(Exception):
+    """Raised by enqueue() when too many orders are waiting to be written."""
+
+
+class OrderQueue:
+    """
+    Durable, group-committed order ingestion.
+
+    ``enqueue()`` assigns the order its final id (taken from the orders
+    sequence in blocks of ``id_block``), appends it to a SQLite WAL file at
+    ``path`` and returns immediately. A background writer drains up to
+    ``batch_size`` orders at a time into Postgres with write_orders(), i.e.
+    one transaction and one combined inventory deduction per batch, and only
+    then deletes them from the file.
+
+    Entries survive a crash and are replayed when the writer starts again;
+    orders whose id already exists in Postgres (committed just before the
+    crash) are skipped, so nothing is written twice. If one order in a batch
+    cannot be written (an ingredient missing from inventory, a bad date or
+    employee id), the batch is retried one order at a time and only that
+    order is marked failed; it stays in the file for review.
+
+    Several processes may share one queue file. They all enqueue, but an
+    exclusive lock on ``path + ".lock"`` makes only one of them the writer.
+
+    ``connect()`` must return a context manager yielding a Postgres
+    connection; ``recipes`` is the VersionedCache of item recipes. With
+    ``enforce_stock`` an order needing more of an ingredient than is on
+    hand when its batch is written fails like one with a missing ingredient.
+    """
+
+    def __init__(self, path, connect, recipes, batch_size=200, max_depth=5000,
+                 linger=0.005, poll_interval=0.05, id_block=100, enforce_stock=False):
+        self.path = path
+        self.connect = connect
+        self.recipes = recipes
+        self.enforce_stock = enforce_stock
+        self.batch_size = batch_size
+        self.max_depth = max_depth
+        self.linger = linger
+        self.poll_interval = poll_interval
+        self.id_block = id_block
+
+        self._db_lock = threading.Lock()
+        self._db = self._open()
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS queued_orders (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                error TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS queued_orders_status ON queued_orders (status, seq)")
+
+        self._id_lock = threading.Lock()
+        self._ids = deque()
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+        self._stats_lock = threading.Lock()
+        self._enqueued = 0
+        self._rejected = 0
+        self._written = 0
+        self._skipped = 0
+        self._failed = 0
+        self._batches = 0
+        self._last_batch_size = 0
+        self._last_commit_seconds = 0.0
+
+    def _open(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")
+        return db
+
+    def _next_order_id(self):
+        with self._id_lock:
+            if not self._ids:
+                with self.connect() as conn, conn.cursor() as cursor:
+                    self._ids.extend(reserve_ids(cursor, "orders", self.id_block))
+            return self._ids.popleft()
+
+    def depth(self):
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM queued_orders WHERE status = 'queued'").fetchone()[0]
+
+    def enqueue(self, order):
+        """Persist a validated order and return the id it will be written under."""
+        if self.depth() >= self.max_depth:
+            with self._stats_lock:
+                self._rejected += 1
+            raise QueueFull(f"{self.max_depth} orders are already waiting to be written")
+
+        order = dict(order, id=self._next_order_id())
+        with self._db_lock:
+            self._db.execute(
+                "INSERT INTO queued_orders (order_id, payload, enqueued_at) VALUES (?, ?, ?)",
+                (order["id"], json.dumps(order), time.time())
+            )
+        with self._stats_lock:
+            self._enqueued += 1
+        self._wakeup.set()
+        return order["id"]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="order-queue-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=30.0):
+        """Stop the writer after it has drained what is queued (up to ``timeout`` seconds)."""
+        deadline = time.monotonic() + timeout
+        while self._lock_file is not None and self.depth() and time.monotonic() < deadline:
+            self._wakeup.set()
+            time.sleep(self.poll_interval)
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _become_writer(self):
+        lock_file = open(self.path + ".lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        db = self._open()
+        while not self._stopping.is_set():
+            if self._lock_file is None and not self._become_writer():
+                self._stopping.wait(1.0)
+                continue
+
+            rows = db.execute(
+                "SELECT seq, payload FROM queued_orders WHERE status = 'queued' ORDER BY seq LIMIT ?",
+                (self.batch_size,)
+            ).fetchall()
+            if not rows:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                # give concurrent submitters a moment to join the next batch
+                time.sleep(self.linger)
+                continue
+
+            try:
+                self._write_batch(db, rows)
+            except Exception as e:
+                print("Error writing queued orders, will retry:", e)
+                self._stopping.wait(1.0)
+        db.close()
+
+    def _write_batch(self, db, rows):
+        orders = {row[0]: json.loads(row[1]) for row in rows}
+        started = time.monotonic()
+
+        with self.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id FROM orders WHERE id = ANY(%s)",
+                    ([order["id"] for order in orders.values()],)
+                )
+                already_written = {row[0] for row in cursor.fetchall()}
+                pending = [order for order in orders.values() if order["id"] not in already_written]
+                recipes = self.recipes.get(cursor)
+
+                failed = {}
+                try:
+                    write_orders(cursor, pending, recipes, self.enforce_stock)
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception:
+                    # some order in the batch is bad; find it without holding up the rest
+                    conn.rollback()
+                    failed = self._write_one_by_one(cursor, pending, recipes)
+            conn.commit()
+
+        done = [seq for seq, order in orders.items() if order["id"] not in failed]
+        db.execute("BEGIN")
+        db.executemany("DELETE FROM queued_orders WHERE seq = ?", [(seq,) for seq in done])
+        db.executemany(
+            "UPDATE queued_orders SET status = 'failed', error = ? WHERE order_id = ?",
+            [(error, order_id) for order_id, error in failed.items()]
+        )
+        db.execute("COMMIT")
+
+        for order_id, error in failed.items():
+            print("Queued order", order_id, "failed:", error)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._written += len(pending) - len(failed)
+            self._skipped += len(already_written)
+            self._failed += len(failed)
+            self._last_batch_size = len(rows)
+            self._last_commit_seconds = time.monotonic() - started
+
+    def _write_one_by_one(self, cursor, orders, recipes):
+        failed = {}
+        for order in orders:
+            cursor.execute("SAVEPOINT queued_order")
+            try:
+                write_orders(cursor, [order], recipes, self.enforce_stock)
+                cursor.execute("RELEASE SAVEPOINT queued_order")
+            except CONNECTION_ERRORS:
+                raise
+            except Exception as e:
+                # whatever is wrong with this order, it must not block the queue behind it
+                cursor.execute("ROLLBACK TO SAVEPOINT queued_order")
+                failed[order["id"]] = order_failure(e)
+        return failed
+
+    def stats(self):
+        with self._db_lock:
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM queued_orders GROUP BY status"
+            ).fetchall())
+        with self._stats_lock:
+            return {
+                "depth": counts.get("queued", 0),
+                "max_depth": self.max_depth,
+                "failed_pending_review": counts.get("failed", 0),
+                "is_writer": self._lock_file is not None,
+                "enqueued": self._enqueued,
+                "rejected": self._rejected,
+                "written": self._written,
+                "skipped_already_written": self._skipped,
+                "failed": self._failed,
+                "batches": self._batches,
+                "last_batch_size": self._last_batch_size,
+                "last_commit_seconds": round(self._last_commit_seconds, 6),
+            }
+
+
+def open_order_queue(connect, recipes, enforce_stock=False):
+    """Build the queue from ORDER_QUEUE_* environment variables."""
+    return OrderQueue(
+        os.getenv("ORDER_QUEUE_PATH", "order_queue.sqlite3"),
+        connect,
+        recipes,
+        batch_size=int(os.getenv("ORDER_QUEUE_BATCH_SIZE", 200)),
+        max_depth=int(os.getenv("ORDER_QUEUE_MAX_DEPTH", 5000)),
+        enforce_stock=enforce_stock,
+    )
@@ -0,0 +1,367 @@
+from collections import Counter
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from ledger import record_movements
+from rollups import record_daily_item_sales, record_hourly_sales
+
+
+class MissingIngredientError(Exception):
+    """Raised when an ordered item needs an ingredient that has no inventory row."""
+
+    def __init__(self, ingredient_names):
+        self.ingredient_names = sorted(ingredient_names)
+        super().__init__(", ".join(self.ingredient_names))
+
+
+class InsufficientStockError(Exception):
+    """Raised in stock-enforcing mode when an order needs more of an ingredient than is on hand."""
+
+    def __init__(self, available):
+        self.available = dict(sorted(available.items()))
+        self.ingredient_names = list(self.available)
+        super().__init__(", ".join(self.ingredient_names))
+
+
+# Errors that are the connection's (or a deadlock's) fault, not the order's:
+# the batch is retried rather than any order being marked failed
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 200
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_order(order):
+    """
+    Return a message describing what is wrong with an order payload, or
+    None. Checks types as well as presence, so a queued or batched order
+    that passes cannot fail in the writer for its shape.
+    """
+    if not isinstance(order, dict):
+        return "Order must be an object"
+    for field in ("customer_name", "order_date", "total_price", "items"):
+        if order.get(field) is None:
+            return f"Missing '{field}'"
+    if not isinstance(order["customer_name"], str):
+        return "'customer_name' must be a string"
+    if not isinstance(order["order_date"], str):
+        return "'order_date' must be a date and time string"
+    try:
+        datetime.fromisoformat(order["order_date"])
+    except ValueError:
+        return "'order_date' must be a date and time like 2024-03-01 12:30:00"
+    if not _is_number(order["total_price"]):
+        return "'total_price' must be a number"
+    employee_id = order.get("employee_id")
+    if employee_id is not None and (not isinstance(employee_id, int) or isinstance(employee_id, bool)):
+        return "'employee_id' must be an integer"
+    if not isinstance(order["items"], list):
+        return "'items' must be a list"
+    for meal in order["items"]:
+        if (not isinstance(meal, dict) or not isinstance(meal.get("meal_type"), str) or not meal["meal_type"]
+                or not isinstance(meal.get("meal_items"), list)):
+            return "Each item must have a 'meal_type' string and a 'meal_items' list"
+        for item in meal["meal_items"]:
+            if not isinstance(item, dict) or not isinstance(item.get("item_name"), str) or not item["item_name"]:
+                return "Each meal item must have an 'item_name' string"
+    return None
+
+
+def validate_keyed_order(order):
+    """validate_order() for /submit-orders, which also needs an "idempotency_key" string."""
+    error = validate_order(order)
+    if error:
+        return error
+    key = order.get("idempotency_key")
+    if not isinstance(key, str) or not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return f"'idempotency_key' must be a string of 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+    return None
+
+
+def order_failure(error):
+    """
+    Message for an error that failed one order, as returned to the client.
+    Anything but the inventory errors gets a fixed message; the details are
+    only printed.
+    """
+    if isinstance(error, MissingIngredientError):
+        return f"Ingredient '{error.ingredient_names[0]}' not found in inventory."
+    if isinstance(error, InsufficientStockError):
+        return f"Not enough '{error.ingredient_names[0]}' in stock."
+    print("Order could not be written:", f"{type(error).__name__}: {str(error).strip()}")
+    if isinstance(error, psycopg2.DataError):
+        return "Order has a value the database cannot store."
+    if isinstance(error, psycopg2.IntegrityError):
+        return "Order conflicts with existing data."
+    return "Order could not be written."
+
+
+def count_items(meals):
+    """Collapse the meals of an order into {item_name: servings}."""
+    return Counter(item["item_name"] for meal in meals for item in meal["meal_items"])
+
+
+def reserve_ids(cursor, table, count):
+    """Take ``count`` ids from the id sequence of ``table`` in one statement."""
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+        (table, count)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def insert_meals(cursor, meals_by_order):
+    """
+    Insert every meal and meal item of a list of (order_id, meals) with a
+    fixed number of statements.
+
+    Meal ids are reserved from the meals sequence up front so the meal_item
+    rows can reference them without reading each id back one insert at a time.
+    """
+    meals = [(order_id, meal) for order_id, order_meals in meals_by_order for meal in order_meals]
+    if not meals:
+        return
+
+    meal_ids = reserve_ids(cursor, "meals", len(meals))
+
+    execute_values(
+        cursor,
+        "INSERT INTO meals (id, order_id, meal_type) VALUES %s",
+        [(meal_id, order_id, meal["meal_type"]) for meal_id, (order_id, meal) in zip(meal_ids, meals)],
+        page_size=len(meals)
+    )
+
+    meal_items = [
+        (meal_id, item["item_name"])
+        for meal_id, (_, meal) in zip(meal_ids, meals)
+        for item in meal["meal_items"]
+    ]
+    if meal_items:
+        execute_values(
+            cursor,
+            "INSERT INTO meal_item (meal_id, item_name) VALUES %s",
+            meal_items,
+            page_size=len(meal_items)
+        )
+
+
+def load_recipes(cursor):
+    """Read item_ingredients into {item_name: {ingredient_name: quantity_needed}}."""
+    cursor.execute("SELECT item_name, ingredient_name, quantity_needed FROM item_ingredients")
+    recipes = {}
+    for item_name, ingredient_name, quantity_needed in cursor.fetchall():
+        recipes.setdefault(item_name, {})[ingredient_name] = quantity_needed
+    return recipes
+
+
+def ingredient_demand(item_counts, recipes):
+    """Total {ingredient_name: quantity} needed for {item_name: servings}."""
+    demand = {}
+    for item_name, servings in item_counts.items():
+        for ingredient_name, quantity_needed in recipes.get(item_name, {}).items():
+            demand[ingredient_name] = demand.get(ingredient_name, 0) + quantity_needed * servings
+    return demand
+
+
+# One statement: lock the ingredient rows in name order (FOR UPDATE under
+# ORDER BY locks as it sorts), so orders sharing ingredients queue behind
+# each other instead of deadlocking, then subtract from the rows it holds.
+# Returns every ingredient that exists with its new quantity, or NULL where
+# the stock check declined to deduct.
+DEDUCT_INVENTORY_QUERY = """
+    WITH demand (name, needed) AS (VALUES %s),
+    locked AS MATERIALIZED (
+        SELECT i.name, i.quantity
+        FROM inventory i JOIN demand d ON d.name = i.name
+        ORDER BY i.name
+        FOR UPDATE OF i
+    ),
+    deducted AS (
+        UPDATE inventory i
+        SET quantity = i.quantity - d.needed
+        FROM demand d JOIN locked l ON l.name = d.name
+        WHERE i.name = d.name AND {stock_check}
+        RETURNING i.name, i.quantity
+    )
+    SELECT l.name, l.quantity, deducted.quantity
+    FROM locked l LEFT JOIN deducted ON deducted.name = l.name
+"""
+STOCK_CHECKS = {False: "TRUE", True: "l.quantity >= d.needed"}
+
+
+def deduct_inventory(cursor, demand, enforce_stock=False):
+    """
+    Subtract {ingredient_name: quantity} from inventory in one statement,
+    locking the rows in name order.
+
+    Raises MissingIngredientError if any ingredient has no inventory row
+    and, with ``enforce_stock``, InsufficientStockError if any has less
+    than the quantity needed. Either way the caller must roll back, as
+    the other ingredients may already be deducted.
+    """
+    if not demand:
+        return
+
+    rows = execute_values(
+        cursor,
+        DEDUCT_INVENTORY_QUERY.format(stock_check=STOCK_CHECKS[enforce_stock]),
+        sorted(demand.items()),
+        page_size=len(demand),
+        fetch=True
+    )
+    missing = demand.keys() - {row[0] for row in rows}
+    if missing:
+        raise MissingIngredientError(missing)
+    short = {name: available for name, available, remaining in rows if remaining is None}
+    if short:
+        raise InsufficientStockError(short)
+
+
+def write_orders(cursor, orders, recipes, enforce_stock=False):
+    """
+    Write a list of orders (see submit_order for the payload shape) and deduct
+    their combined ingredients, computed from ``recipes`` (see load_recipes),
+    from inventory in one statement (see deduct_inventory for
+    ``enforce_stock``). The inventory ledger and the sales
+    rollups are updated in the same transaction. Orders that carry an "id" (reserved earlier with reserve_ids)
+    are written under it. Issues the same number of statements no matter how
+    many orders, meals or items there are. Returns the order ids in order.
+    """
+    if not orders:
+        return []
+
+    order_ids = [order.get("id") for order in orders]
+    unassigned = [index for index, order_id in enumerate(order_ids) if order_id is None]
+    if unassigned:
+        for index, order_id in zip(unassigned, reserve_ids(cursor, "orders", len(unassigned))):
+            order_ids[index] = order_id
+
+    written = execute_values(
+        cursor,
+        """
+        INSERT INTO orders (id, customer_name, order_date, employee_id, total_price)
+        VALUES %s RETURNING id, order_date
+        """,
+        [
+            (order_id, order["customer_name"], order["order_date"], order.get("employee_id"), order["total_price"])
+            for order_id, order in zip(order_ids, orders)
+        ],
+        page_size=len(orders),
+        fetch=True
+    )
+    order_dates = dict(written)
+
+    insert_meals(cursor, [(order_id, order["items"]) for order_id, order in zip(order_ids, orders)])
+
+    order_items = [count_items(order["items"]) for order in orders]
+    order_demand = [ingredient_demand(item_counts, recipes) for item_counts in order_items]
+    demand = Counter()
+    for needed in order_demand:
+        demand.update(needed)
+    deduct_inventory(cursor, dict(demand), enforce_stock)
+
+    record_movements(cursor, [
+        (order_dates[order_id], ingredient_name, -quantity, "order", order_id)
+        for order_id, needed in zip(order_ids, order_demand)
+        for ingredient_name, quantity in sorted(needed.items())
+    ])
+    record_hourly_sales(cursor, [
+        (order_dates[order_id], order["total_price"], [meal["meal_type"] for meal in order["items"]])
+        for order_id, order in zip(order_ids, orders)
+    ])
+    record_daily_item_sales(cursor, [
+        (order_dates[order_id], item_counts) for order_id, item_counts in zip(order_ids, order_items)
+    ])
+
+    return order_ids
+
+
+def write_order(cursor, order, recipes, enforce_stock=False):
+    """Write a single order with write_orders(). Returns the new order id."""
+    return write_orders(cursor, [order], recipes, enforce_stock)[0]
+
+
+def claim_idempotency_keys(cursor, keyed):
+    """
+    Record [(key, order_id)] in order_idempotency_keys in one statement.
+    Returns {key: order_id} of the keys that were already taken, with the
+    order they belong to. A key being claimed by a concurrent, uncommitted
+    batch blocks until that batch finishes and then counts as taken, so
+    keys are inserted in key order: batches sharing keys then wait for
+    each other instead of deadlocking.
+    """
+    if not keyed:
+        return {}
+    keyed = sorted(keyed)
+    claimed = execute_values(
+        cursor,
+        "INSERT INTO order_idempotency_keys (key, order_id) VALUES %s ON CONFLICT (key) DO NOTHING RETURNING key",
+        keyed,
+        page_size=len(keyed),
+        fetch=True
+    )
+    claimed = {row[0] for row in claimed}
+    taken = [key for key, _ in keyed if key not in claimed]
+    if not taken:
+        return {}
+    cursor.execute("SELECT key, order_id FROM order_idempotency_keys WHERE key = ANY(%s)", (taken,))
+    return dict(cursor.fetchall())
+
+
+def write_order_batch(cursor, orders, recipes, enforce_stock=False):
+    """
+    Write orders that each carry a distinct "idempotency_key" (see
+    validate_keyed_order), skipping the keys written before. Returns one
+    (status, value) per order: ("created", order_id), ("duplicate",
+    order_id of the earlier order) or ("failed", message).
+
+    The whole batch goes through write_orders() at once, i.e. bulk inserts
+    and one combined inventory deduction. If any order cannot be written
+    the batch is redone one order at a time, in key order, under
+    savepoints, so only that order fails; CONNECTION_ERRORS are raised. Orders for past days
+    reopen those days' Z-Reports (see record_hourly_sales). The caller
+    commits.
+    """
+    if not orders:
+        return []
+    orders = [dict(order, id=order_id) for order, order_id in zip(orders, reserve_ids(cursor, "orders", len(orders)))]
+
+    cursor.execute("SAVEPOINT order_batch")
+    try:
+        taken = claim_idempotency_keys(cursor, [(order["idempotency_key"], order["id"]) for order in orders])
+        write_orders(cursor, [order for order in orders if order["idempotency_key"] not in taken], recipes,
+                     enforce_stock)
+        cursor.execute("RELEASE SAVEPOINT order_batch")
+        return [
+            ("duplicate", taken[order["idempotency_key"]]) if order["idempotency_key"] in taken
+            else ("created", order["id"])
+            for order in orders
+        ]
+    except CONNECTION_ERRORS:
+        raise
+    except Exception:
+        cursor.execute("ROLLBACK TO SAVEPOINT order_batch")
+
+    results = [None] * len(orders)
+    for index in sorted(range(len(orders)), key=lambda index: orders[index]["idempotency_key"]):
+        order = orders[index]
+        cursor.execute("SAVEPOINT batch_order")
+        try:
+            taken = claim_idempotency_keys(cursor, [(order["idempotency_key"], order["id"])])
+            if taken:
+                results[index] = ("duplicate", taken[order["idempotency_key"]])
+            else:
+                write_orders(cursor, [order], recipes, enforce_stock)
+                results[index] = ("created", order["id"])
+            cursor.execute("RELEASE SAVEPOINT batch_order")
+        except CONNECTION_ERRORS:
+            raise
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT batch_order")
+            results[index] = ("failed", order_failure(e))
+    return results
@@ -0,0 +1,77 @@
+import copy
+import hashlib
+import json
+
+
+# Shape of the document served by /get-customer-prices, with the values
+# used when the prices table has no row for a slot.
+CUSTOMER_PRICE_TEMPLATE = {
+    "Combo": {
+        "Bowl": 0,
+        "Plate": 0,
+        "Bigger Plate": 0,
+        "premiumUpcharge": 1.50
+    },
+    "A la Carte": {
+        "regular": {"Small": 0, "Medium": 0, "Large": 0},
+        "premium": {"Small": 0, "Medium": 0, "Large": 0}
+    },
+    "Appetizers": {"Small": 0, "Large": 0},
+    "Drinks": {"Small": 0, "Medium": 0, "Large": 0}
+}
+
+# prices.name -> path of the slot it fills in CUSTOMER_PRICE_TEMPLATE.
+# Rows not listed here are still returned by /view-prices.
+PRICE_SLOTS = {
+    "base_bowl": ("Combo", "Bowl"),
+    "base_plate": ("Combo", "Plate"),
+    "base_bigger_plate": ("Combo", "Bigger Plate"),
+    "premium_upcharge": ("Combo", "premiumUpcharge"),
+    "ala s reg": ("A la Carte", "regular", "Small"),
+    "ala m reg": ("A la Carte", "regular", "Medium"),
+    "ala l reg": ("A la Carte", "regular", "Large"),
+    "ala s prem": ("A la Carte", "premium", "Small"),
+    "ala m prem": ("A la Carte", "premium", "Medium"),
+    "ala l prem": ("A la Carte", "premium", "Large"),
+    "appetizer s": ("Appetizers", "Small"),
+    "appetizer l": ("Appetizers", "Large"),
+    "ftn drk s": ("Drinks", "Small"),
+    "ftn drk m": ("Drinks", "Medium"),
+    "ftn drk l": ("Drinks", "Large"),
+}
+
+
+def build_customer_prices(rows):
+    """Map (name, price) rows onto a copy of CUSTOMER_PRICE_TEMPLATE."""
+    prices = copy.deepcopy(CUSTOMER_PRICE_TEMPLATE)
+    for name, price in rows:
+        path = PRICE_SLOTS.get(name)
+        if path is None:
+            continue
+        slot = prices
+        for key in path[:-1]:
+            slot = slot[key]
+        slot[path[-1]] = float(price)
+    return prices
+
+
+def _etag(document):
+    return hashlib.sha1(json.dumps(document, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class PriceTable:
+    """Both price views, built once per load, with an ETag for each."""
+
+    def __init__(self, rows):
+        self.rows = [{"name": name, "price": price} for name, price in rows]
+        self.customer = build_customer_prices(rows)
+        self.rows_etag = _etag(self.rows)
+        self.customer_etag = _etag(self.customer)
+
+
+PRICES_QUERY = "SELECT name, price FROM prices ORDER BY name"
+
+
+def load_prices(cursor):
+    cursor.execute(PRICES_QUERY)
+    return PriceTable(cursor.fetchall())
@@ -0,0 +1,301 @@
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+
+
+# first key of the per-day advisory locks between order writers and a
+# Z-Report being closed; the second is the day's date.toordinal()
+Z_REPORT_LOCK = 0x5A52
+
+
+def record_hourly_sales(cursor, orders):
+    """
+    Add orders to the sales_hourly rollups. ``orders`` is an iterable of
+    (order_date, total_price, meal_types) for orders written in the current
+    transaction. Rows are upserted in key order so concurrent writers lock
+    them in the same order.
+    """
+    totals = {}
+    meals = Counter()
+    for order_date, total_price, meal_types in orders:
+        key = (order_date.date(), order_date.hour)
+        count, revenue = totals.get(key, (0, Decimal(0)))
+        totals[key] = (count + 1, revenue + Decimal(str(total_price)))
+        for meal_type in meal_types:
+            meals[key + (meal_type,)] += 1
+
+    if not totals:
+        return
+
+    sales_dates = sorted({sales_date for sales_date, _ in totals})
+    # shared: order writers never wait for each other here, only for a
+    # Z-Report being closed for one of these days (see z_report_snapshot)
+    cursor.execute(
+        "SELECT pg_advisory_xact_lock_shared(%s, day) FROM unnest(%s::int[]) AS day",
+        (Z_REPORT_LOCK, [sales_date.toordinal() for sales_date in sales_dates])
+    )
+
+    execute_values(
+        cursor,
+        """
+        INSERT INTO sales_hourly (sales_date, hour, order_count, revenue)
+        VALUES %s
+        ON CONFLICT (sales_date, hour) DO UPDATE
+        SET order_count = sales_hourly.order_count + EXCLUDED.order_count,
+            revenue = sales_hourly.revenue + EXCLUDED.revenue
+        """,
+        [key + value for key, value in sorted(totals.items())],
+        page_size=len(totals)
+    )
+    if meals:
+        execute_values(
+            cursor,
+            """
+            INSERT INTO sales_hourly_meals (sales_date, hour, meal_type, meal_count)
+            VALUES %s
+            ON CONFLICT (sales_date, hour, meal_type) DO UPDATE
+            SET meal_count = sales_hourly_meals.meal_count + EXCLUDED.meal_count
+            """,
+            [key + (count,) for key, count in sorted(meals.items())],
+            page_size=len(meals)
+        )
+
+    # Late orders for a day whose Z-Report was already closed: drop it so it
+    # is recomputed with them (see z_report_snapshot)
+    cursor.execute("DELETE FROM z_reports WHERE report_date = ANY(%s)", (sales_dates,))
+
+
+def record_daily_item_sales(cursor, orders):
+    """
+    Add orders to the item_sales_daily rollup. ``orders`` is an iterable of
+    (order_date, {item_name: servings}) for orders written in the current
+    transaction. Each order counts once per item it contains, however many
+    servings it has. Rows are upserted in key order.
+    """
+    totals = {}
+    for order_date, item_counts in orders:
+        for item_name, servings in item_counts.items():
+            key = (order_date.date(), item_name)
+            order_count, total_servings = totals.get(key, (0, 0))
+            totals[key] = (order_count + 1, total_servings + servings)
+
+    if not totals:
+        return
+
+    execute_values(
+        cursor,
+        """
+        INSERT INTO item_sales_daily (sales_date, item_name, order_count, servings)
+        VALUES %s
+        ON CONFLICT (sales_date, item_name) DO UPDATE
+        SET order_count = item_sales_daily.order_count + EXCLUDED.order_count,
+            servings = item_sales_daily.servings + EXCLUDED.servings
+        """,
+        [key + value for key, value in sorted(totals.items())],
+        page_size=len(totals)
+    )
+
+
+# bucket start for each /get-sales-trends granularity
+TREND_BUCKETS = {
+    "day": "sales_date",
+    "week": "date_trunc('week', sales_date)::date",
+    "month": "date_trunc('month', sales_date)::date",
+}
+
+
+def item_sales_trends_query(start, end, granularity="day", item_names=None):
+    """The statement and parameters behind ``item_sales_trends()``, for any DB-API driver."""
+    conditions = ["sales_date >= %s", "sales_date < %s"]
+    params = [start, end]
+    if item_names:
+        conditions.append("item_name = ANY(%s)")
+        params.append(list(item_names))
+    return f"""
+        SELECT {TREND_BUCKETS[granularity]} AS bucket, item_name, SUM(order_count), SUM(servings)
+        FROM item_sales_daily
+        WHERE {" AND ".join(conditions)}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """, params
+
+
+def item_sales_trends(cursor, start, end, granularity="day", item_names=None):
+    """
+    Orders containing each item per day, week (starting Monday) or month,
+    for sales dates start <= day < end, optionally only for ``item_names``.
+    Returns [(bucket_start, item_name, order_count, servings)] ordered by
+    bucket and item.
+    """
+    cursor.execute(*item_sales_trends_query(start, end, granularity, item_names))
+    return cursor.fetchall()
+
+
+Z_REPORT_QUERY = """
+    SELECT closed_at, hourly_sales, order_count, revenue, meal_counts
+    FROM z_reports
+    WHERE report_date = %s
+"""
+
+HOURLY_SALES_QUERY = """
+    SELECT h.hour, h.order_count, h.revenue,
+           COALESCE((
+               SELECT json_object_agg(m.meal_type, m.meal_count)
+               FROM sales_hourly_meals m
+               WHERE m.sales_date = h.sales_date AND m.hour = h.hour
+           ), '{}'::json)
+    FROM sales_hourly h
+    WHERE h.sales_date = %s AND h.hour < %s
+    ORDER BY h.hour
+"""
+
+
+def hourly_sales_rows(rows):
+    """Shape HOURLY_SALES_QUERY rows the way the reports screen expects."""
+    return [
+        {"hour": hour, "totalOrders": order_count, "orderValue": float(revenue), "mealCounts": meal_counts}
+        for hour, order_count, revenue, meal_counts in rows
+    ]
+
+
+def hourly_sales(cursor, report_date, up_to_hour=24):
+    """Rollup rows for one day before ``up_to_hour``, in the shape the reports screen expects."""
+    cursor.execute(HOURLY_SALES_QUERY, (report_date, up_to_hour))
+    return hourly_sales_rows(cursor.fetchall())
+
+
+def summarize(hourly):
+    meal_counts = Counter()
+    for row in hourly:
+        meal_counts.update(row["mealCounts"])
+    return {
+        "totalOrders": sum(row["totalOrders"] for row in hourly),
+        "orderValue": round(sum(row["orderValue"] for row in hourly), 2),
+        "mealCounts": dict(meal_counts),
+    }
+
+
+def z_report_snapshot(cursor, report_date):
+    """
+    Return (closed_at, hourly rows, summary) of the closed Z-Report for a
+    finished day, computing and storing it the first time it is asked for.
+    The caller commits.
+
+    The stored report is dropped again by record_hourly_sales when orders
+    for the day are written later (queue replay, kiosk backlogs, orders
+    with an earlier order_date). Closing the day takes that day's advisory
+    lock exclusively: it waits for order writes for the day in flight and
+    holds off new ones until the caller commits, so a late order is either
+    in the report or drops it afterwards. Writes for other days, and
+    reads of a report already stored, take no lock.
+    """
+    cursor.execute(Z_REPORT_QUERY, (report_date,))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)",
+                       (Z_REPORT_LOCK, date.fromisoformat(str(report_date)).toordinal()))
+        hourly = hourly_sales(cursor, report_date)
+        summary = summarize(hourly)
+        cursor.execute(
+            """
+            INSERT INTO z_reports (report_date, order_count, revenue, hourly_sales, meal_counts)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (report_date) DO NOTHING
+            """,
+            (report_date, summary["totalOrders"], summary["orderValue"], Json(hourly), Json(summary["mealCounts"]))
+        )
+        # another worker may have closed the day first; theirs wins
+        cursor.execute(Z_REPORT_QUERY, (report_date,))
+        row = cursor.fetchone()
+
+    closed_at, hourly, order_count, revenue, meal_counts = row
+    return closed_at, hourly, {"totalOrders": order_count, "orderValue": float(revenue), "mealCounts": meal_counts}
+
+
+def date_range(column, start=None, end=None):
+    """SQL condition (and its params) for ``column`` falling on dates start..end inclusive."""
+    conditions = [sql.SQL("TRUE")]
+    params = []
+    if start:
+        conditions.append(sql.SQL("{} >= %s::date").format(sql.SQL(column)))
+        params.append(start)
+    if end:
+        conditions.append(sql.SQL("{} < %s::date + 1").format(sql.SQL(column)))
+        params.append(end)
+    return sql.SQL(" AND ").join(conditions), params
+
+
+def backfill_sales_hourly(cursor, start=None, end=None):
+    """
+    Rebuild sales_hourly and sales_hourly_meals from orders, optionally only
+    for order dates between ``start`` and ``end`` (inclusive). Closed
+    Z-Reports in the range are dropped so they are recomputed. Returns the
+    number of hourly rows written.
+    """
+    # hold off live rollup upserts until the rebuilt rows are committed
+    cursor.execute("LOCK TABLE sales_hourly, sales_hourly_meals IN EXCLUSIVE MODE")
+
+    for table, column in (("sales_hourly", "sales_date"), ("sales_hourly_meals", "sales_date"),
+                          ("z_reports", "report_date")):
+        where, params = date_range(column, start, end)
+        cursor.execute(
+            sql.SQL("DELETE FROM {table} WHERE {where}").format(table=sql.Identifier(table), where=where),
+            params
+        )
+
+    where, params = date_range("order_date", start, end)
+    cursor.execute(
+        sql.SQL("""
+            INSERT INTO sales_hourly (sales_date, hour, order_count, revenue)
+            SELECT order_date::date, EXTRACT(HOUR FROM order_date), COUNT(*), COALESCE(SUM(total_price), 0)
+            FROM orders
+            WHERE {where}
+            GROUP BY 1, 2
+        """).format(where=where),
+        params
+    )
+    hours = cursor.rowcount
+
+    where, params = date_range("o.order_date", start, end)
+    cursor.execute(
+        sql.SQL("""
+            INSERT INTO sales_hourly_meals (sales_date, hour, meal_type, meal_count)
+            SELECT o.order_date::date, EXTRACT(HOUR FROM o.order_date), m.meal_type, COUNT(*)
+            FROM orders o
+            JOIN meals m ON m.order_id = o.id
+            WHERE {where}
+            GROUP BY 1, 2, 3
+        """).format(where=where),
+        params
+    )
+    return hours
+
+
+def backfill_item_sales_daily(cursor, start=None, end=None):
+    """
+    Rebuild item_sales_daily from orders, optionally only for order dates
+    between ``start`` and ``end`` (inclusive). Returns the number of rows
+    written.
+    """
+    cursor.execute("LOCK TABLE item_sales_daily IN EXCLUSIVE MODE")
+
+    where, params = date_range("sales_date", start, end)
+    cursor.execute(sql.SQL("DELETE FROM item_sales_daily WHERE {where}").format(where=where), params)
+
+    where, params = date_range("o.order_date", start, end)
+    cursor.execute(
+        sql.SQL("""
+            INSERT INTO item_sales_daily (sales_date, item_name, order_count, servings)
+            SELECT o.order_date::date, mi.item_name, COUNT(DISTINCT o.id), COUNT(*)
+            FROM orders o
+            JOIN meals m ON m.order_id = o.id
+            JOIN meal_item mi ON mi.meal_id = m.id
+            WHERE {where}
+            GROUP BY 1, 2
+        """).format(where=where),
+        params
+    )
+    return cursor.rowcount
@@ -0,0 +1,229 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import threading
+import time
+
+from psycopg2 import sql
+
+from metrics import InstrumentedCursor, current_request
+
+
+_STRING_LITERAL = re.compile(r"(?:[EeBbXxUu]&?)?'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_VALUES_LIST = re.compile(r"(\(\s*[?,\s]+\))(\s*,\s*\(\s*[?,\s]+\))+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# statements EXPLAIN ANALYZE may run again; anything else only gets EXPLAIN
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH|VALUES|TABLE)\b", re.IGNORECASE)
+
+_explaining = contextvars.ContextVar("explaining_slow_query", default=False)
+
+
+def redact_literals(text):
+    """``text`` with every string and numeric literal replaced by ?."""
+    return _NUMBER_LITERAL.sub("?", _STRING_LITERAL.sub("?", text))
+
+
+def fingerprint(statement):
+    """Statement text with literals replaced by ? and repeated row lists collapsed, for grouping and redaction."""
+    text = redact_literals(statement)
+    text = _VALUES_LIST.sub(r"\1, ...", text)
+    text = _IN_LIST.sub("(?, ...)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def redact_params(params):
+    """Parameter types and sizes only, never the values."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: redact_params(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [redact_params(value) for value in params] if len(params) <= 20 \
+            else f"{type(params).__name__}[{len(params)}]"
+    if isinstance(params, (str, bytes)):
+        return f"{type(params).__name__}[{len(params)}]"
+    return type(params).__name__
+
+
+def _redact_plan(node):
+    if isinstance(node, dict):
+        return {key: _redact_plan(value) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_redact_plan(value) for value in node]
+    if isinstance(node, str):
+        # conditions such as "(id = 42)" carry the statement's values
+        return redact_literals(node)
+    return node
+
+
+class SlowQueryLog:
+    """
+    Records statements slower than ``threshold`` seconds.
+
+    Each slow statement is written to a rotating JSON-lines log at
+    ``path`` with its route, redacted fingerprint, parameter types and
+    duration, and aggregated per fingerprint for ``worst()``. A background
+    thread captures the plan of each fingerprint at most once per
+    ``explain_interval`` seconds on a connection from ``connect()``:
+    EXPLAIN (ANALYZE, BUFFERS) in a read-only transaction that is rolled
+    back for queries, plain EXPLAIN for anything that writes. Plans are
+    kept and logged with string and numeric literals redacted.
+    """
+
+    def __init__(self, threshold, connect, path="slow_queries.log", max_bytes=10 * 2**20, backups=5,
+                 explain=True, explain_interval=300.0, explain_timeout=30.0, queue_size=100):
+        self.threshold = threshold
+        self.connect = connect
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.explain_timeout = explain_timeout
+
+        self.logger = logging.getLogger(f"slow_queries.{id(self)}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger.addHandler(handler)
+
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._explained_at = {}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._dropped = 0
+
+    def _write(self, record):
+        self.logger.info(json.dumps(record, default=str))
+
+    def record(self, cursor, query, params, seconds, error=None):
+        if _explaining.get():
+            return
+        if isinstance(query, sql.Composable):
+            query = query.as_string(cursor)
+        elif isinstance(query, bytes):
+            query = query.decode("utf-8", "replace")
+        key = fingerprint(query)
+        request_stats = current_request()
+        route = request_stats.route if request_stats is not None else ""
+
+        self._write({
+            "type": "slow_query",
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "route": route,
+            "duration_ms": round(seconds * 1000, 3),
+            "rows": cursor.rowcount,
+            "error": error,
+            "fingerprint": key,
+            "params": redact_params(params),
+        })
+
+        now = time.time()
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {"fingerprint": key, "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                            "routes": {}, "last_seen": None, "plan": None, "plan_at": None}
+            stats["calls"] += 1
+            stats["total_ms"] += seconds * 1000
+            stats["max_ms"] = max(stats["max_ms"], seconds * 1000)
+            stats["routes"][route] = stats["routes"].get(route, 0) + 1
+            stats["last_seen"] = now
+
+            due = self.explain and error is None and now - self._explained_at.get(key, 0) >= self.explain_interval
+            if due:
+                self._explained_at[key] = now
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="slow-query-explain", daemon=True)
+                    self._thread.start()
+
+        if due:
+            # mogrify() inlines the parameters client-side; the text never leaves this process
+            statement = cursor.mogrify(query, params).decode("utf-8", "replace")
+            try:
+                self._queue.put_nowait((key, statement))
+            except queue.Full:
+                with self._lock:
+                    self._dropped += 1
+
+    def _run(self):
+        _explaining.set(True)
+        while True:
+            key, statement = self._queue.get()
+            try:
+                plan = self._explain(statement)
+            except Exception as e:
+                print("Error capturing slow query plan:", e)
+                continue
+            plan = _redact_plan(plan)
+            with self._lock:
+                self._stats[key]["plan"] = plan
+                self._stats[key]["plan_at"] = time.time()
+            self._write({"type": "plan", "ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "fingerprint": key, "plan": plan})
+
+    def _explain(self, statement):
+        analyze = bool(_READ_ONLY.match(statement))
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        with self.connect() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    if analyze:
+                        cursor.execute("SET TRANSACTION READ ONLY")
+                    cursor.execute("SET LOCAL statement_timeout = %s", (int(self.explain_timeout * 1000),))
+                    cursor.execute(f"EXPLAIN ({options}) {statement}")
+                    return cursor.fetchone()[0]
+            finally:
+                conn.rollback()
+
+    def worst(self, limit=20):
+        """Fingerprints ordered by total time spent above the threshold."""
+        with self._lock:
+            rows = sorted(self._stats.values(), key=lambda stats: stats["total_ms"], reverse=True)[:limit]
+            return [
+                dict(stats, total_ms=round(stats["total_ms"], 3), max_ms=round(stats["max_ms"], 3),
+                     mean_ms=round(stats["total_ms"] / stats["calls"], 3), routes=dict(stats["routes"]))
+                for stats in rows
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold * 1000,
+                "fingerprints": len(self._stats),
+                "explain_backlog": self._queue.qsize(),
+                "explains_dropped": self._dropped,
+            }
+
+
+def slow_query_cursor(log):
+    """An InstrumentedCursor class that also reports slow statements to ``log``."""
+
+    class SlowQueryCursor(InstrumentedCursor):
+        slow_log = log
+
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            try:
+                result = super().execute(query, vars)
+            except Exception as e:
+                self._report_slow(query, vars, started, type(e).__name__)
+                raise
+            self._report_slow(query, vars, started, None)
+            return result
+
+        def _report_slow(self, query, vars, started, error):
+            elapsed = time.perf_counter() - started
+            if elapsed < self.slow_log.threshold:
+                return
+            # a logging failure must never replace the statement's own result or error
+            try:
+                self.slow_log.record(self, query, vars, elapsed, error)
+            except Exception as e:
+                print("Error recording slow query:", e)
+
+    return SlowQueryCursor
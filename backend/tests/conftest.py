@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the backend modules import each other flat, as when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,172 @@
+"""
+The async routes in asgi.py must answer exactly like their Flask
+counterparts in app.py. Each request is sent to both apps, backed by the
+same canned database rows and a stubbed model API, and the status codes
+and JSON bodies are compared. No Postgres or network access is needed.
+"""
+from contextlib import asynccontextmanager, contextmanager
+from decimal import Decimal
+
+import httpx
+import openai
+import pytest
+from starlette.testclient import TestClient
+
+import app as flask_module
+import asgi
+from caches import VERSION_QUERY
+from chat import AnswerCache
+from prices import PRICES_QUERY
+from rollups import HOURLY_SALES_QUERY
+
+
+def normalize(query):
+    return " ".join(query.split())
+
+
+ROWS = {
+    normalize(flask_module.MENU_ITEMS_QUERY): [("Orange Chicken", "entree"), ("Chow Mein", "side")],
+    normalize(VERSION_QUERY): [(3,)],
+    normalize(PRICES_QUERY): [("base_bowl", Decimal("8.30")), ("ftn drk s", Decimal("2.10"))],
+    normalize(HOURLY_SALES_QUERY): [
+        (11, 4, Decimal("42.50"), {"bowl": 3, "plate": 1}),
+        (12, 2, Decimal("19.80"), {}),
+    ],
+    "SELECT en, es FROM translations WHERE en = ANY(%s)": [("Orange Chicken", "Pollo a la naranja")],
+}
+
+REPLY = "The orange chicken is a little sweet and not spicy."
+
+REQUESTS = [
+    ("GET", "/menu-items", None),
+    ("GET", "/view-prices", None),
+    ("GET", "/get-x-report?report_date=2024-03-01&up_to_hour=14", None),
+    ("GET", "/get-x-report?report_date=2024-03-01", None),
+    ("POST", "/get-translation", {"en": "Orange Chicken"}),
+    ("POST", "/get-translation", {"en": ""}),
+    ("POST", "/chat", {"messages": [{"sender": "user", "text": "Is the orange chicken spicy?"}]}),
+    ("POST", "/chat", {"messages": []}),
+]
+
+
+class FakeCursor:
+    """Answers each known statement with its canned rows."""
+
+    def __init__(self):
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.rows = list(ROWS[normalize(query)])
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class AsyncFakeCursor(FakeCursor):
+    async def execute(self, query, params=None):
+        FakeCursor.execute(self, query, params)
+
+    async def fetchall(self):
+        return FakeCursor.fetchall(self)
+
+    async def fetchone(self):
+        return FakeCursor.fetchone(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class AsyncFakeConnection:
+    def cursor(self):
+        return AsyncFakeCursor()
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+def completion(request):
+    return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": REPLY}}]})
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    @contextmanager
+    def connection():
+        yield FakeConnection()
+
+    @asynccontextmanager
+    async def async_connection():
+        yield AsyncFakeConnection()
+
+    monkeypatch.setattr(flask_module.db_pool, "connection", connection)
+    monkeypatch.setattr(asgi.db_pool, "connection", async_connection)
+    monkeypatch.setattr(asgi.translator, "connect", async_connection)
+
+    monkeypatch.setattr(openai.ChatCompletion, "create",
+                        lambda **kwargs: {"choices": [{"message": {"role": "assistant", "content": REPLY}}]})
+    monkeypatch.setattr(asgi, "openai_client",
+                        httpx.AsyncClient(base_url=openai.api_base, transport=httpx.MockTransport(completion)))
+
+    # the process-wide caches would let the second app answer from the first one's work
+    monkeypatch.setattr(flask_module.translator, "cache_size", 0)
+    monkeypatch.setattr(asgi.translator, "cache_size", 0)
+
+    def reset():
+        flask_module.price_cache.invalidate()
+        cache = AnswerCache()
+        monkeypatch.setattr(flask_module, "chat_cache", cache)
+        monkeypatch.setattr(asgi, "chat_cache", cache)
+
+    # without a "with" block the Starlette client skips the lifespan, which would open the real pool
+    return flask_module.create_app().test_client(), TestClient(asgi.app), reset
+
+
+@pytest.mark.parametrize("method,path,body", REQUESTS)
+def test_same_response(clients, method, path, body):
+    flask_client, asgi_client, reset = clients
+
+    reset()
+    expected = flask_client.open(path, method=method, json=body)
+    reset()
+    actual = asgi_client.request(method, path, json=body)
+
+    assert actual.status_code == expected.status_code
+    assert actual.json() == expected.get_json()
+
+
+def test_requests_succeed(clients):
+    """The comparison above is only meaningful if the stubs serve real answers."""
+    flask_client, _, reset = clients
+    for method, path, body in REQUESTS[::2]:
+        reset()
+        response = flask_client.open(path, method=method, json=body)
+        assert response.status_code == 200, (path, response.get_json())
@@ -0,0 +1,313 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import requests
+from psycopg2.extras import execute_values
+
+
+GOOGLE_TRANSLATE_URL = "https://translation.googleapis.com/language/translate/v2"
+
+# Google Translate v2 accepts at most 128 strings per request
+PROVIDER_BATCH_SIZE = 128
+
+
+class TranslationError(Exception):
+    """The translation provider rejected or failed a request."""
+
+    def __init__(self, status_code, details):
+        self.status_code = status_code
+        self.details = details
+        super().__init__(f"Translation provider returned {status_code}")
+
+
+class Translator:
+    """
+    English to Spanish lookups, cheapest source first:
+
+    1. an in-process LRU of recent translations
+    2. the translations table, one ``en = ANY(...)`` query per batch
+    3. the translation provider, one request per batch of misses
+
+    Concurrent requests missing the same word share one provider call: the
+    first thread to miss a word owns it and the others wait on its result.
+    New translations are written back to the table in one insert.
+
+    ``connect()`` must return a context manager yielding a connection;
+    ``session`` is the requests.Session used for the provider.
+    """
+
+    def __init__(self, connect, api_key, api_url=GOOGLE_TRANSLATE_URL, target="es",
+                 cache_size=5000, timeout=10.0, session=None):
+        self.connect = connect
+        self.api_key = api_key
+        self.api_url = api_url
+        self.target = target
+        self.cache_size = cache_size
+        self.timeout = timeout
+
+        self._session = session or requests.Session()
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._inflight = {}
+
+        self._hits = 0
+        self._db_hits = 0
+        self._provider_calls = 0
+        self._provider_words = 0
+        self._coalesced = 0
+
+    def _remember(self, translations):
+        with self._lock:
+            for en, es in translations.items():
+                self._cache[en] = es
+                self._cache.move_to_end(en)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _from_cache(self, words):
+        found = {}
+        with self._lock:
+            for word in words:
+                if word in self._cache:
+                    self._cache.move_to_end(word)
+                    found[word] = self._cache[word]
+            self._hits += len(found)
+        return found
+
+    def _from_table(self, words):
+        with self.connect() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT en, es FROM translations WHERE en = ANY(%s)", (words,))
+            found = dict(cursor.fetchall())
+        with self._lock:
+            self._db_hits += len(found)
+        return found
+
+    def _store(self, translations):
+        with self.connect() as conn:
+            with conn.cursor() as cursor:
+                execute_values(
+                    cursor,
+                    "INSERT INTO translations (en, es) VALUES %s ON CONFLICT DO NOTHING",
+                    list(translations.items()),
+                    page_size=len(translations)
+                )
+            conn.commit()
+
+    def _provider_request(self, chunk):
+        print("Google translate api called for", len(chunk), "strings")
+        with self._lock:
+            self._provider_calls += 1
+            self._provider_words += len(chunk)
+        return {
+            "params": {"key": self.api_key},
+            "json": {"q": chunk, "target": self.target, "format": "text"},
+            "timeout": self.timeout,
+        }
+
+    @staticmethod
+    def _provider_results(chunk, response):
+        if response.status_code != 200:
+            try:
+                details = response.json()
+            except ValueError:
+                details = response.text
+            raise TranslationError(response.status_code, details)
+
+        results = response.json()["data"]["translations"]
+        return {word: result["translatedText"] for word, result in zip(chunk, results)}
+
+    def _call_provider(self, words):
+        translated = {}
+        for start in range(0, len(words), PROVIDER_BATCH_SIZE):
+            chunk = words[start:start + PROVIDER_BATCH_SIZE]
+            response = self._session.post(self.api_url, **self._provider_request(chunk))
+            translated.update(self._provider_results(chunk, response))
+        return translated
+
+    def _fetch_misses(self, words):
+        owned = []
+        futures = {}
+        with self._lock:
+            for word in words:
+                future = self._inflight.get(word)
+                if future is None:
+                    future = self._inflight[word] = Future()
+                    owned.append(word)
+                else:
+                    self._coalesced += 1
+                futures[word] = future
+
+        if owned:
+            try:
+                translated = self._call_provider(owned)
+                self._remember(translated)
+                if translated:
+                    try:
+                        self._store(translated)
+                    except Exception as e:
+                        # still answer from memory; the table catches up on the next miss
+                        print("Error saving translations:", e)
+            except Exception as e:
+                with self._lock:
+                    for word in owned:
+                        self._inflight.pop(word).set_exception(e)
+            else:
+                with self._lock:
+                    for word in owned:
+                        future = self._inflight.pop(word)
+                        if word in translated:
+                            future.set_result(translated[word])
+                        else:
+                            future.set_exception(TranslationError(502, "No translation returned"))
+
+        translated = {}
+        failed = {}
+        for word, future in futures.items():
+            try:
+                translated[word] = future.result(timeout=self.timeout * 2)
+            except Exception as e:
+                failed[word] = e
+        return translated, failed
+
+    def translate(self, words):
+        """
+        Translate a list of English strings. Returns ({en: es}, {en: error})
+        where the second dict holds the strings that could not be translated.
+        """
+        words = list(dict.fromkeys(word for word in words if word))
+        translations = self._from_cache(words)
+
+        missing = [word for word in words if word not in translations]
+        if missing:
+            found = self._from_table(missing)
+            self._remember(found)
+            translations.update(found)
+            missing = [word for word in missing if word not in found]
+
+        failed = {}
+        if missing:
+            translated, failed = self._fetch_misses(missing)
+            translations.update(translated)
+
+        return translations, failed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cached": len(self._cache),
+                "cache_size": self.cache_size,
+                "cache_hits": self._hits,
+                "db_hits": self._db_hits,
+                "provider_calls": self._provider_calls,
+                "provider_words": self._provider_words,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._inflight),
+            }
+
+
+class AsyncTranslator(Translator):
+    """
+    Translator for asyncio code: the same cache, table and provider steps,
+    awaited instead of blocking a thread.
+
+    ``connect()`` must return an async context manager yielding a psycopg
+    AsyncConnection; ``client`` is the httpx.AsyncClient used for the
+    provider. Misses of the same word are coalesced on an asyncio future.
+    """
+
+    def __init__(self, connect, api_key, client, **kwargs):
+        super().__init__(connect, api_key, **kwargs)
+        self._client = client
+
+    async def _from_table(self, words):
+        async with self.connect() as conn, conn.cursor() as cursor:
+            await cursor.execute("SELECT en, es FROM translations WHERE en = ANY(%s)", (words,))
+            found = dict(await cursor.fetchall())
+        with self._lock:
+            self._db_hits += len(found)
+        return found
+
+    async def _store(self, translations):
+        async with self.connect() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(
+                    "INSERT INTO translations (en, es) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                    list(translations.items())
+                )
+            await conn.commit()
+
+    async def _call_provider(self, words):
+        translated = {}
+        for start in range(0, len(words), PROVIDER_BATCH_SIZE):
+            chunk = words[start:start + PROVIDER_BATCH_SIZE]
+            response = await self._client.post(self.api_url, **self._provider_request(chunk))
+            translated.update(self._provider_results(chunk, response))
+        return translated
+
+    async def _fetch_misses(self, words):
+        loop = asyncio.get_running_loop()
+        owned = []
+        futures = {}
+        for word in words:
+            future = self._inflight.get(word)
+            if future is None:
+                future = self._inflight[word] = loop.create_future()
+                owned.append(word)
+            else:
+                self._coalesced += 1
+            futures[word] = future
+
+        if owned:
+            try:
+                translated = await self._call_provider(owned)
+                self._remember(translated)
+                if translated:
+                    try:
+                        await self._store(translated)
+                    except Exception as e:
+                        print("Error saving translations:", e)
+            except asyncio.CancelledError:
+                # the owner's client went away; waiters must not hang on its words
+                for word in owned:
+                    self._inflight.pop(word).set_exception(TranslationError(503, "Translation request cancelled"))
+                raise
+            except Exception as e:
+                for word in owned:
+                    self._inflight.pop(word).set_exception(e)
+            else:
+                for word in owned:
+                    future = self._inflight.pop(word)
+                    if word in translated:
+                        future.set_result(translated[word])
+                    else:
+                        future.set_exception(TranslationError(502, "No translation returned"))
+
+        translated = {}
+        failed = {}
+        for word, future in futures.items():
+            try:
+                translated[word] = await asyncio.wait_for(asyncio.shield(future), self.timeout * 2)
+            except Exception as e:
+                failed[word] = e
+        return translated, failed
+
+    async def translate(self, words):
+        """Awaitable ``Translator.translate()``."""
+        words = list(dict.fromkeys(word for word in words if word))
+        translations = self._from_cache(words)
+
+        missing = [word for word in words if word not in translations]
+        if missing:
+            found = await self._from_table(missing)
+            self._remember(found)
+            translations.update(found)
+            missing = [word for word in missing if word not in found]
+
+        failed = {}
+        if missing:
+            translated, failed = await self._fetch_misses(missing)
+            translations.update(translated)
+
+        return translations, failed
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import Navbar from "./Navbar";
 import styles from "../styles/RestockScreen.module.css";
 import LoadingBackdrop from "./LoadingBackdrop";
@@ -40,6 +40,16 @@ const RestockScreen = () => {
    */
   const [error, setError] = useState(null);
 
+  /**
+   * @type {{current: string|null}} sessionId - Server-held chat session; the backend keeps the history.
+   */
+  const sessionId = useRef(null);
+
+  /**
+   * @type {{current: string|null}} sentPrompt - The prePrompt text the session already has.
+   */
+  const sentPrompt = useRef(null);
+
   useEffect(() => {
     /**
      * Fetches current inventory restock information and updates the prePrompt.
@@ -86,20 +96,39 @@ const RestockScreen = () => {
 
     setMessages(updatedMessages);
 
-    const apiMessages = [
-      { sender: "system", text: prePrompt.text },
-      ...updatedMessages,
-    ];
+    /**
+     * Posts messages to the chat session, starting one if needed.
+     * @param {Array.<{sender: string, text: string}>} newMessages - Messages the session does not have yet.
+     * @returns {Promise<Response>}
+     */
+    const postToSession = async (newMessages) => {
+      if (!sessionId.current) {
+        const session = await fetch(
+          "https://project-3-team-0g-backend.onrender.com/chat/sessions",
+          { method: "POST" }
+        );
+        if (!session.ok) throw new Error("Failed to start chat session.");
+        sessionId.current = (await session.json()).session_id;
+      }
+      return fetch("https://project-3-team-0g-backend.onrender.com/chat", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ session_id: sessionId.current, messages: newMessages }),
+      });
+    };
 
     try {
-      const response = await fetch(
-        "https://project-3-team-0g-backend.onrender.com/chat",
-        {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ messages: apiMessages }),
-        }
-      );
+      // only what the session has not seen: the prompt when it changed, and the new message
+      const promptMessages =
+        sentPrompt.current === prePrompt.text ? [] : [{ sender: "system", text: prePrompt.text }];
+      let response = await postToSession([...promptMessages, newMessage]);
+
+      if (response.status === 404) {
+        // the session expired: start over with the prompt and the history shown on screen
+        sessionId.current = null;
+        response = await postToSession([{ sender: "system", text: prePrompt.text }, ...updatedMessages]);
+      }
+      if (response.ok) sentPrompt.current = prePrompt.text;
 
       const data = await response.json();
       if (data.response) {
@@ -0,0 +1,66 @@
+"""
+Time the single-statement bulk update used by /mass-inventory-update and
+/modify-prices for a large batch. Rows are created in a temporary copy of the
+inventory table, so nothing real is modified.
+
+    python scripts/bench_bulk_updates.py --rows 10000
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from bulk import apply_updates, validate_updates  # noqa: E402
+
+
+load_dotenv()
+
+DB_PARAMS = {
+    "dbname": os.getenv("DATABASE_NAME"),
+    "user": os.getenv("USER"),
+    "password": os.getenv("PASSWORD"),
+    "host": os.getenv("HOST"),
+    "port": os.getenv("PG_PORT")
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--unknown", type=int, default=100, help="extra names that match nothing")
+    args = parser.parse_args()
+
+    with psycopg2.connect(**DB_PARAMS) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("CREATE TEMPORARY TABLE bench_inventory (LIKE inventory INCLUDING ALL) ON COMMIT DROP")
+            execute_values(
+                cursor,
+                "INSERT INTO bench_inventory (name, quantity, unit) VALUES %s",
+                [(f"ingredient {i}", 100, "lbs") for i in range(args.rows)],
+                page_size=1000
+            )
+
+            payload = [{"name": f"ingredient {i}", "quantity": 50 + i % 7} for i in range(args.rows)]
+            payload += [{"name": f"missing {i}", "quantity": 1} for i in range(args.unknown)]
+
+            start = time.perf_counter()
+            updates, errors = validate_updates(payload, "quantity")
+            validated = time.perf_counter()
+            matched = apply_updates(cursor, "bench_inventory", "name", "quantity", updates)
+            applied = time.perf_counter()
+
+            assert not errors
+            print(f"{len(payload)} rows: validate {(validated - start) * 1000:.1f} ms, "
+                  f"apply {(applied - validated) * 1000:.1f} ms, "
+                  f"{len(matched)} updated, {len(updates) - len(matched)} not found")
+            conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+Measure per-endpoint latency and throughput of backend/app.py against a
+seeded throwaway Postgres.
+
+Starts a local server (see local_postgres.py), loads the schema and
+migrations, seeds it with the requested volumes, then drives every
+benchmarked route through the Flask test client and over real HTTP with
+1..N concurrent clients; "--modes asgi" also drives backend/asgi.py under
+uvicorn and "--modes gunicorn" the production entry point at each
+--gunicorn-sizes. Results are written as JSON so two commits can be compared:
+
+    python scripts/bench_endpoints.py --orders 50000 --output before.json
+    python scripts/bench_endpoints.py --orders 50000 --output after.json --compare before.json
+
+Use --existing to create (and drop) a scratch database on the server in
+.env instead of starting one; initdb refuses to run as root.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+import psycopg2
+import requests
+from dotenv import load_dotenv
+
+from local_postgres import apply_schema, backend_env, scratch_database, throwaway_postgres
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+load_dotenv()
+
+DB_PARAMS = {
+    "dbname": os.getenv("DATABASE_NAME"),
+    "user": os.getenv("USER"),
+    "password": os.getenv("PASSWORD"),
+    "host": os.getenv("HOST"),
+    "port": os.getenv("PG_PORT")
+}
+
+MENU = {
+    "entree": ["Orange Chicken", "Beijing Beef", "Kung Pao Chicken", "Broccoli Beef", "Honey Walnut Shrimp",
+               "Grilled Teriyaki Chicken", "String Bean Chicken Breast", "Black Pepper Angus Steak"],
+    "side": ["Chow Mein", "Fried Rice", "White Steamed Rice", "Super Greens"],
+    "appetizer": ["Chicken Egg Roll", "Veggie Spring Roll", "Cream Cheese Rangoon"],
+    "drink": ["Fountain Drink", "Bottled Water"],
+}
+
+
+def seed_database(params, orders, meals_per_order, ingredients, translations, days, seed):
+    """Fill the schema with consistent synthetic data using set-based SQL, then build the rollups."""
+    from ledger import backfill_inventory_movements
+    from prices import PRICE_SLOTS
+    from rollups import backfill_item_sales_daily, backfill_sales_hourly
+
+    conn = psycopg2.connect(**params)
+    with conn, conn.cursor() as cursor:
+        cursor.execute("SELECT setseed(%s)", (seed % 1000 / 1000.0,))
+        cursor.execute("""
+            INSERT INTO employees (first_name, last_name, email, phone_number, is_manager, pass_hash)
+            SELECT 'Employee', g::text, 'employee' || g || '@example.com', '555-0' || g, g <= 2, md5(g::text)
+            FROM generate_series(1, 20) g
+        """)
+        for item_type, names in MENU.items():
+            cursor.executemany("INSERT INTO items (name, type) VALUES (%s, %s)", [(name, item_type) for name in names])
+        cursor.execute("""
+            INSERT INTO inventory (name, quantity, unit)
+            SELECT 'Ingredient ' || g, 1000 + floor(random() * 100000), 'oz'
+            FROM generate_series(1, %s) g
+        """, (ingredients,))
+        cursor.execute("""
+            INSERT INTO item_ingredients (item_name, ingredient_name, quantity_needed)
+            SELECT i.name, 'Ingredient ' || picks.ing, round((0.5 + random() * 4)::numeric, 2)
+            FROM items i
+            CROSS JOIN LATERAL (
+                -- referencing i makes the pick run once per item
+                SELECT DISTINCT 1 + floor(random() * %s)::int AS ing
+                FROM generate_series(1, 4)
+                WHERE i.name IS NOT NULL
+            ) picks
+        """, (ingredients,))
+        cursor.executemany(
+            "INSERT INTO prices (name, price) VALUES (%s, %s)",
+            [(name, round(random.Random(seed + index).uniform(1, 12), 2)) for index, name in enumerate(PRICE_SLOTS)]
+        )
+        cursor.execute("""
+            INSERT INTO orders (customer_name, order_date, employee_id, total_price)
+            SELECT 'Customer ' || g,
+                   date_trunc('second', now() - random() * make_interval(days => %s)),
+                   1 + g %% 20,
+                   round((6 + random() * 40)::numeric, 2)
+            FROM generate_series(1, %s) g
+        """, (days, orders))
+        cursor.execute("""
+            INSERT INTO meals (order_id, meal_type)
+            SELECT o.id, (ARRAY['bowl', 'plate', 'bigger plate'])[1 + floor(random() * 3)::int]
+            FROM orders o CROSS JOIN generate_series(1, %s)
+        """, (meals_per_order,))
+        cursor.execute("""
+            INSERT INTO meal_item (meal_id, item_name)
+            SELECT m.id, menu.names[1 + floor(random() * array_length(menu.names, 1))::int]
+            FROM meals m
+            CROSS JOIN (SELECT array_agg(name ORDER BY name) AS names FROM items) menu
+            CROSS JOIN LATERAL generate_series(1, CASE m.meal_type WHEN 'bowl' THEN 2 WHEN 'plate' THEN 3 ELSE 4 END) slot
+        """)
+        cursor.execute("""
+            INSERT INTO translations (en, es)
+            SELECT 'phrase ' || g, 'frase ' || g FROM generate_series(1, %s) g
+            ON CONFLICT DO NOTHING
+        """, (translations,))
+        backfill_inventory_movements(cursor)
+        backfill_sales_hourly(cursor)
+        backfill_item_sales_daily(cursor)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("VACUUM ANALYZE")
+    conn.close()
+
+
+def build_scenarios(params, seed):
+    """(name, method, path, json_factory) for each benchmarked route, reads first and writes last."""
+    rng = random.Random(seed)
+    with psycopg2.connect(**params) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT min(id), max(id) FROM orders")
+        min_order, max_order = cursor.fetchone()
+        cursor.execute("SELECT name FROM items ORDER BY name")
+        item_names = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT name FROM inventory ORDER BY name LIMIT 20")
+        inventory_names = [row[0] for row in cursor.fetchall()]
+    conn.close()
+
+    today = date.today()
+    month_ago = (today - timedelta(days=30)).isoformat()
+    year_ago = (today - timedelta(days=365)).isoformat()
+    tomorrow = (today + timedelta(days=1)).isoformat()
+
+    def order_payload():
+        meals = []
+        for _ in range(rng.randint(1, 3)):
+            meal_type = rng.choice(["bowl", "plate", "bigger plate"])
+            size = {"bowl": 2, "plate": 3, "bigger plate": 4}[meal_type]
+            meals.append({"meal_type": meal_type,
+                          "meal_items": [{"item_name": rng.choice(item_names)} for _ in range(size)]})
+        return {"customer_name": "bench", "order_date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "employee_id": 1, "total_price": 9.5 * len(meals), "items": meals}
+
+    return [
+        ("menu-items", "GET", "/menu-items", None),
+        ("view-prices", "GET", "/view-prices", None),
+        ("customer-prices", "GET", "/get-customer-prices", None),
+        ("inventory", "GET", "/inventory", None),
+        ("restock-info", "GET", "/inventory-restock-info?limit=10", None),
+        ("employees", "GET", "/employees", None),
+        ("orders-page", "GET", "/orders?limit=10", None),
+        ("orders-filtered", "GET", f"/orders?limit=10&date_from={month_ago}&price_min=20", None),
+        ("order-details", "GET", lambda: f"/orders/{rng.randint(min_order, max_order)}/details", None),
+        ("orders-export-day", "GET", f"/orders/export?date_from={today.isoformat()}&format=ndjson", None),
+        ("sales-trends-month", "GET", f"/get-sales-trends?start_date={month_ago}&end_date={tomorrow}", None),
+        ("sales-trends-year", "GET",
+         f"/get-sales-trends?start_date={year_ago}&end_date={tomorrow}&granularity=week", None),
+        ("productusage-month", "GET", f"/get-productusage?start_date={month_ago}&end_date={tomorrow}", None),
+        ("x-report", "GET", f"/get-x-report?report_date={today.isoformat()}&up_to_hour=23", None),
+        ("z-report-closed", "GET",
+         f"/get-z-report?report_date={(today - timedelta(days=1)).isoformat()}", None),
+        ("translations", "POST", "/get-translations",
+         lambda: {"en": [f"phrase {rng.randint(1, 50)}" for _ in range(10)]}),
+        ("submit-order", "POST", "/submit-order", order_payload),
+        ("mass-inventory-update", "POST", "/mass-inventory-update",
+         lambda: {"updates": [{"name": name, "quantity": rng.randint(1000, 5000)} for name in inventory_names]}),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def drive(send, scenario, requests_per_client, clients, warmup):
+    """Run one scenario from ``clients`` threads; returns the result record."""
+    name, method, path, body = scenario
+    resolve_path = path if callable(path) else (lambda: path)
+    make_body = body or (lambda: None)
+
+    for _ in range(warmup):
+        send(method, resolve_path(), make_body())
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients + 1)
+
+    def client():
+        timings = []
+        failures = 0
+        start_barrier.wait()
+        for _ in range(requests_per_client):
+            request_path, payload = resolve_path(), make_body()
+            started = time.perf_counter()
+            status = send(method, request_path, payload)
+            timings.append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                failures += 1
+        with lock:
+            latencies.extend(timings)
+            errors.append(failures)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "method": method,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def test_client_sender(app):
+    local = threading.local()
+
+    def send(method, path, payload):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        response = local.client.open(path, method=method, json=payload)
+        response.get_data()
+        return response.status_code
+    return send
+
+
+def http_sender(base_url):
+    local = threading.local()
+
+    def send(method, path, payload):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        response = local.session.request(method, base_url + path, json=payload, timeout=60)
+        response.content
+        return response.status_code
+    return send
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_asgi_server():
+    """Serve backend/asgi.py with uvicorn on a free port in a background thread."""
+    import uvicorn
+    from asgi import app as asgi_app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+@contextmanager
+def gunicorn_server(workers, threads, ready_timeout=60):
+    """Run the production entry point (backend/gunicorn.conf.py) with ``workers`` x ``threads``."""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               DB_POOL_MAX=str(threads + 2))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(BACKEND_DIR / "gunicorn.conf.py"),
+         "--bind", f"127.0.0.1:{port}", "--access-logfile", "/dev/null"],
+        env=env, cwd=BACKEND_DIR
+    )
+    try:
+        deadline = time.monotonic() + ready_timeout
+        while True:
+            try:
+                if requests.get(base_url + "/ready", timeout=5).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"gunicorn {workers}x{threads} did not become ready")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BACKEND_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, results):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    previous = {(r["mode"], r["clients"], r["endpoint"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('commit')}):")
+    print(f"  {'mode':<14} {'c':>3} {'endpoint':<22} {'p95 ms':>18} {'rps':>20}")
+    for result in results:
+        old = previous.get((result["mode"], result["clients"], result["endpoint"]))
+        if not old:
+            continue
+        p95_change = (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0
+        rps_change = (result["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] * 100 \
+            if old["throughput_rps"] else 0
+        print(f"  {result['mode']:<14} {result['clients']:>3} {result['endpoint']:<22} "
+              f"{old['p95_ms']:8.2f} {p95_change:+7.1f}%  {old['throughput_rps']:9.1f} {rps_change:+7.1f}%")
+
+
+def run(params, args):
+    apply_schema(params)
+    started = time.perf_counter()
+    seed_database(params, args.orders, args.meals_per_order, args.ingredients, args.translations,
+                  args.days, args.seed)
+    print(f"seeded {args.orders} orders in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+    # app.py reads its settings at import time
+    os.environ.update(backend_env(params))
+    os.environ["DB_POOL_MAX"] = str(max(args.clients) + 2)
+    os.environ["ASGI_DB_POOL_MAX"] = str(max(args.clients) + 2)
+    os.environ["GOOGLE_TRANSLATE_API_URL"] = "http://127.0.0.1:9/"
+    from app import create_app
+    from werkzeug.serving import make_server
+
+    app = create_app()
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    senders = {
+        "test-client": test_client_sender(app),
+        "http": http_sender(f"http://127.0.0.1:{server.server_port}"),
+    }
+    asgi_server = None
+    if "asgi" in args.modes:
+        asgi_server, asgi_url = start_asgi_server()
+        senders["asgi"] = http_sender(asgi_url)
+
+    scenarios = build_scenarios(params, args.seed)
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if scenario[0] in args.only]
+
+    results = []
+    try:
+        for mode in args.modes:
+            if mode != "gunicorn":
+                results += drive_all(mode, senders[mode], scenarios, args)
+                continue
+            for size in args.gunicorn_sizes:
+                workers, threads = (int(n) for n in size.split("x"))
+                with gunicorn_server(workers, threads) as base_url:
+                    results += drive_all(f"gunicorn-{size}", http_sender(base_url), scenarios, args)
+    finally:
+        server.shutdown()
+        if asgi_server is not None:
+            asgi_server.should_exit = True
+    return results
+
+
+def drive_all(mode, send, scenarios, args):
+    results = []
+    for clients in args.clients:
+        for scenario in scenarios:
+            result = dict(drive(send, scenario, args.requests, clients, args.warmup), mode=mode, clients=clients)
+            results.append(result)
+            print(f"{mode:<14} c={clients:<3} {result['endpoint']:<22} {result['throughput_rps']:9.1f} rps  "
+                  f"p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms"
+                  + (f"  {result['errors']} errors" if result["errors"] else ""), file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--meals-per-order", type=int, default=2)
+    parser.add_argument("--ingredients", type=int, default=40)
+    parser.add_argument("--translations", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365, help="spread orders over this many past days")
+    parser.add_argument("--requests", type=int, default=200, help="requests per client per endpoint")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--modes", nargs="+", choices=["test-client", "http", "asgi", "gunicorn"],
+                        default=["test-client", "http"])
+    parser.add_argument("--gunicorn-sizes", nargs="+", default=["1x8", "2x8", "4x4"],
+                        help="WORKERSxTHREADS of the gunicorn entry point to measure with --modes gunicorn")
+    parser.add_argument("--only", nargs="+", help="endpoint names to run (default: all)")
+    parser.add_argument("--seed", type=int, default=331)
+    parser.add_argument("--existing", action="store_true",
+                        help="use a scratch database on the server configured in .env")
+    parser.add_argument("--pg-bin", help="directory with initdb and pg_ctl")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    database = scratch_database(DB_PARAMS) if args.existing else throwaway_postgres(args.pg_bin)
+    with database as params:
+        results = run(params, args)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "orders": args.orders,
+            "meals_per_order": args.meals_per_order,
+            "ingredients": args.ingredients,
+            "translations": args.translations,
+            "requests_per_client": args.requests,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compare the JSON providers and response compression on payloads shaped
+like the largest responses (/orders pages, a year of /get-sales-trends,
+/inventory-restock-info), without a database.
+
+For each payload and provider it reports the serialization time per
+response and the bytes (and time) of sending it uncompressed, gzipped and
+brotli-compressed.
+
+    python scripts/bench_json_encoding.py --orders 1000 --items 25 --ingredients 200
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from flask import Flask  # noqa: E402
+
+from encoding import JSON_PROVIDERS, brotli, compress_body  # noqa: E402
+
+
+def orders_page(rng, count):
+    start = datetime(2024, 1, 1)
+    orders = [
+        {
+            "id": 1000000 - index,
+            "customer_name": rng.choice(["alex", "sam", "jordan", "kiosk", "taylor"]),
+            "order_date": start + timedelta(minutes=rng.randint(0, 500000)),
+            "employee_first_name": rng.choice(["Nashif", "Bryant", "Logan", "Alex"]),
+            "employee_last_name": rng.choice(["Smith", "Lee", "Garcia"]),
+            "total_price": Decimal(rng.randint(500, 4000)) / 100,
+        }
+        for index in range(count)
+    ]
+    return {"orders": orders, "next_cursor": "WyIyMDI0LTAxLTAxVDAwOjAwOjAwIiwgMTAwMDAwMF0="}
+
+
+def sales_trends(rng, items, days=365):
+    start = date(2024, 1, 1)
+    return {
+        f"Menu item {item}": [
+            {"date": start + timedelta(days=day), "count": Decimal(rng.randint(0, 400)),
+             "servings": Decimal(rng.randint(0, 600))}
+            for day in range(days)
+        ]
+        for item in range(items)
+    }
+
+
+def restock_info(rng, ingredients):
+    return [
+        {"ingredient_name": f"Ingredient {index}", "current_quantity": rng.uniform(0, 500),
+         "total_quantity_needed": rng.uniform(0, 50), "priority_score": rng.uniform(0, 10)}
+        for index in range(ingredients)
+    ]
+
+
+def measure(provider, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = provider.response(payload).get_data()
+        timings.append(time.perf_counter() - started)
+    return body, statistics.median(timings)
+
+
+def compressed(body, encoding):
+    started = time.perf_counter()
+    size = len(compress_body(body, encoding))
+    return size, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000, help="orders on one /orders page")
+    parser.add_argument("--items", type=int, default=25, help="items charted by /get-sales-trends")
+    parser.add_argument("--ingredients", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=331)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = {
+        "orders": orders_page(rng, args.orders),
+        "sales-trends": sales_trends(rng, args.items),
+        "restock-info": restock_info(rng, args.ingredients),
+    }
+
+    app = Flask(__name__)
+    print(f"{'payload':<14} {'provider':<8} {'encode ms':>10} {'bytes':>10} "
+          f"{'gzip':>9} {'gzip ms':>8} {'br':>9} {'br ms':>8}")
+    for name, payload in payloads.items():
+        measured = {}
+        for provider_name, provider_class in JSON_PROVIDERS.items():
+            provider = provider_class(app)
+            with app.app_context():
+                body, seconds = measure(provider, payload, args.repeat)
+            gzipped, gzip_seconds = compressed(body, "gzip")
+            brotlied, br_seconds = compressed(body, "br") if brotli is not None else (None, 0.0)
+            measured[provider_name] = (seconds, len(body), gzipped, brotlied)
+            print(f"{name:<14} {provider_name:<8} {seconds * 1000:10.2f} {len(body):10d} "
+                  f"{gzipped:9d} {gzip_seconds * 1000:8.2f} {brotlied if brotlied is not None else '-':>9} "
+                  f"{br_seconds * 1000:8.2f}")
+
+        (fast, _, gzipped, brotlied), (slow, stdlib_size, _, _) = measured["orjson"], measured["stdlib"]
+        smallest = min(value for value in (gzipped, brotlied) if value is not None)
+        print(f"{'':<14} orjson: {(1 - fast / slow) * 100:.0f}% less encode time; "
+              f"compressed: {(1 - smallest / stdlib_size) * 100:.0f}% fewer bytes than before")
+
+
+if __name__ == "__main__":
+    main()
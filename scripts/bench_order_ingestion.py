@@ -0,0 +1,178 @@
+"""
+Compare order ingestion throughput with synchronous writes (one transaction
+per order, as /submit-order does by default) against the group-committed
+OrderQueue (ORDER_INGESTION=queue) and against a kiosk replaying the same
+orders as /submit-orders batches, which is then replayed again to check
+that every order comes back as a duplicate.
+
+The orders are committed, so run this against a scratch copy of the
+database, never production:
+
+    python scripts/bench_order_ingestion.py --orders 2000 --clients 16
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from caches import VersionedCache  # noqa: E402
+from db import ConnectionPool  # noqa: E402
+from order_queue import OrderQueue  # noqa: E402
+from orders import load_recipes, write_order, write_order_batch  # noqa: E402
+
+
+load_dotenv()
+
+DB_PARAMS = {
+    "dbname": os.getenv("DATABASE_NAME"),
+    "user": os.getenv("USER"),
+    "password": os.getenv("PASSWORD"),
+    "host": os.getenv("HOST"),
+    "port": os.getenv("PG_PORT")
+}
+
+MEAL_SIZES = {"bowl": 2, "plate": 3, "bigger plate": 4}
+
+
+def make_order(item_names):
+    items = []
+    for _ in range(random.randint(1, 3)):
+        meal_type = random.choice(list(MEAL_SIZES))
+        items.append({
+            "meal_type": meal_type,
+            "meal_items": [{"item_name": random.choice(item_names)} for _ in range(MEAL_SIZES[meal_type])]
+        })
+    return {
+        "customer_name": "bench-ingestion",
+        "order_date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "employee_id": None,
+        "total_price": 10.00 * len(items),
+        "items": items
+    }
+
+
+def run_clients(orders, clients, submit):
+    """Submit ``orders`` from ``clients`` threads; returns per-call latencies in ms."""
+    latencies = []
+    lock = threading.Lock()
+    chunks = [orders[i::clients] for i in range(clients)]
+
+    def client(chunk):
+        timings = []
+        for order in chunk:
+            start = time.perf_counter()
+            submit(order)
+            timings.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(timings)
+
+    threads = [threading.Thread(target=client, args=(chunk,)) for chunk in chunks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def report(label, count, elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"  {label:<6} {count / elapsed:8.1f} orders/s   "
+          f"submit p50 {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=331)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    pool = ConnectionPool(1, args.clients + 2, **DB_PARAMS)
+
+    @contextmanager
+    def cursor_context():
+        with pool.connection() as conn, conn.cursor() as cursor:
+            yield cursor
+
+    recipes = VersionedCache("recipes", load_recipes, cursor_context)
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT ii.item_name
+            FROM item_ingredients ii
+            WHERE NOT EXISTS (
+                SELECT 1 FROM item_ingredients x
+                LEFT JOIN inventory i ON i.name = x.ingredient_name
+                WHERE x.item_name = ii.item_name AND i.name IS NULL
+            )
+        """)
+        item_names = [row[0] for row in cursor.fetchall()]
+    if not item_names:
+        sys.exit("No menu items with a complete recipe found in item_ingredients.")
+
+    orders = [make_order(item_names) for _ in range(args.orders)]
+    print(f"{args.orders} orders from {args.clients} clients")
+
+    def submit_sync(order):
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                write_order(cursor, order, recipes.get(cursor))
+            conn.commit()
+
+    start = time.perf_counter()
+    latencies = run_clients(orders, args.clients, submit_sync)
+    report("sync", len(orders), time.perf_counter() - start, latencies)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        queue = OrderQueue(os.path.join(scratch, "bench_queue.sqlite3"), pool.connection, recipes,
+                           batch_size=args.batch_size, max_depth=args.orders + 1)
+        queue.start()
+        start = time.perf_counter()
+        latencies = run_clients(orders, args.clients, queue.enqueue)
+        # throughput counts until the last order is in Postgres, not just accepted
+        queue.stop(timeout=600)
+        report("queue", len(orders), time.perf_counter() - start, latencies)
+        stats = queue.stats()
+        print(f"         {stats['batches']} batches, {stats['failed']} failed, {stats['depth']} left in queue")
+
+    run_id = time.time_ns()
+    keyed = [dict(order, idempotency_key=f"bench-{run_id}-{index}") for index, order in enumerate(orders)]
+    batches = [keyed[i:i + args.batch_size] for i in range(0, len(keyed), args.batch_size)]
+    statuses = Counter()
+
+    def submit_batch(batch):
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                results = write_order_batch(cursor, batch, recipes.get(cursor))
+            conn.commit()
+        statuses.update(status for status, _ in results)
+
+    # one kiosk replaying its backlog, one batch after the other
+    start = time.perf_counter()
+    latencies = run_clients(batches, 1, submit_batch)
+    report("batch", len(orders), time.perf_counter() - start, latencies)
+    print(f"         {len(batches)} batches: {dict(statuses)}")
+
+    statuses.clear()
+    start = time.perf_counter()
+    latencies = run_clients(batches, 1, submit_batch)
+    report("replay", len(orders), time.perf_counter() - start, latencies)
+    print(f"         {len(batches)} batches: {dict(statuses)}")
+
+    pool.closeall()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Compare the old per-item submit_order write path with the set-based one in
+backend/orders.py. Every order is written inside a transaction that is rolled
+back, so the database is left unchanged (apart from advanced sequences).
+
+    python scripts/bench_submit_order.py --iterations 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import extensions
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from orders import load_recipes, write_order  # noqa: E402
+
+
+load_dotenv()
+
+DB_PARAMS = {
+    "dbname": os.getenv("DATABASE_NAME"),
+    "user": os.getenv("USER"),
+    "password": os.getenv("PASSWORD"),
+    "host": os.getenv("HOST"),
+    "port": os.getenv("PG_PORT")
+}
+
+MEAL_SIZES = {"bowl": 2, "plate": 3, "bigger plate": 4}
+
+
+class CountingCursor(extensions.cursor):
+    statements = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.statements += 1
+        return super().execute(query, vars)
+
+
+def legacy_write_order(cursor, data):
+    """The per-item write path submit_order used before the set-based rewrite."""
+    cursor.execute(
+        """
+        INSERT INTO orders (customer_name, order_date, employee_id, total_price)
+        VALUES (%s, %s, %s, %s) RETURNING id
+        """,
+        (data["customer_name"], data["order_date"], data.get("employee_id"), data["total_price"])
+    )
+    order_id = cursor.fetchone()[0]
+
+    ingredient_usage = {}
+    for meal in data["items"]:
+        cursor.execute(
+            "INSERT INTO meals (order_id, meal_type) VALUES (%s, %s) RETURNING id",
+            (order_id, meal["meal_type"])
+        )
+        meal_id = cursor.fetchone()[0]
+
+        for item in meal["meal_items"]:
+            cursor.execute(
+                "INSERT INTO meal_item (meal_id, item_name) VALUES (%s, %s)",
+                (meal_id, item["item_name"])
+            )
+            cursor.execute(
+                "SELECT ingredient_name, quantity_needed FROM item_ingredients WHERE item_name = %s",
+                (item["item_name"],)
+            )
+            for ingredient_name, quantity_needed in cursor.fetchall():
+                ingredient_usage[ingredient_name] = ingredient_usage.get(ingredient_name, 0) + quantity_needed
+
+    for ingredient_name, total_needed in ingredient_usage.items():
+        cursor.execute("SELECT quantity FROM inventory WHERE name = %s", (ingredient_name,))
+        if cursor.fetchone() is None:
+            raise RuntimeError(f"Ingredient '{ingredient_name}' not found in inventory.")
+        cursor.execute(
+            "UPDATE inventory SET quantity = quantity - %s WHERE name = %s",
+            (total_needed, ingredient_name)
+        )
+    return order_id
+
+
+def make_order(item_names, meal_count):
+    items = []
+    for _ in range(meal_count):
+        meal_type = random.choice(list(MEAL_SIZES))
+        items.append({
+            "meal_type": meal_type,
+            "meal_items": [{"item_name": random.choice(item_names)} for _ in range(MEAL_SIZES[meal_type])]
+        })
+    return {
+        "customer_name": "bench",
+        "order_date": "2024-02-10 12:00:00",
+        "employee_id": None,
+        "total_price": 10.00 * meal_count,
+        "items": items
+    }
+
+
+def run(conn, write, orders):
+    timings = []
+    CountingCursor.statements = 0
+    for order in orders:
+        with conn.cursor() as cursor:
+            start = time.perf_counter()
+            write(cursor, order)
+            timings.append((time.perf_counter() - start) * 1000)
+        conn.rollback()
+    return timings, CountingCursor.statements / len(orders)
+
+
+def report(label, timings, statements):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"  {label:<10} {statements:6.1f} stmts/order   "
+          f"mean {statistics.mean(timings):7.2f} ms   p50 {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--meals", type=int, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--seed", type=int, default=331)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    conn = psycopg2.connect(cursor_factory=CountingCursor, **DB_PARAMS)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT ii.item_name
+                FROM item_ingredients ii
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM item_ingredients x
+                    LEFT JOIN inventory i ON i.name = x.ingredient_name
+                    WHERE x.item_name = ii.item_name AND i.name IS NULL
+                )
+            """)
+            item_names = [row[0] for row in cursor.fetchall()]
+            recipes = load_recipes(cursor)
+        conn.rollback()
+        if not item_names:
+            sys.exit("No menu items with a complete recipe found in item_ingredients.")
+
+        def set_based_write_order(cursor, order):
+            return write_order(cursor, order, recipes)
+
+        for meal_count in args.meals:
+            orders = [make_order(item_names, meal_count) for _ in range(args.iterations)]
+            print(f"{meal_count} meal(s) per order, {args.iterations} orders")
+            report("per-item", *run(conn, legacy_write_order, orders))
+            report("set-based", *run(conn, set_based_write_order, orders))
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Stream /orders/export through the Flask test client and report the
+process's resident memory as the export progresses. RSS should level off
+after the first batches no matter how many orders the range holds.
+
+    python scripts/check_export_memory.py --format ndjson --date-from 2020-01-01
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from app import create_app  # noqa: E402
+
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--format", default="csv", choices=["csv", "ndjson"])
+    parser.add_argument("--date-from")
+    parser.add_argument("--date-to")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--report-every", type=int, default=50, help="chunks between memory readings")
+    args = parser.parse_args()
+
+    params = {"format": args.format}
+    if args.date_from:
+        params["date_from"] = args.date_from
+    if args.date_to:
+        params["date_to"] = args.date_to
+    if args.gzip:
+        params["gzip"] = "1"
+
+    client = create_app().test_client()
+    start = time.perf_counter()
+    response = client.get("/orders/export", query_string=params, buffered=False)
+    if response.status_code != 200:
+        sys.exit(f"{response.status_code}: {response.get_data(as_text=True)}")
+
+    total = 0
+    print(f"start     rss {rss_mb():8.1f} MB")
+    for count, chunk in enumerate(response.response, 1):
+        total += len(chunk)
+        if count % args.report_every == 0:
+            print(f"{total / 2**20:8.1f} MB streamed   rss {rss_mb():8.1f} MB")
+    response.close()
+    print(f"done: {total / 2**20:.1f} MB in {time.perf_counter() - start:.1f} s, rss {rss_mb():.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
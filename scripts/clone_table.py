@@ -1,3 +1,4 @@
+import io
 import psycopg2
 import random
 import string
@@ -44,15 +45,31 @@ def get_column_info(cursor, table):
     """)
     return cursor.fetchall()
 
+def copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def copy_lines(cursor, table, column_names, lines):
+    """COPY already formatted, tab-separated text lines into table."""
+    buffer = io.StringIO("".join(lines))
+    cursor.copy_expert(f"COPY {table} ({', '.join(column_names)}) FROM STDIN", buffer)
+
+def copy_rows(cursor, table, column_names, rows):
+    """COPY Python rows into table in one round trip instead of one INSERT per row."""
+    copy_lines(cursor, table, column_names, ("\t".join(map(copy_value, row)) + "\n" for row in rows))
+
 def populate_dummy_table(cursor, dummy_table, columns, n):
-    for _ in range(n):
-        values = [
-            random_value(data_type)
-            for _, data_type, max_length in columns
-        ]
-        placeholders = ', '.join(['%s'] * len(values))
-        column_names = ', '.join([col for col, _, _ in columns])
-        cursor.execute(f"INSERT INTO {dummy_table} ({column_names}) VALUES ({placeholders})", values)
+    rows = [
+        [random_value(data_type) for _, data_type, max_length in columns]
+        for _ in range(n)
+    ]
+    copy_rows(cursor, dummy_table, [col for col, _, _ in columns], rows)
 
 def main():
     original_table = "prices"
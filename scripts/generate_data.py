@@ -0,0 +1,269 @@
+"""
+Generate production-scale, referentially consistent order history.
+
+Fills employees, items, inventory and item_ingredients when they are empty
+(and reuses them otherwise), then appends --orders orders with their meals
+and meal items. Orders follow lunch and dinner peaks, busier weekends and a
+long-tailed item popularity. Order chunks are generated and COPYed by
+--workers processes at once; every chunk has its own seed and id block, so
+the data depends on --seed only, not on the number of workers.
+
+    python scripts/generate_data.py --orders 5000000 --workers 8
+    python scripts/generate_data.py --orders 100000 --suffix _clone   # into *_clone copies (see clone_table.py)
+
+Only point this at a scratch or benchmark database (e.g. one started with
+local_postgres.py): it writes real rows. Ids inside a chunk are dense, with
+gaps between chunks.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import psycopg2
+
+from clone_table import DB_PARAMS, copy_lines, copy_rows, create_dummy_table
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from ledger import backfill_inventory_movements  # noqa: E402
+from rollups import backfill_item_sales_daily, backfill_sales_hourly  # noqa: E402
+
+MEAL_SHAPES = {
+    # meal_type: (weight, sides, entrees, other item type)
+    "bowl": (30, 1, 1, None),
+    "plate": (38, 1, 2, None),
+    "bigger plate": (14, 1, 3, None),
+    "a la carte": (8, 0, 1, None),
+    "appetizer": (5, 0, 0, "appetizer"),
+    "drink": (5, 0, 0, "drink"),
+}
+MEALS_PER_ORDER = {1: 55, 2: 28, 3: 11, 4: 4, 6: 2}
+MAX_MEALS = max(MEALS_PER_ORDER)
+MAX_ITEMS_PER_MEAL = max(sides + entrees + (1 if other else 0) for _, sides, entrees, other in MEAL_SHAPES.values())
+
+# share of the day's orders placed in each hour (store open 10:00-21:59)
+HOURLY_WEIGHTS = {10: 3, 11: 10, 12: 16, 13: 12, 14: 6, 15: 4, 16: 5, 17: 10, 18: 13, 19: 10, 20: 7, 21: 4}
+WEEKDAY_WEIGHTS = [1.0, 0.95, 1.0, 1.05, 1.25, 1.4, 1.3]
+
+MEAL_PRICES = {"bowl": 8.30, "plate": 9.80, "bigger plate": 11.30, "a la carte": 5.20,
+               "appetizer": 2.00, "drink": 2.10}
+
+MENU = {
+    "entree": ["Orange Chicken", "Beijing Beef", "Broccoli Beef", "Kung Pao Chicken", "Honey Walnut Shrimp",
+               "Grilled Teriyaki Chicken", "String Bean Chicken Breast", "Black Pepper Angus Steak",
+               "Mushroom Chicken", "Honey Sesame Chicken Breast", "Sweetfire Chicken Breast",
+               "Black Pepper Chicken", "Super Greens Entree"],
+    "side": ["Chow Mein", "Fried Rice", "White Steamed Rice", "Super Greens"],
+    "appetizer": ["Chicken Egg Roll", "Veggie Spring Roll", "Cream Cheese Rangoon", "Apple Pie Roll"],
+    "drink": ["Fountain Drink", "Bottled Water", "Gatorade"],
+}
+
+
+def cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def popularity(count, skew=1.1):
+    """Zipf-like weights: the first item is ordered most, with a long tail."""
+    return cumulative([1 / (rank ** skew) for rank in range(1, count + 1)])
+
+
+def table_name(name, suffix):
+    return name + suffix
+
+
+def prepare_tables(cursor, suffix):
+    """In clone mode create the *_<suffix> tables (clone_table.py style) if missing."""
+    if not suffix:
+        return
+    for name in ("employees", "items", "inventory", "item_ingredients", "orders", "meals", "meal_item"):
+        cursor.execute("SELECT to_regclass(%s)", (table_name(name, suffix),))
+        if cursor.fetchone()[0] is None:
+            create_dummy_table(cursor, name, table_name(name, suffix))
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name})")
+            if name in ("employees", "items", "inventory", "item_ingredients") and cursor.fetchone()[0]:
+                cursor.execute(f"INSERT INTO {table_name(name, suffix)} SELECT * FROM {name}")
+
+
+def load_dimensions(cursor, suffix, employees, ingredients, rng):
+    """Create the small tables when empty; return (employee ids, {item type: [names]})."""
+    cursor.execute(f"SELECT count(*) FROM {table_name('employees', suffix)}")
+    if not cursor.fetchone()[0]:
+        copy_rows(cursor, table_name("employees", suffix),
+                  ["first_name", "last_name", "email", "phone_number", "is_manager", "pass_hash"],
+                  [("Employee", str(n), f"employee{n}@example.com", f"555-{n:04d}", n <= max(1, employees // 10),
+                    None) for n in range(1, employees + 1)])
+
+    cursor.execute(f"SELECT count(*) FROM {table_name('items', suffix)}")
+    if not cursor.fetchone()[0]:
+        copy_rows(cursor, table_name("items", suffix), ["name", "type"],
+                  [(name, item_type) for item_type, names in MENU.items() for name in names])
+
+    cursor.execute(f"SELECT count(*) FROM {table_name('inventory', suffix)}")
+    if not cursor.fetchone()[0]:
+        copy_rows(cursor, table_name("inventory", suffix), ["name", "quantity", "unit"],
+                  [(f"Ingredient {n}", rng.randint(5000, 500000), "oz") for n in range(1, ingredients + 1)])
+
+    cursor.execute(f"SELECT count(*) FROM {table_name('item_ingredients', suffix)}")
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"SELECT name FROM {table_name('inventory', suffix)} ORDER BY name")
+        ingredient_names = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT name FROM {table_name('items', suffix)} ORDER BY name")
+        copy_rows(cursor, table_name("item_ingredients", suffix), ["item_name", "ingredient_name", "quantity_needed"], [
+            (item_name, ingredient_name, round(rng.uniform(0.5, 6), 2))
+            for (item_name,) in cursor.fetchall()
+            for ingredient_name in rng.sample(ingredient_names, min(len(ingredient_names), rng.randint(2, 6)))
+        ])
+
+    cursor.execute(f"SELECT id FROM {table_name('employees', suffix)} ORDER BY id")
+    employee_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f"SELECT type, name FROM {table_name('items', suffix)} ORDER BY type, name")
+    menu = {}
+    for item_type, name in cursor.fetchall():
+        menu.setdefault(item_type, []).append(name)
+    return employee_ids, menu
+
+
+def next_ids(cursor, suffix):
+    """First free id of orders, meals and meal_item."""
+    ids = []
+    for name in ("orders", "meals", "meal_item"):
+        cursor.execute(f"SELECT COALESCE(max(id), 0) + 1 FROM {table_name(name, suffix)}")
+        ids.append(cursor.fetchone()[0])
+    return ids
+
+
+def generate_chunk(job):
+    """Worker: generate one chunk of orders and COPY it. Returns (orders, meals, meal items)."""
+    (chunk, count, first_order, first_meal, first_item, seed, start_day, days, employee_ids, menu,
+     db_params, suffix) = job
+    rng = random.Random(f"{seed}:{chunk}")
+
+    day_weights = cumulative([WEEKDAY_WEIGHTS[(start_day + timedelta(days=d)).weekday()] for d in range(days)])
+    hours = list(HOURLY_WEIGHTS)
+    hour_weights = cumulative(HOURLY_WEIGHTS.values())
+    meal_types = list(MEAL_SHAPES)
+    meal_type_weights = cumulative(shape[0] for shape in MEAL_SHAPES.values())
+    meal_counts = list(MEALS_PER_ORDER)
+    meal_count_weights = cumulative(MEALS_PER_ORDER.values())
+    # popularity rank is a shuffle seeded by --seed alone, so it is the same in
+    # every chunk; types missing from the menu fall back to the whole menu
+    ranking = random.Random(seed)
+    everything = sorted(name for names in menu.values() for name in names)
+    ranked = {item_type: ranking.sample(menu.get(item_type) or everything, len(menu.get(item_type) or everything))
+              for item_type in MENU}
+    ranked_weights = {item_type: popularity(len(names)) for item_type, names in ranked.items()}
+
+    def pick(item_type, k):
+        return rng.choices(ranked[item_type], cum_weights=ranked_weights[item_type], k=k)
+
+    days_picked = rng.choices(range(days), cum_weights=day_weights, k=count)
+    hours_picked = rng.choices(hours, cum_weights=hour_weights, k=count)
+
+    order_lines, meal_lines, item_lines = [], [], []
+    meal_id, item_id = first_meal, first_item
+    for index in range(count):
+        order_id = first_order + index
+        order_date = datetime.combine(start_day + timedelta(days=days_picked[index]), datetime.min.time()) \
+            + timedelta(hours=hours_picked[index], seconds=rng.randrange(3600))
+        total = 0.0
+        meal_count = rng.choices(meal_counts, cum_weights=meal_count_weights)[0]
+        for meal_type in rng.choices(meal_types, cum_weights=meal_type_weights, k=meal_count):
+            _, sides, entrees, other = MEAL_SHAPES[meal_type]
+            total += MEAL_PRICES[meal_type]
+            meal_lines.append(f"{meal_id}\t{order_id}\t{meal_type}\n")
+            names = pick("side", sides) + pick("entree", entrees) + (pick(other, 1) if other else [])
+            for name in names:
+                item_lines.append(f"{item_id}\t{meal_id}\t{name}\n")
+                item_id += 1
+            meal_id += 1
+        customer = f"Customer {rng.randrange(1, 200000)}"
+        order_lines.append(f"{order_id}\t{customer}\t{order_date:%Y-%m-%d %H:%M:%S}\t"
+                           f"{rng.choice(employee_ids)}\t{total:.2f}\n")
+
+    conn = psycopg2.connect(**db_params)
+    try:
+        with conn.cursor() as cursor:
+            copy_lines(cursor, table_name("orders", suffix),
+                       ["id", "customer_name", "order_date", "employee_id", "total_price"], order_lines)
+            copy_lines(cursor, table_name("meals", suffix), ["id", "order_id", "meal_type"], meal_lines)
+            copy_lines(cursor, table_name("meal_item", suffix), ["id", "meal_id", "item_name"], item_lines)
+        conn.commit()
+    finally:
+        conn.close()
+    return count, len(meal_lines), len(item_lines)
+
+
+def reset_sequences(cursor, suffix):
+    for name in ("employees", "orders", "meals", "meal_item"):
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table_name(name, suffix),))
+        sequence = cursor.fetchone()[0]
+        if sequence:
+            cursor.execute(f"SELECT setval(%s, (SELECT COALESCE(max(id), 1) FROM {table_name(name, suffix)}))",
+                           (sequence,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=365, help="spread orders over this many days")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date.today(), help="last day (YYYY-MM-DD)")
+    parser.add_argument("--employees", type=int, default=40)
+    parser.add_argument("--ingredients", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--chunk-size", type=int, default=50000, help="orders per COPY transaction")
+    parser.add_argument("--seed", type=int, default=331)
+    parser.add_argument("--suffix", default="", help="write to <table><suffix> clones instead of the real tables")
+    parser.add_argument("--rollups", action="store_true",
+                        help="rebuild the ledger and report rollups afterwards (real tables only)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    conn = psycopg2.connect(**DB_PARAMS)
+    with conn.cursor() as cursor:
+        prepare_tables(cursor, args.suffix)
+        employee_ids, menu = load_dimensions(cursor, args.suffix, args.employees, args.ingredients,
+                                             random.Random(args.seed))
+        first_order, first_meal, first_item = next_ids(cursor, args.suffix)
+    conn.commit()
+
+    start_day = args.end_date - timedelta(days=args.days - 1)
+    chunks = [min(args.chunk_size, args.orders - offset) for offset in range(0, args.orders, args.chunk_size)]
+    meal_block = args.chunk_size * MAX_MEALS
+    item_block = meal_block * MAX_ITEMS_PER_MEAL
+    jobs = [
+        (chunk, count, first_order + chunk * args.chunk_size, first_meal + chunk * meal_block,
+         first_item + chunk * item_block, args.seed, start_day, args.days, employee_ids, menu, DB_PARAMS, args.suffix)
+        for chunk, count in enumerate(chunks)
+    ]
+
+    totals = [0, 0, 0]
+    with multiprocessing.Pool(args.workers) as pool:
+        for done in pool.imap_unordered(generate_chunk, jobs):
+            totals = [total + value for total, value in zip(totals, done)]
+            elapsed = time.perf_counter() - started
+            print(f"{totals[0]:>12,} orders {totals[1]:>12,} meals {totals[2]:>13,} meal items  "
+                  f"{elapsed:7.1f} s  {totals[2] / elapsed:>10,.0f} items/s")
+
+    with conn.cursor() as cursor:
+        reset_sequences(cursor, args.suffix)
+        if args.rollups and not args.suffix:
+            backfill_inventory_movements(cursor)
+            backfill_sales_hourly(cursor)
+            backfill_item_sales_daily(cursor)
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        for name in ("orders", "meals", "meal_item"):
+            cursor.execute(f"ANALYZE {table_name(name, args.suffix)}")
+    conn.close()
+    print(f"done in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Start a throwaway PostgreSQL server in a temporary directory, or create a
+scratch database on an existing server, and load the backend schema into it.
+Used by the benchmark and data generation scripts.
+
+    python scripts/local_postgres.py        # start one and print its settings until Ctrl-C
+"""
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import sql
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+SCHEMA_FILES = [SCRIPTS_DIR / "schema.sql"] + sorted((SCRIPTS_DIR / "migrations").glob("*.sql"))
+
+
+def find_pg_bin(pg_bin=None):
+    """Directory holding initdb and pg_ctl: ``pg_bin``, $PG_BIN, PATH or the usual package locations."""
+    candidates = [pg_bin, os.getenv("PG_BIN")]
+    on_path = shutil.which("pg_ctl")
+    if on_path:
+        candidates.append(os.path.dirname(on_path))
+    candidates += sorted(glob.glob("/usr/lib/postgresql/*/bin"), reverse=True)
+    candidates += sorted(glob.glob("/usr/local/opt/postgresql*/bin"), reverse=True)
+    for candidate in candidates:
+        if candidate and os.path.exists(os.path.join(candidate, "pg_ctl")):
+            return candidate
+    raise RuntimeError("PostgreSQL server binaries (initdb, pg_ctl) not found; pass --pg-bin or set PG_BIN")
+
+
+@contextmanager
+def throwaway_postgres(pg_bin=None, port=54329, settings=None):
+    """
+    initdb a new cluster in a temporary directory, start it on a Unix socket
+    only, and yield connection parameters for a fresh "bench" database. The
+    server and its files are removed on exit.
+    """
+    bin_dir = find_pg_bin(pg_bin)
+    workdir = tempfile.mkdtemp(prefix="pg-bench-")
+    data_dir = os.path.join(workdir, "data")
+    options = [f"-k {workdir}", f"-p {port}", "-c listen_addresses=''"]
+    options += [f"-c {name}={value}" for name, value in (settings or {}).items()]
+    try:
+        subprocess.run(
+            [os.path.join(bin_dir, "initdb"), "-D", data_dir, "-U", "postgres", "--auth=trust",
+             "-E", "UTF8", "--no-sync"],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        subprocess.run(
+            [os.path.join(bin_dir, "pg_ctl"), "-D", data_dir, "-l", os.path.join(workdir, "server.log"),
+             "-o", " ".join(options), "-w", "start"],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        params = {"dbname": "postgres", "user": "postgres", "password": "", "host": workdir, "port": str(port)}
+        with scratch_database(params, name="bench") as db_params:
+            yield db_params
+    finally:
+        if os.path.exists(os.path.join(data_dir, "postmaster.pid")):
+            subprocess.run(
+                [os.path.join(bin_dir, "pg_ctl"), "-D", data_dir, "-m", "fast", "-w", "stop"],
+                stdout=subprocess.DEVNULL
+            )
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def scratch_database(params, name=None):
+    """Create an empty database next to ``params``' one, yield its parameters and drop it afterwards."""
+    name = name or f"bench_{uuid.uuid4().hex[:8]}"
+    admin = psycopg2.connect(**params)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+        yield dict(params, dbname=name)
+    finally:
+        with admin.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(name)))
+        admin.close()
+
+
+def apply_schema(params):
+    """Run schema.sql and every migration, in order, against ``params``."""
+    with psycopg2.connect(**params) as conn:
+        with conn.cursor() as cursor:
+            for path in SCHEMA_FILES:
+                cursor.execute(path.read_text())
+        conn.commit()
+    conn.close()
+
+
+def backend_env(params):
+    """Environment variables that point backend/app.py at ``params``."""
+    return {
+        "DATABASE_NAME": params["dbname"],
+        "USER": params["user"],
+        "PASSWORD": params.get("password") or "",
+        "HOST": params["host"],
+        "PG_PORT": str(params["port"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pg-bin", help="directory with initdb and pg_ctl")
+    parser.add_argument("--port", type=int, default=54329)
+    args = parser.parse_args()
+
+    with throwaway_postgres(args.pg_bin, args.port) as params:
+        apply_schema(params)
+        for name, value in backend_env(params).items():
+            print(f"{name}={value}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Mint Google-style ID tokens signed by a locally generated key, to exercise
+/google-login offline.
+
+    python scripts/make_test_google_token.py --sub 1234567890 --email manager@example.com
+    GOOGLE_CERTS_FILE=google_test_keys/certs.json GOOGLE_AUTH_CLIENT_ID=test-client python backend/app.py
+    curl -X POST localhost:5000/google-login -H 'Content-Type: application/json' -d '{"token": "<token>"}'
+
+The first run creates an RSA key in --keys-dir; certs.json there holds the
+public key under its key id in the shape Google serves its certificates.
+--rotate adds a new signing key, keeping the earlier ones in certs.json
+like Google does during a rotation. The token is printed on stdout. The
+employee logging in needs google_id set to --sub.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from google.auth import crypt, jwt
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa as rsa_keys
+except ImportError:
+    rsa_keys = None
+
+
+def generate_key():
+    """(private PEM, public PEM) of a new 2048-bit RSA key, both PKCS#1 so either google-auth backend reads them."""
+    if rsa_keys is not None:
+        key = rsa_keys.generate_private_key(public_exponent=65537, key_size=2048)
+        private = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                                    serialization.NoEncryption())
+        public = key.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.PKCS1)
+        return private.decode("ascii"), public.decode("ascii")
+
+    import rsa
+
+    public_key, private_key = rsa.newkeys(2048)
+    return private_key.save_pkcs1().decode("ascii"), public_key.save_pkcs1().decode("ascii")
+
+
+def signing_key(keys_dir, rotate):
+    """The current signer, creating (or with ``rotate``, adding) a key and its certs.json entry."""
+    private_path, certs_path = keys_dir / "private.pem", keys_dir / "certs.json"
+    certs = json.loads(certs_path.read_text()) if certs_path.exists() else {}
+
+    if rotate or not private_path.exists():
+        keys_dir.mkdir(parents=True, exist_ok=True)
+        private, public = generate_key()
+        key_id = hashlib.sha256(public.encode("ascii")).hexdigest()[:16]
+        certs[key_id] = public
+        private_path.write_text(private)
+        os.chmod(private_path, 0o600)
+        certs_path.write_text(json.dumps(certs, indent=2))
+        (keys_dir / "key_id").write_text(key_id)
+
+    key_id = (keys_dir / "key_id").read_text().strip()
+    return crypt.RSASigner.from_string(private_path.read_text(), key_id=key_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sub", required=True, help="Google account id, matched against employees.google_id")
+    parser.add_argument("--email", default="employee@example.com")
+    parser.add_argument("--audience", default=os.getenv("GOOGLE_AUTH_CLIENT_ID", "test-client"),
+                        help="OAuth client id (default $GOOGLE_AUTH_CLIENT_ID or test-client)")
+    parser.add_argument("--issuer", default="https://accounts.google.com")
+    parser.add_argument("--lifetime", type=int, default=3600, help="seconds until the token expires")
+    parser.add_argument("--keys-dir", type=Path, default=Path("google_test_keys"))
+    parser.add_argument("--rotate", action="store_true", help="sign with a new key, keeping the old ones valid")
+    args = parser.parse_args()
+
+    signer = signing_key(args.keys_dir, args.rotate)
+    now = int(time.time())
+    token = jwt.encode(signer, {
+        "iss": args.issuer,
+        "aud": args.audience,
+        "sub": args.sub,
+        "email": args.email,
+        "email_verified": True,
+        "iat": now,
+        "exp": now + args.lifetime,
+    })
+    print(token.decode("ascii"))
+
+
+if __name__ == "__main__":
+    main()
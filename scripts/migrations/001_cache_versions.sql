@@ -0,0 +1,7 @@
+-- One row per in-process cache (recipes, prices, ...). Writers bump the
+-- version in the same transaction as their change; every backend worker
+-- compares it with the version it loaded and reloads when it moved.
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1
+);
@@ -0,0 +1,23 @@
+-- Indexes behind the keyset-paginated /orders history and its typed filters.
+
+-- newest-first paging on (order_date, id); also serves date_from/date_to
+CREATE INDEX IF NOT EXISTS orders_order_date_id_idx
+    ON orders (order_date DESC, id DESC);
+
+-- employee_id filter, still walked in page order
+CREATE INDEX IF NOT EXISTS orders_employee_order_date_idx
+    ON orders (employee_id, order_date DESC, id DESC);
+
+-- customer_prefix filter: lower(customer_name) LIKE 'prefix%'
+CREATE INDEX IF NOT EXISTS orders_customer_name_prefix_idx
+    ON orders (lower(customer_name) text_pattern_ops);
+
+-- price_min/price_max filters
+CREATE INDEX IF NOT EXISTS orders_total_price_idx
+    ON orders (total_price);
+
+-- /orders/<id>/details
+CREATE INDEX IF NOT EXISTS meals_order_id_idx
+    ON meals (order_id);
+CREATE INDEX IF NOT EXISTS meal_item_meal_id_idx
+    ON meal_item (meal_id);
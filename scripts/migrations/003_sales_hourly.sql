@@ -0,0 +1,28 @@
+-- Hourly sales rollup maintained by submit_order in the order's own
+-- transaction. Rebuild from order history with scripts/backfill_rollups.py.
+CREATE TABLE IF NOT EXISTS sales_hourly (
+    sales_date DATE NOT NULL,
+    hour SMALLINT NOT NULL CHECK (hour BETWEEN 0 AND 23),
+    order_count INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, hour)
+);
+
+CREATE TABLE IF NOT EXISTS sales_hourly_meals (
+    sales_date DATE NOT NULL,
+    hour SMALLINT NOT NULL CHECK (hour BETWEEN 0 AND 23),
+    meal_type TEXT NOT NULL,
+    meal_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, hour, meal_type)
+);
+
+-- End-of-day Z-Report, written the first time a finished day is viewed and
+-- deleted again when a late order for that day is written.
+CREATE TABLE IF NOT EXISTS z_reports (
+    report_date DATE PRIMARY KEY,
+    closed_at TIMESTAMP NOT NULL DEFAULT now(),
+    order_count INTEGER NOT NULL,
+    revenue NUMERIC(12, 2) NOT NULL,
+    hourly_sales JSONB NOT NULL,
+    meal_counts JSONB NOT NULL
+);
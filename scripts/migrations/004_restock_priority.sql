@@ -0,0 +1,78 @@
+-- Restock priority kept on the inventory rows themselves so
+-- /inventory-restock-info is an index scan instead of a join and GROUP BY
+-- over inventory x item_ingredients.
+--
+-- recipe_demand is the sum of item_ingredients.quantity_needed for the
+-- ingredient, kept current by the triggers below. priority_score is a
+-- stored generated column, so every quantity change (orders, restocks,
+-- manual edits) re-scores the row with no application code involved.
+
+ALTER TABLE inventory ADD COLUMN IF NOT EXISTS recipe_demand NUMERIC NOT NULL DEFAULT 0;
+
+UPDATE inventory i
+SET recipe_demand = d.total
+FROM (
+    SELECT ingredient_name, COALESCE(SUM(quantity_needed), 0) AS total
+    FROM item_ingredients
+    GROUP BY ingredient_name
+) d
+WHERE d.ingredient_name = i.name AND i.recipe_demand IS DISTINCT FROM d.total;
+
+-- same formula the endpoint used to compute per request, which divided by
+-- a demand of 1 when the ingredient was in no recipe (see 009 for databases
+-- migrated with the earlier NULLIF(recipe_demand, 0) version)
+ALTER TABLE inventory ADD COLUMN IF NOT EXISTS priority_score NUMERIC GENERATED ALWAYS AS (
+    CASE
+        WHEN quantity <= recipe_demand
+            THEN 1 - (quantity / CASE WHEN recipe_demand = 0 THEN 1 ELSE recipe_demand END)
+        ELSE recipe_demand / NULLIF(quantity, 0)
+    END
+) STORED;
+
+-- ORDER BY priority_score DESC [LIMIT n] and priority_score >= threshold
+CREATE INDEX IF NOT EXISTS inventory_priority_score_idx
+    ON inventory (priority_score DESC);
+
+-- recipe_demand lookups when an ingredient is added or renamed
+CREATE INDEX IF NOT EXISTS item_ingredients_ingredient_name_idx
+    ON item_ingredients (ingredient_name);
+
+
+-- item_ingredients changes move recipe_demand by the difference
+CREATE OR REPLACE FUNCTION item_ingredients_sync_recipe_demand() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE inventory
+        SET recipe_demand = recipe_demand - COALESCE(OLD.quantity_needed, 0)
+        WHERE name = OLD.ingredient_name;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE inventory
+        SET recipe_demand = recipe_demand + COALESCE(NEW.quantity_needed, 0)
+        WHERE name = NEW.ingredient_name;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS item_ingredients_sync_recipe_demand ON item_ingredients;
+CREATE TRIGGER item_ingredients_sync_recipe_demand
+    AFTER INSERT OR UPDATE OF ingredient_name, quantity_needed OR DELETE ON item_ingredients
+    FOR EACH ROW EXECUTE FUNCTION item_ingredients_sync_recipe_demand();
+
+
+-- new (or renamed) inventory rows pick up the demand already in recipes
+CREATE OR REPLACE FUNCTION inventory_init_recipe_demand() RETURNS trigger AS $$
+BEGIN
+    NEW.recipe_demand := COALESCE(
+        (SELECT SUM(quantity_needed) FROM item_ingredients WHERE ingredient_name = NEW.name),
+        0
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS inventory_init_recipe_demand ON inventory;
+CREATE TRIGGER inventory_init_recipe_demand
+    BEFORE INSERT OR UPDATE OF name ON inventory
+    FOR EACH ROW EXECUTE FUNCTION inventory_init_recipe_demand();
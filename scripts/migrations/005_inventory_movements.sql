@@ -0,0 +1,29 @@
+-- Append-only ledger of inventory changes. submit_order writes one row per
+-- ingredient per order (reason 'order', negative delta); the inventory
+-- screens write restocks and corrections. Build the 'order' rows for
+-- existing history with scripts/backfill_rollups.py.
+CREATE TABLE IF NOT EXISTS inventory_movements (
+    id BIGSERIAL PRIMARY KEY,
+    ts TIMESTAMP NOT NULL,
+    ingredient_name TEXT NOT NULL,
+    delta NUMERIC NOT NULL,
+    reason TEXT NOT NULL CHECK (reason IN ('order', 'restock', 'adjustment', 'waste')),
+    order_id INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS inventory_movements_ingredient_ts_idx
+    ON inventory_movements (ingredient_name, ts);
+
+-- backfill deletes and rebuilds by date range
+CREATE INDEX IF NOT EXISTS inventory_movements_ts_idx
+    ON inventory_movements (ts);
+
+-- Net delta per day, ingredient and reason, maintained with the ledger.
+-- /get-productusage sums the 'order' rows for the requested days.
+CREATE TABLE IF NOT EXISTS inventory_usage_daily (
+    usage_date DATE NOT NULL,
+    ingredient_name TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    delta NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (usage_date, ingredient_name, reason)
+);
@@ -0,0 +1,12 @@
+-- Per-day, per-item sales maintained by submit_order in the order's own
+-- transaction; /get-sales-trends buckets it by day, week or month.
+-- Rebuild from order history with scripts/backfill_rollups.py.
+CREATE TABLE IF NOT EXISTS item_sales_daily (
+    sales_date DATE NOT NULL,
+    item_name TEXT NOT NULL,
+    -- orders containing the item at least once
+    order_count INTEGER NOT NULL DEFAULT 0,
+    -- times the item was served across those orders
+    servings INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, item_name)
+);
@@ -0,0 +1,11 @@
+-- Server-held /chat conversations. state holds the system prompt, a short
+-- summary of turns that no longer fit the model's context window and the
+-- recent turns, so it stays small however long the conversation runs.
+-- Sessions idle for CHAT_SESSION_TTL seconds are deleted by the app.
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id TEXT PRIMARY KEY,
+    state JSONB NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS chat_sessions_updated_at_idx ON chat_sessions (updated_at);
@@ -0,0 +1,9 @@
+-- Client-supplied keys of orders written by /submit-orders, so a kiosk
+-- replaying its offline backlog (or retrying a batch whose response it
+-- never got) cannot create an order twice. The key is claimed before its
+-- order row is inserted in the same transaction, hence the deferred check.
+CREATE TABLE IF NOT EXISTS order_idempotency_keys (
+    key TEXT PRIMARY KEY,
+    order_id INTEGER NOT NULL REFERENCES orders (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
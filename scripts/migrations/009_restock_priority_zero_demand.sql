@@ -0,0 +1,30 @@
+-- 004 first shipped with priority_score dividing by NULLIF(recipe_demand, 0),
+-- which scored ingredients in no recipe as NULL instead of 1 - quantity as
+-- the endpoint's original query did: they sorted first under
+-- ORDER BY priority_score DESC and min_priority filtered them out.
+-- A generated column's expression cannot be altered before Postgres 17, so
+-- the column (and its index) is rebuilt, only where the old expression is
+-- still in place.
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_attrdef d
+        JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum
+        WHERE d.adrelid = 'inventory'::regclass
+          AND a.attname = 'priority_score'
+          AND pg_get_expr(d.adbin, d.adrelid) LIKE '%NULLIF(recipe_demand,%'
+    ) THEN
+        ALTER TABLE inventory DROP COLUMN priority_score;
+        ALTER TABLE inventory ADD COLUMN priority_score NUMERIC GENERATED ALWAYS AS (
+            CASE
+                WHEN quantity <= recipe_demand
+                    THEN 1 - (quantity / CASE WHEN recipe_demand = 0 THEN 1 ELSE recipe_demand END)
+                ELSE recipe_demand / NULLIF(quantity, 0)
+            END
+        ) STORED;
+        CREATE INDEX inventory_priority_score_idx ON inventory (priority_score DESC);
+    END IF;
+END
+$$;
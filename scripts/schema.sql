@@ -0,0 +1,63 @@
+-- Base tables the backend expects, for creating a local or throwaway
+-- database (benchmarks, data generation). Reconstructed from the queries
+-- in backend/; the production database is the reference if they differ.
+-- Apply scripts/migrations/*.sql on top, in order.
+
+CREATE TABLE IF NOT EXISTS employees (
+    id SERIAL PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    email TEXT UNIQUE,
+    phone_number TEXT,
+    is_manager BOOLEAN NOT NULL DEFAULT FALSE,
+    pass_hash TEXT,
+    google_id TEXT UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS items (
+    name TEXT PRIMARY KEY,
+    type TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS inventory (
+    name TEXT PRIMARY KEY,
+    quantity NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    unit TEXT
+);
+
+CREATE TABLE IF NOT EXISTS item_ingredients (
+    item_name TEXT NOT NULL REFERENCES items (name),
+    ingredient_name TEXT NOT NULL,
+    quantity_needed NUMERIC(10, 2) NOT NULL,
+    PRIMARY KEY (item_name, ingredient_name)
+);
+
+CREATE TABLE IF NOT EXISTS prices (
+    name TEXT PRIMARY KEY,
+    price NUMERIC(8, 2) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id SERIAL PRIMARY KEY,
+    customer_name TEXT NOT NULL,
+    order_date TIMESTAMP NOT NULL,
+    employee_id INTEGER REFERENCES employees (id),
+    total_price NUMERIC(10, 2) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meals (
+    id SERIAL PRIMARY KEY,
+    order_id INTEGER NOT NULL REFERENCES orders (id),
+    meal_type TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meal_item (
+    id SERIAL PRIMARY KEY,
+    meal_id INTEGER NOT NULL REFERENCES meals (id),
+    item_name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS translations (
+    en TEXT PRIMARY KEY,
+    es TEXT NOT NULL
+);
@@ -0,0 +1,222 @@
+"""
+Stress inventory deduction with many concurrent order submitters that all
+draw on the same popular ingredients, and check that no deduction is lost.
+
+Starts a throwaway Postgres (see local_postgres.py), seeds a menu whose
+every item uses "Rice" and "Chicken" plus a few other ingredients, and has
+--submitters threads (one connection each) submit orders as fast as they
+can, one transaction per order. For each write path it reports committed,
+rejected and deadlocked orders, throughput and latency, then compares
+every ingredient's quantity with its starting stock minus what the
+committed orders needed:
+
+    python scripts/stress_inventory_deduction.py --submitters 50 --orders 40
+    python scripts/stress_inventory_deduction.py --enforce-stock --stock 2000
+
+"legacy" is the per-item path submit_order used before the set-based rewrite
+(see bench_submit_order.py); "set-based" is orders.write_order. With
+--enforce-stock the stock is meant to run out part way: rejected orders
+must leave no trace and no quantity may go negative. Exits with status 1
+if any check fails. --existing uses a scratch database on the server from
+.env instead of starting one; initdb refuses to run as root.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import errors
+from dotenv import load_dotenv
+
+from bench_submit_order import legacy_write_order
+from local_postgres import apply_schema, scratch_database, throwaway_postgres
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from orders import InsufficientStockError, count_items, ingredient_demand, load_recipes, write_order  # noqa: E402
+
+
+load_dotenv()
+
+DB_PARAMS = {
+    "dbname": os.getenv("DATABASE_NAME"),
+    "user": os.getenv("USER"),
+    "password": os.getenv("PASSWORD"),
+    "host": os.getenv("HOST"),
+    "port": os.getenv("PG_PORT")
+}
+
+HOT_INGREDIENTS = ["Chicken", "Rice"]
+MENU_ITEMS = ["Orange Chicken", "Kung Pao Chicken", "Fried Rice", "Chow Mein", "Broccoli Beef", "Egg Roll"]
+MEAL_SIZES = {"bowl": 2, "plate": 3, "bigger plate": 4}
+
+
+def seed(params, ingredients, stock, rng):
+    """Menu items that all need the hot ingredients plus two others each; every ingredient starts at ``stock``."""
+    names = HOT_INGREDIENTS + [f"Ingredient {index}" for index in range(1, ingredients - len(HOT_INGREDIENTS) + 1)]
+    with psycopg2.connect(**params) as conn, conn.cursor() as cursor:
+        cursor.executemany("INSERT INTO inventory (name, quantity, unit) VALUES (%s, %s, 'oz')",
+                           [(name, stock) for name in names])
+        cursor.executemany("INSERT INTO items (name, type) VALUES (%s, 'entree')", [(name,) for name in MENU_ITEMS])
+        for item_name in MENU_ITEMS:
+            # recipes list their ingredients in different orders, as real ones do
+            needs = rng.sample(names[len(HOT_INGREDIENTS):], 2) + HOT_INGREDIENTS
+            rng.shuffle(needs)
+            cursor.executemany(
+                "INSERT INTO item_ingredients (item_name, ingredient_name, quantity_needed) VALUES (%s, %s, %s)",
+                [(item_name, name, rng.randint(1, 4)) for name in needs]
+            )
+    conn.close()
+    return names
+
+
+def make_order(rng):
+    items = []
+    for _ in range(rng.randint(1, 3)):
+        meal_type = rng.choice(list(MEAL_SIZES))
+        items.append({
+            "meal_type": meal_type,
+            "meal_items": [{"item_name": rng.choice(MENU_ITEMS)} for _ in range(MEAL_SIZES[meal_type])]
+        })
+    return {
+        "customer_name": "stress",
+        "order_date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "employee_id": None,
+        "total_price": 10.00 * len(items),
+        "items": items
+    }
+
+
+def run_submitters(params, write, order_lists):
+    """One thread and connection per list of orders. Returns (outcomes, latencies ms, committed orders, seconds)."""
+    outcomes = Counter()
+    latencies = []
+    committed = []
+    lock = threading.Lock()
+    start_line = threading.Barrier(len(order_lists) + 1)
+
+    def submitter(orders):
+        conn = psycopg2.connect(**params)
+        local_outcomes, local_latencies, local_committed = Counter(), [], []
+        start_line.wait()
+        for order in orders:
+            started = time.perf_counter()
+            try:
+                with conn.cursor() as cursor:
+                    write(cursor, order)
+                conn.commit()
+                local_outcomes["committed"] += 1
+                local_committed.append(order)
+            except InsufficientStockError:
+                conn.rollback()
+                local_outcomes["rejected"] += 1
+            except errors.DeadlockDetected:
+                conn.rollback()
+                local_outcomes["deadlocked"] += 1
+            except psycopg2.Error as e:
+                conn.rollback()
+                local_outcomes[f"error: {type(e).__name__}"] += 1
+            local_latencies.append((time.perf_counter() - started) * 1000)
+        conn.close()
+        with lock:
+            outcomes.update(local_outcomes)
+            latencies.extend(local_latencies)
+            committed.extend(local_committed)
+
+    threads = [threading.Thread(target=submitter, args=(orders,)) for orders in order_lists]
+    for thread in threads:
+        thread.start()
+    start_line.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return outcomes, latencies, committed, time.perf_counter() - started
+
+
+def check(params, names, stock, committed, recipes):
+    """Ingredients whose quantity differs from stock minus committed demand, and those below zero."""
+    expected = {name: stock for name in names}
+    for order in committed:
+        for name, quantity in ingredient_demand(count_items(order["items"]), recipes).items():
+            expected[name] -= quantity
+    with psycopg2.connect(**params) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT name, quantity FROM inventory WHERE name = ANY(%s)", (names,))
+        actual = dict(cursor.fetchall())
+    conn.close()
+    lost = {name: (expected[name], actual[name]) for name in names if actual[name] != expected[name]}
+    negative = sorted(name for name in names if actual[name] < 0)
+    return lost, negative
+
+
+def reset(params, names, stock):
+    with psycopg2.connect(**params) as conn, conn.cursor() as cursor:
+        cursor.execute("UPDATE inventory SET quantity = %s WHERE name = ANY(%s)", (stock, names))
+    conn.close()
+
+
+def stress(params, args):
+    rng = random.Random(args.seed)
+    names = seed(params, args.ingredients, args.stock, rng)
+    with psycopg2.connect(**params) as conn, conn.cursor() as cursor:
+        recipes = load_recipes(cursor)
+    conn.close()
+
+    order_lists = [[make_order(rng) for _ in range(args.orders)] for _ in range(args.submitters)]
+    paths = {
+        "legacy": lambda cursor, order: legacy_write_order(cursor, order),
+        "set-based": lambda cursor, order: write_order(cursor, order, recipes, args.enforce_stock),
+    }
+    total = args.submitters * args.orders
+    print(f"{args.submitters} submitters x {args.orders} orders, {len(names)} ingredients at {args.stock} each"
+          f"{', enforcing stock' if args.enforce_stock else ''}")
+
+    failed = False
+    for label in args.paths:
+        reset(params, names, args.stock)
+        outcomes, latencies, committed, seconds = run_submitters(params, paths[label], order_lists)
+        lost, negative = check(params, names, args.stock, committed, recipes)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"  {label:<10} {outcomes['committed'] / seconds:8.1f} orders/s   "
+              f"p50 {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms")
+        print(f"             {dict(outcomes)} of {total}; "
+              f"lost updates: {len(lost)}; negative stock: {len(negative)}")
+        for name, (expected, actual) in sorted(lost.items()):
+            print(f"             {name}: expected {expected}, found {actual}")
+        if label == "set-based":
+            failed |= bool(lost or outcomes["deadlocked"] or (args.enforce_stock and negative))
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--submitters", type=int, default=50)
+    parser.add_argument("--orders", type=int, default=40, help="orders per submitter")
+    parser.add_argument("--ingredients", type=int, default=8)
+    parser.add_argument("--stock", type=int, default=1000000, help="starting quantity of every ingredient")
+    parser.add_argument("--enforce-stock", action="store_true")
+    parser.add_argument("--paths", nargs="+", choices=["legacy", "set-based"], default=["legacy", "set-based"])
+    parser.add_argument("--seed", type=int, default=331)
+    parser.add_argument("--existing", action="store_true", help="use a scratch database on the server in .env")
+    parser.add_argument("--pg-bin", help="directory with initdb and pg_ctl")
+    parser.add_argument("--port", type=int, default=54329)
+    args = parser.parse_args()
+
+    if args.existing:
+        database = scratch_database(DB_PARAMS)
+    else:
+        # room for every submitter plus the checks
+        database = throwaway_postgres(args.pg_bin, args.port, {"max_connections": args.submitters + 20})
+    with database as params:
+        apply_schema(params)
+        failed = stress(params, args)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Local stand-in for the OpenAI chat completions API, for exercising /chat
+and /chat/stream without an API key.
+
+    python scripts/stub_completion_server.py --port 8098 --first-token-delay 1 --token-delay 0.05
+    OPENAI_API_BASE=http://localhost:8098/v1 OPENAI_API_KEY=test python backend/app.py
+    curl -N -X POST localhost:5000/chat/stream -H 'Content-Type: application/json' \\
+         -d '{"messages": [{"sender": "user", "text": "Is the orange chicken spicy?"}]}'
+
+The reply is "You asked: <last user message>", sent word by word when
+streamed. --first-token-delay and --token-delay simulate model latency;
+--fail answers every request with a 401 like an invalid key would.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubCompletionHandler(BaseHTTPRequestHandler):
+    first_token_delay = 0.0
+    token_delay = 0.0
+    fail = False
+    requests_served = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        messages = body.get("messages", [])
+        question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+
+        with StubCompletionHandler.lock:
+            StubCompletionHandler.requests_served += 1
+            print(f"request {StubCompletionHandler.requests_served}: {len(messages)} messages, "
+                  f"stream={bool(body.get('stream'))}")
+
+        if self.fail:
+            self.send_json(401, {"error": {"message": "Incorrect API key provided.", "type": "invalid_request_error",
+                                           "code": "invalid_api_key"}})
+            return
+
+        reply = f"You asked: {question}"
+        time.sleep(self.first_token_delay)
+        if body.get("stream"):
+            self.stream(body.get("model"), reply)
+        else:
+            time.sleep(self.token_delay * len(reply.split()))
+            self.send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": sum(len(m.get("content", "").split()) for m in messages),
+                          "completion_tokens": len(reply.split())},
+            })
+
+    def stream(self, model, reply):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None):
+            payload = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk({"role": "assistant"})
+        words = reply.split(" ")
+        for index, word in enumerate(words):
+            chunk({"content": word if index == 0 else " " + word})
+            time.sleep(self.token_delay)
+        chunk({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def send_json(self, status, payload):
+        encoded = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--first-token-delay", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.05, help="seconds between tokens")
+    parser.add_argument("--fail", action="store_true", help="answer every request with 401")
+    args = parser.parse_args()
+
+    StubCompletionHandler.first_token_delay = args.first_token_delay
+    StubCompletionHandler.token_delay = args.token_delay
+    StubCompletionHandler.fail = args.fail
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), StubCompletionHandler)
+    print(f"Stub completion API on http://localhost:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Local stand-in for the Google Translate v2 API, for exercising
+/get-translation and /get-translations without an API key.
+
+    python scripts/stub_translate_server.py --port 8099 --delay 0.5
+    GOOGLE_TRANSLATE_API_URL=http://localhost:8099/ python backend/app.py
+
+Every string is "translated" to "es:<string>". --delay simulates a slow
+upstream so request coalescing can be observed; --fail makes every
+request return a 403 like an invalid key would.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubTranslateHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    fail = False
+    requests_served = 0
+    strings_served = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        strings = body.get("q", [])
+        if isinstance(strings, str):
+            strings = [strings]
+
+        with StubTranslateHandler.lock:
+            StubTranslateHandler.requests_served += 1
+            StubTranslateHandler.strings_served += len(strings)
+            print(f"request {StubTranslateHandler.requests_served}: {len(strings)} strings "
+                  f"({StubTranslateHandler.strings_served} total)")
+
+        time.sleep(self.delay)
+
+        if self.fail:
+            status, payload = 403, {"error": {"code": 403, "message": "The request is missing a valid API key."}}
+        else:
+            status, payload = 200, {"data": {"translations": [
+                {"translatedText": f"{body.get('target', 'es')}:{text}"} for text in strings
+            ]}}
+
+        encoded = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--fail", action="store_true", help="answer every request with a 403")
+    args = parser.parse_args()
+
+    StubTranslateHandler.delay = args.delay
+    StubTranslateHandler.fail = args.fail
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubTranslateHandler)
+    print(f"Stub translation server on http://127.0.0.1:{args.port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()